@@ -14,6 +14,7 @@ from tab6 import tab6_content
 from tab7 import tab7_content
 from tab8 import tab8_content
 from tab9 import tab9_content
+from timing import Recorder, activate, deactivate, span
 
 st.set_page_config(
     page_title="本地化工作流辅助工具",
@@ -47,22 +48,50 @@ st.sidebar.markdown("---")
 # 显示当前选中的标签（可选）
 st.sidebar.info(f"当前页面: **{st.session_state.current_tab}**")
 
+# 分阶段计时：开启后记录本次重跑中各阶段耗时，关闭时不记录
+timing_enabled = st.sidebar.toggle("分阶段计时", value=False, key="timing_enabled")
+if "timing_recorder" not in st.session_state:
+    st.session_state.timing_recorder = Recorder()
+recorder = st.session_state.timing_recorder
+timing_token = activate(recorder if timing_enabled else None)
+recorder.begin_run()
+
 # 根据选中的标签显示内容
-if st.session_state.current_tab == "长度检查":
-    tab1_content()
-elif st.session_state.current_tab == "合并文件":
-    tab3_content()
-elif st.session_state.current_tab == "拆分文件":
-    tab4_content()
-elif st.session_state.current_tab == "整合工作台":
-    tab5_content()
-elif st.session_state.current_tab == "Coze 测试":
-    tab6_content()
-elif st.session_state.current_tab == "工作流测试":
-    tab7_content()
-elif st.session_state.current_tab == "自动化迭代":
-    tab8_content()
-elif st.session_state.current_tab == "DGame 格式整理":
-    tab9_content()
+try:
+    with span(f"页面：{st.session_state.current_tab}"):
+        if st.session_state.current_tab == "长度检查":
+            tab1_content()
+        elif st.session_state.current_tab == "合并文件":
+            tab3_content()
+        elif st.session_state.current_tab == "拆分文件":
+            tab4_content()
+        elif st.session_state.current_tab == "整合工作台":
+            tab5_content()
+        elif st.session_state.current_tab == "Coze 测试":
+            tab6_content()
+        elif st.session_state.current_tab == "工作流测试":
+            tab7_content()
+        elif st.session_state.current_tab == "自动化迭代":
+            tab8_content()
+        elif st.session_state.current_tab == "DGame 格式整理":
+            tab9_content()
+finally:
+    deactivate(timing_token)
+    if timing_enabled:
+        recorder.end_run()
+
+# ---- 计时面板 ----
+if timing_enabled:
+    with st.sidebar.expander("计时面板", expanded=True):
+        st.caption(f"已记录 {recorder.runs} 次重跑")
+        st.write("最近一次重跑")
+        st.dataframe(pd.DataFrame(recorder.last_breakdown()), hide_index=True)
+        st.write("各阶段 p50 / p95（最近 200 次）")
+        st.dataframe(pd.DataFrame(recorder.percentiles()), hide_index=True)
+        col1, col2 = st.columns(2)
+        col1.download_button("导出 JSON", data=recorder.to_json(),
+                             file_name=f"计时_{int(time.time())}.json", mime="application/json")
+        if col2.button("清空", key="timing_clear"):
+            recorder.clear()
 
 
@@ -0,0 +1,532 @@
+"""
+自动化翻译迭代引擎（与 Streamlit 无关）：把待翻译编号分批发送给 Workflow，逐批合并结果
+
+两种调度方式：
+- run_rounds：按轮次——每轮重新检查长度、发出全部批次，等最慢的批次完成、再间隔 loop_interval 秒开始下一轮；
+- run_queue：连续队列——工作线程一空闲就取下一批，批次合并后仍未通过长度检查的编号立即回到队列，
+  没有轮次之间的等待。
+两种方式都在待翻译数 ≤ threshold 时停止。MultiLanguageRun 把多个目标语言放在一个任务中，共享原文与并发预算。待翻译编号放在 PendingQueue 中按 priority 排序发送
+（默认比值偏离 合格 区间最远的先发送），见 pendingqueue.py。
+
+AttemptTracker 跨轮次记录每个编号的发送次数和最接近合格区间的候选译文；发送 max_attempts 次仍未通过的编号
+不再发送，放入待复核列表（保留最佳候选），停止阈值只按仍在发送的编号计算。
+Workflow 为一个编号返回多个候选时，由 BatchApplier.select 在本地选出最合适的一个再迭代。
+每个批次的 Token 用量与费用记入 UsageMeter（usage.py），按轮次与整次运行汇总写入日志和统计，
+连续队列没有轮次，按批次中编号的第几次发送归入对应的"轮次"。
+
+call_batch(fields, batch_index) 负责实际调用 Workflow，返回该批次的 MESSAGE 内容列表（失败时抛出异常），
+页面传入 Coze 调用，基准测试传入本地桩函数。进度通过 on_event(事件名, 数据) 回调通知，
+回调总在调用 run_* 的线程中执行，页面可以直接在回调里更新 Streamlit 元素。
+"""
+import time
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from datetime import datetime
+
+from core import calculate_length_status, prepare_source
+from metrics import DEFAULT_METRIC
+from pendingqueue import PRIORITY_RATIO, build_queue
+from timing import bind
+from tmindex import DEFAULT_THRESHOLD, build_memory, suggest_translations
+from usage import UsageMeter, batch_usage
+from workflow import BatchApplier, score_candidate
+
+BATCH_SIZE = 10
+MAX_WORKERS = 5
+DEFAULT_STOP_THRESHOLD = 50
+DEFAULT_LOOP_INTERVAL = 5
+# 单个编号最多发送次数，0 表示不限
+DEFAULT_MAX_ATTEMPTS = 5
+
+ROUNDS = "按轮次"
+QUEUE = "连续队列"
+MODES = [QUEUE, ROUNDS]
+
+
+class AttemptTracker:
+    """
+    跨轮次的逐编号发送记录：发送次数、未被接受的发送次数（无效发送）、最佳候选，
+    以及达到 max_attempts 仍未通过而搁置待复核的编号；只在主线程中调用
+    """
+
+    def __init__(self, original_dict, translation_dict, statuses, target_label=None, metric=DEFAULT_METRIC,
+                 markup=None, max_attempts=DEFAULT_MAX_ATTEMPTS):
+        self.original_dict = original_dict
+        self.translation_dict = translation_dict
+        self.statuses = statuses
+        self.target = next((s for s in statuses if s["name"] == target_label), statuses[0])
+        self.metric = metric
+        self.markup = markup
+        self.max_attempts = max_attempts
+        self.attempts = {}
+        # 编号 → (与目标区间的距离, 候选译文, 比值, 标签)
+        self.best = {}
+        self.parked = {}
+        self.sent = 0
+        self.wasted = 0
+        self.wasted_batches = 0
+        # 被接受的编号数及其被接受时的发送次数之和（平均几次发送通过）
+        self.accepted = 0
+        self.accepted_attempts = 0
+
+    def _score(self, key, candidate):
+        scored = score_candidate(self.original_dict[key], candidate, self.statuses, self.target, self.metric, self.markup)
+        if scored is None:
+            return None
+        distance, ratio, tag = scored
+        return distance, candidate, ratio, tag
+
+    def record(self, keys, parsed, accepted):
+        """
+        记录一个完成的批次：keys 为发送的编号，parsed 为解析出的 {编号: 候选}，accepted 为被接受的编号集合
+        返回本批达到发送上限而被搁置的编号
+        """
+        exhausted = []
+        self.sent += len(keys)
+        if keys and not accepted:
+            self.wasted_batches += 1
+        for key in keys:
+            self.attempts[key] = self.attempts.get(key, 0) + 1
+            if key in accepted:
+                self.best.pop(key, None)
+                self.accepted += 1
+                self.accepted_attempts += self.attempts[key]
+                continue
+            self.wasted += 1
+            candidate = parsed.get(key)
+            if candidate and key in self.original_dict:
+                scored = self._score(key, candidate)
+                if scored is not None and (key not in self.best or scored[0] < self.best[key][0]):
+                    self.best[key] = scored
+            if self.max_attempts and self.attempts[key] >= self.max_attempts:
+                self.park(key)
+                exhausted.append(key)
+        return exhausted
+
+    def park(self, key):
+        best = self.best.get(key)
+        self.parked[key] = {
+            "编号": key,
+            "原文": self.original_dict.get(key, ""),
+            "当前译文": self.translation_dict.get(key, ""),
+            "最佳候选": best[1] if best else "",
+            "候选比值": best[2] if best else None,
+            "候选标签": best[3] if best else "",
+            "发送次数": self.attempts.get(key, 0),
+        }
+
+    def is_parked(self, key):
+        return key in self.parked
+
+    def review_records(self):
+        """待复核列表（按搁置顺序）"""
+        return list(self.parked.values())
+
+    def summary(self):
+        return {
+            "发送编号次数": self.sent,
+            "无效发送": self.wasted,
+            "全无效批次": self.wasted_batches,
+            "搁置待复核": len(self.parked),
+            "平均通过发送次数": round(self.accepted_attempts / self.accepted, 3) if self.accepted else 0.0,
+        }
+
+
+class AutomationRun:
+    """一次自动化运行：参数、翻译记忆与累计统计；translation_dict 被就地更新"""
+
+    def __init__(self, original_dict, translation_dict, statuses, iterable_labels, export_labels, call_batch,
+                 metric=DEFAULT_METRIC, markup=None, threshold=DEFAULT_STOP_THRESHOLD, batch_size=BATCH_SIZE,
+                 workers=MAX_WORKERS, use_memory=False, memory_threshold=DEFAULT_THRESHOLD,
+                 on_event=None, should_stop=None, priority=PRIORITY_RATIO, weights=None,
+                 max_attempts=DEFAULT_MAX_ATTEMPTS, source=None, name=None, pricing=None):
+        self.original_dict = original_dict
+        self.translation_dict = translation_dict
+        self.statuses = statuses
+        self.iterable_labels = iterable_labels
+        self.export_labels = list(export_labels)
+        self.call_batch = call_batch
+        self.metric = metric
+        self.markup = markup
+        self.threshold = threshold
+        self.batch_size = batch_size
+        self.workers = workers
+        self.use_memory = use_memory
+        self.memory_threshold = memory_threshold
+        self.on_event = on_event or (lambda kind, data: None)
+        self.should_stop = should_stop or (lambda: False)
+        self.priority = priority
+        self.weights = weights
+        self.name = name
+
+        # 原文编号索引与长度在整个自动化过程中复用（多语言任务中各语言共用），每次检查只对齐译文
+        self.source = source if source is not None else prepare_source(original_dict, metric, markup)
+        self.attempts = AttemptTracker(original_dict, translation_dict, statuses,
+                                       iterable_labels[0] if iterable_labels else None, metric, markup, max_attempts)
+        self.usage = UsageMeter(pricing)
+        self.mode = None
+        # 翻译记忆在第一次检查时用当前已接受的译文建立，之后随接受的结果增量更新
+        self.memory = None
+        self.logs = []
+        self.rounds = 0
+        self.batches = 0
+        self.failed_batches = 0
+        self.updated = 0
+        self.prefilled = 0
+        self.started = None
+        self.finished = None
+
+    # ---------------------------
+    # 公共步骤
+    # ---------------------------
+    def log(self, message):
+        if self.name:
+            message = f"[{self.name}] {message.lstrip()}"
+        self.logs.append(message)
+        self.on_event("log", {"message": message})
+
+    def _check(self):
+        """重新检查长度，返回本次合并所用的 BatchApplier 与检查结果"""
+        df_result = calculate_length_status(self.original_dict, self.translation_dict, self.statuses,
+                                            self.metric, self.markup, source=self.source)
+        applier = BatchApplier(self.original_dict, self.translation_dict, df_result, self.export_labels,
+                               self.iterable_labels, self.statuses, self.metric, self.markup)
+        return applier, df_result
+
+    def _pending_queue(self, applier, df_result):
+        """按优先级排列的待翻译队列（不含已搁置的编号）"""
+        target = self.iterable_labels[0] if self.iterable_labels else None
+        queue = build_queue(df_result, self.export_labels, self.priority, self.statuses, target,
+                            self.weights, keys=applier.pending)
+        queue.remove_many(self.attempts.parked)
+        return queue
+
+    def _active_count(self, applier):
+        """仍在发送的待翻译编号数（待翻译编号中去掉已搁置的）"""
+        return len(applier.pending) - sum(1 for k in self.attempts.parked if k in applier.pending)
+
+    def _prefill(self, applier, df_result, queue):
+        """翻译记忆预填：通过长度检查的候选直接迭代并移出队列，返回同一个队列"""
+        if not self.use_memory or not queue:
+            return queue
+        if self.memory is None:
+            self.memory = build_memory(df_result, self.iterable_labels)
+            self.log(f"翻译记忆条目数: {len(self.memory)}")
+        t0 = time.perf_counter()
+        suggestions, _ = suggest_translations(
+            self.memory, self.original_dict, queue.ordered(), self.statuses, self.iterable_labels,
+            self.metric, self.markup, threshold=self.memory_threshold
+        )
+        if not suggestions:
+            return queue
+        records = applier.merge(suggestions)
+        self.memory.add_records(records)
+        prefilled = queue.remove_many({r["编号"] for r in records})
+        self.prefilled += prefilled
+        self.log(f"🧠 翻译记忆预填 {prefilled} 条（查询用时 {(time.perf_counter() - t0) * 1000:.0f} ms）")
+        # 预填的译文未经 Workflow，列出编号供人工复核
+        self.log("预填编号: " + ", ".join(str(r["编号"]) for r in records))
+        return queue
+
+    def _run_batch(self, applier, keys, batch_index):
+        """工作线程：调用 Workflow 并立即合并本批结果"""
+        fields = [f"{k}={self.original_dict[k]}" for k in keys]
+        error = None
+        try:
+            results = self.call_batch(fields, batch_index)
+        except Exception as e:
+            results, error = [], e
+        candidates = applier.select(results)
+        parsed_count, records = applier.apply_parsed(candidates)
+        return {"index": batch_index, "keys": keys, "results": results, "parsed": parsed_count,
+                "candidates": candidates, "records": records, "error": error, "usage": batch_usage(fields, results)}
+
+    def _batch_done(self, applier, outcome):
+        """主线程：记录一个完成的批次"""
+        self.batches += 1
+        self.updated += len(outcome["records"])
+        if outcome["error"] is not None:
+            self.failed_batches += 1
+            self.log(f"❌ 批次 {outcome['index'] + 1} 调用失败: {outcome['error']}")
+        if self.memory is not None:
+            self.memory.add_records(outcome["records"])
+        # 按轮次为当前轮；连续队列为本批编号的第几次发送（在记录发送次数之前计算）
+        round_no = self.rounds if self.mode == ROUNDS else 1 + max(
+            (self.attempts.attempts.get(k, 0) for k in outcome["keys"]), default=0)
+        usage = self.usage.record(outcome["index"], round_no, outcome["keys"], outcome["usage"])
+        exhausted = self.attempts.record(outcome["keys"], outcome["candidates"], {r["编号"] for r in outcome["records"]})
+        if exhausted:
+            self.log(f"⏸️ {len(exhausted)} 个编号已发送 {self.attempts.max_attempts} 次仍未通过，搁置待复核")
+        self.on_event("batch", dict(outcome, progress=applier.progress(), exhausted=exhausted, usage=usage,
+                                    usage_total={"tokens": self.usage.tokens, "cost": self.usage.cost}))
+        return exhausted
+
+    def _log_usage_rounds(self, rounds):
+        for r in rounds:
+            label = f"第 {r['轮次']} 轮" if self.mode == ROUNDS else f"第 {r['轮次']} 次发送"
+            line = (f"💰 {label}: {r['批次数']} 批次，Token 输入 {r['输入 Token']} / 输出 {r['输出 Token']}，"
+                    f"费用 {r['费用']:.4f}")
+            if r["估算批次"]:
+                line += f"（{r['估算批次']} 个批次为估算）"
+            self.log(line)
+
+    def summary(self):
+        """运行统计：批次数、失败批次、接受的译文数、每分钟翻译编号数与 Token / 费用"""
+        elapsed = ((self.finished or time.perf_counter()) - self.started) if self.started else 0.0
+        return {
+            "轮数": self.rounds,
+            "批次数": self.batches,
+            "失败批次": self.failed_batches,
+            "翻译记忆预填": self.prefilled,
+            "Workflow 接受": self.updated,
+            **self.attempts.summary(),
+            "耗时(秒)": round(elapsed, 2),
+            "每分钟翻译编号数": round(self.updated / elapsed * 60, 1) if elapsed else 0.0,
+            **self.usage.summary(self.updated),
+        }
+
+    # ---------------------------
+    # 按轮次
+    # ---------------------------
+    def run_rounds(self, loop_interval=DEFAULT_LOOP_INTERVAL):
+        """按轮次循环：检查 → 全部批次 → 等待 → 下一轮"""
+        self.started = time.perf_counter()
+        self.mode = ROUNDS
+        while not self.should_stop():
+            self.rounds += 1
+            self.log(f"\n{'='*60}")
+            self.log(f"第 {self.rounds} 轮迭代开始 (时间: {datetime.now().strftime('%H:%M:%S')})")
+            self.log(f"{'='*60}")
+
+            applier, df_result = self._check()
+            pending_count = self._active_count(applier)
+            self.log(f"当前待翻译字段数: {pending_count}（另有搁置待复核 {len(applier.pending) - pending_count}）")
+            if pending_count <= self.threshold:
+                self.log(f"✅ 待翻译字段数 ({pending_count}) ≤ 阈值 ({self.threshold})，自动停止")
+                break
+
+            keys = self._prefill(applier, df_result, self._pending_queue(applier, df_result)).ordered()
+            if not keys:
+                if not self._active_count(applier):
+                    self.log("⏸️ 剩余待翻译编号均已搁置待复核，自动停止")
+                    break
+                continue
+            batches = [keys[i:i + self.batch_size] for i in range(0, len(keys), self.batch_size)]
+            self.log(f"构建 {len(batches)} 批次，每批最多 {self.batch_size} 条")
+            self.on_event("round", {"round": self.rounds, "batches": len(batches)})
+
+            results_count = 0
+            with ThreadPoolExecutor(max_workers=min(len(batches), self.workers)) as executor:
+                futures = [executor.submit(bind(self._run_batch), applier, batch, i) for i, batch in enumerate(batches)]
+                for future in as_completed(futures):
+                    outcome = future.result()
+                    results_count += len(outcome["results"])
+                    self._batch_done(applier, outcome)
+
+            stats = applier.iteration_stats
+            self.log(f"✅ Workflow 调用完成，获得 {results_count} 条结果，解析 {applier.parsed_count} 条有效内容")
+            if applier.parsed_count:
+                self.log(f"📊 迭代统计:")
+                self.log(f"  - 总条目: {stats['total_in_iteration']}")
+                self.log(f"  - 匹配原文: {stats['matched_in_original']}")
+                self.log(f"  - 已更新: {stats['updated_translations']}")
+                self.log(f"  - 被跳过: {stats['skipped_not_iterable']}")
+                self.log(f"  - 标签分布: {stats['iteration_labels_distribution']}")
+                self.log(f"  - 剩余待翻译: {self._active_count(applier)}，搁置待复核: {len(self.attempts.parked)}")
+            else:
+                self.log(f"⚠️ 未获得有效迭代内容")
+            self._log_usage_rounds([r for r in self.usage.by_round() if r["轮次"] == self.rounds])
+            self.on_event("round_done", {"round": self.rounds, "stats": stats})
+
+            self.log(f"等待 {loop_interval} 秒后进行下一轮...")
+            for _ in range(int(loop_interval)):
+                if self.should_stop():
+                    self.log("✋ 用户已停止自动化")
+                    break
+                time.sleep(1)
+        return self._finish()
+
+    # ---------------------------
+    # 连续队列
+    # ---------------------------
+    def run_queue(self):
+        """连续队列：工作线程空闲即按优先级取下一批，未通过的编号合并后以原优先级回到队列"""
+        if not self._queue_start():
+            return self._finish()
+        in_flight = {}
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            while True:
+                while len(in_flight) < self.workers:
+                    task = self._queue_take()
+                    if task is None:
+                        break
+                    in_flight[executor.submit(bind(self._run_batch), self._applier, *task)] = task
+                if not in_flight:
+                    break
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    del in_flight[future]
+                    self._queue_done(future.result())
+        return self._queue_finish()
+
+    # 连续队列的各个步骤：run_queue 与 MultiLanguageRun 共用，调度（线程池、并发数）由调用方负责
+    def _queue_start(self):
+        """检查长度并建立待翻译队列；不需要发送时返回 False"""
+        self.started = time.perf_counter()
+        self.mode = QUEUE
+        self.rounds = 1
+        applier, df_result = self._check()
+        pending_count = self._active_count(applier)
+        self.log(f"连续队列开始 (时间: {datetime.now().strftime('%H:%M:%S')})，当前待翻译字段数: {pending_count}")
+        if pending_count <= self.threshold:
+            self.log(f"✅ 待翻译字段数 ({pending_count}) ≤ 阈值 ({self.threshold})，自动停止")
+            return False
+
+        self._applier = applier
+        # 已搁置且仍待翻译的编号数（在预填之前计算）：搁置只发生在批次完成时，随之累加
+        self._parked_pending = len(applier.pending) - pending_count
+        self._queue = self._prefill(applier, df_result, self._pending_queue(applier, df_result))
+        self._priorities = {k: self._queue.priority(k) for k in self._queue.ordered()}
+        self._next_index = 0
+        self._requeued = 0
+        self.on_event("queue", {"queued": len(self._queue)})
+        return True
+
+    def _queue_stopping(self):
+        return self.should_stop() or len(self._applier.pending) - self._parked_pending <= self.threshold
+
+    def _queue_take(self):
+        """按优先级取下一批 (编号列表, 批次序号)；队列为空或已达到停止条件时返回 None"""
+        if not self._queue or self._queue_stopping():
+            return None
+        keys = self._queue.pop_batch(self.batch_size)
+        self._next_index += 1
+        return keys, self._next_index - 1
+
+    def _queue_done(self, outcome):
+        """记录完成的批次，未通过且未搁置的编号回到队列（同优先级排在已排队编号之后）"""
+        applier = self._applier
+        exhausted = self._batch_done(applier, outcome)
+        self._parked_pending += sum(1 for k in exhausted if k in applier.pending)
+        retry = [k for k in outcome["keys"] if k in applier.pending and not self.attempts.is_parked(k)]
+        for k in retry:
+            self._queue.push(k, self._priorities[k])
+        self._requeued += len(retry)
+
+    def _queue_finish(self):
+        applier = self._applier
+        pending_count = len(applier.pending) - self._parked_pending
+        if self.should_stop():
+            self.log("✋ 用户已停止自动化")
+        elif pending_count <= self.threshold:
+            self.log(f"✅ 待翻译字段数 ({pending_count}) ≤ 阈值 ({self.threshold})，自动停止")
+        stats = applier.iteration_stats
+        self.log(f"📊 共 {self.batches} 批次，解析 {applier.parsed_count} 条，已更新 {stats['updated_translations']} 条，"
+                 f"被跳过 {stats['skipped_not_iterable']} 条，重新入队 {self._requeued} 次，剩余待翻译 {pending_count}，"
+                 f"搁置待复核 {len(self.attempts.parked)}，无效发送 {self.attempts.wasted} 次")
+        self._log_usage_rounds(self.usage.by_round())
+        return self._finish()
+
+    def _finish(self):
+        self.finished = time.perf_counter()
+        summary = self.summary()
+        self.log(f"\n{'='*60}")
+        self.log(f"自动化完成 (轮数: {self.rounds}，批次: {self.batches}，每分钟翻译 {summary['每分钟翻译编号数']} 条)")
+        self.log(f"💰 {self.usage.describe(self.updated)}")
+        self.log(f"{'='*60}")
+        return summary
+
+    def run(self, mode=QUEUE, loop_interval=DEFAULT_LOOP_INTERVAL):
+        return self.run_rounds(loop_interval) if mode == ROUNDS else self.run_queue()
+
+
+class MultiLanguageRun:
+    """
+    多语言自动化：同一原文的多个目标语言在一个任务中运行（连续队列）
+    - 原文只解析、对齐并计算长度一次（prepare_source），各语言每次检查只对齐自己的译文；
+    - 所有语言共用一个线程池，workers 为全局并发预算；
+    - 有空闲并发时按语言轮流取批次，某个语言的待翻译再多也不会占满全部并发；
+    - 每个语言有自己的待翻译队列、发送记录、停止阈值和统计。
+    call_batch(fields, batch_index, language) 调用对应语言的 Workflow；
+    on_event 的数据中多一个 language 字段；thresholds 可以是整数或 {语言: 阈值}
+    """
+
+    def __init__(self, original_dict, translation_dicts, statuses, iterable_labels, export_labels, call_batch,
+                 metric=DEFAULT_METRIC, markup=None, thresholds=DEFAULT_STOP_THRESHOLD, workers=MAX_WORKERS,
+                 on_event=None, should_stop=None, **options):
+        self.workers = workers
+        self.on_event = on_event or (lambda kind, data: None)
+        self.source = prepare_source(original_dict, metric, markup)
+        self.logs = []
+        self.runs = OrderedDict()
+        for lang, translation_dict in translation_dicts.items():
+            threshold = thresholds.get(lang, DEFAULT_STOP_THRESHOLD) if isinstance(thresholds, dict) else thresholds
+            run = AutomationRun(
+                original_dict, translation_dict, statuses, iterable_labels, export_labels,
+                lambda fields, index, lang=lang: call_batch(fields, index, lang),
+                metric=metric, markup=markup, threshold=threshold, workers=workers,
+                on_event=lambda kind, data, lang=lang: self.on_event(kind, dict(data, language=lang)),
+                should_stop=should_stop, source=self.source, name=lang, **options
+            )
+            # 各语言的日志按发生顺序写入同一个列表
+            run.logs = self.logs
+            self.runs[lang] = run
+        self.started = None
+        self.finished = None
+
+    def run(self):
+        """运行到所有语言都达到各自的停止条件（或被停止），返回每个语言一行的统计"""
+        self.started = time.perf_counter()
+        active = []
+        for run in self.runs.values():
+            if run._queue_start():
+                active.append(run)
+            else:
+                run._finish()
+        in_flight = {}
+        cursor = 0
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            while True:
+                # 从上次停下的语言开始轮流取批次，直到用满并发预算或所有语言都没有可发送的批次
+                idle = 0
+                while active and len(in_flight) < self.workers and idle < len(active):
+                    run = active[cursor % len(active)]
+                    cursor += 1
+                    task = run._queue_take()
+                    if task is None:
+                        idle += 1
+                        continue
+                    idle = 0
+                    in_flight[executor.submit(bind(run._run_batch), run._applier, *task)] = run
+                # 没有在途批次、也不能再发送的语言已经结束：记录完成时间，不再参与轮转
+                busy = set(in_flight.values())
+                for run in [r for r in active if r not in busy and (not r._queue or r._queue_stopping())]:
+                    run._queue_finish()
+                    active.remove(run)
+                if not in_flight:
+                    break
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    in_flight.pop(future)._queue_done(future.result())
+        for run in active:
+            run._queue_finish()
+        self.finished = time.perf_counter()
+        accepted = sum(run.updated for run in self.runs.values())
+        calls = sum(run.usage.calls for run in self.runs.values())
+        tokens = sum(run.usage.tokens for run in self.runs.values())
+        cost = sum(run.usage.cost for run in self.runs.values())
+        self.logs.append(f"💰 全部语言: {calls} 次调用，Token {tokens}，费用 {cost:.4f}"
+                         + (f"，每接受编号费用 {cost / accepted:.6f}" if accepted else ""))
+        return self.summary()
+
+    def summary(self):
+        """每个语言一行：语言 + AutomationRun.summary()"""
+        return [OrderedDict([("语言", lang)] + list(run.summary().items())) for lang, run in self.runs.items()]
+
+    def usage_records(self):
+        """所有语言按轮次的 Token 与费用（带 语言 列）"""
+        return [OrderedDict([("语言", lang)] + list(row.items())) for lang, run in self.runs.items() for row in run.usage.by_round()]
+
+    def review_records(self):
+        """所有语言的待复核列表（带 语言 列）"""
+        return [dict(record, 语言=lang) for lang, run in self.runs.items() for record in run.attempts.review_records()]
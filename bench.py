@@ -0,0 +1,533 @@
+"""
+基准测试：用合成语料为各热点路径计时，结果与保存的基线对比（不启动 Streamlit）：
+
+    python bench.py                                  # 默认规模，与 bench_baseline.json 对比
+    python bench.py --scales 10000 100000 1000000    # 指定规模（编号数）
+    python bench.py --save --rounds 3                # 把本次结果写为新的基线（多轮取最快，减少抖动）
+    python bench.py --check                          # 任一项比基线慢超过允许范围，或内置标记规则回归样例不通过时返回 1
+    python bench.py --cases parse_txt process_iteration
+    python bench.py --scaling 1000000 --metric 显示宽度   # 多进程分片分类在不同进程数下的加速比
+    python bench.py --automation 2000                # 本地桩 Workflow 上对比 连续队列 / 按轮次 的每分钟翻译编号数
+    python bench.py --automation 2000 --stuck-rate 0.05 --max-attempts 3   # 5% 编号永远不通过时的无效发送
+    python bench.py --automation 2000 --candidates 1 3   # 每个编号请求 1 / 3 个候选时的平均通过发送次数
+
+合成语料：中日韩与拉丁文本按比例混合，数字编号（可改为字符串编号），
+文本长度服从对数正态分布，可按比例复制已有文本模拟重复的 UI 文案。
+同一规模、同一随机种子生成的语料完全相同，结果可以跨版本对比。
+
+基线须在 requirements.txt 固定的 numpy / pandas / pyarrow 版本上生成（--save 在版本不一致时拒绝保存），
+--check 在当前环境与基线的 Python / numpy / pandas / pyarrow 版本不一致时拒绝对比并返回 2
+（--allow-version-mismatch 可以跳过这两项检查，结果仅供参考）。
+每项除最快耗时外还记录噪声：各次耗时的下四分位数比最快慢多少；多轮时取各轮的中位数，并且不小于
+单轮最快耗时比多轮最快慢多少的中位数（单轮 --check 与多轮基线对比时的正常差距）。允许的变慢比例为
+--tolerance 加上 NOISE_FACTOR 倍的噪声（取基线与本次中较大的），毫秒级的小规模用例不会因抖动误报；
+--check 时超出范围的项会单独复测一次，取两次中较快的再判断。
+"""
+import argparse
+import gc
+import io
+import json
+import os
+import platform
+import random
+import sys
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from core import (
+    DEFAULT_STATUSES, parse_txt, calculate_length_status, process_iteration, compute_cell_tags,
+    merge_files_to_excel, merge_language_dicts, export_language_files,
+)
+from automation import DEFAULT_MAX_ATTEMPTS, MODES, AutomationRun
+from markup import check_default_patterns
+from metrics import DEFAULT_METRIC, METRIC_NAMES
+import shard
+from workflow import parse_workflow_results
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_baseline.json")
+REQUIREMENTS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "requirements.txt")
+DEFAULT_SCALES = [10_000, 100_000]
+DEFAULT_REPEAT = 5
+MIN_TOTAL_SECONDS = 2.0
+MAX_REPEAT = 200
+DEFAULT_TOLERANCE = 0.2
+NOISE_FACTOR = 1
+# 影响计时、须与基线一致的版本
+PINNED_PACKAGES = ["numpy", "pandas", "pyarrow"]
+VERSION_KEYS = ["python"] + PINNED_PACKAGES
+LANGUAGES = ["en", "es", "de"]
+WORKFLOW_BATCH_SIZE = 10
+
+# 常用汉字区段与拉丁音节，用于拼出“像样”的文本
+_CJK = np.arange(0x4E00, 0x4E00 + 3500, dtype=np.uint32)
+_SYLLABLES = ["ka", "to", "ri", "na", "se", "lo", "mi", "du", "re", "pa", "ven", "tar", "gol", "sol", "der", "ion"]
+
+
+# ---------------------------
+# 合成语料
+# ---------------------------
+def _lengths(rng, n, mean_len, sigma):
+    return np.maximum(1, rng.lognormal(np.log(mean_len), sigma, n).astype(np.int64))
+
+
+def _cjk_texts(rng, lengths):
+    cps = rng.choice(_CJK, int(lengths.sum()))
+    text = cps.astype("<u4").tobytes().decode("utf-32-le")
+    ends = np.cumsum(lengths)
+    return [text[e - n:e] for e, n in zip(ends.tolist(), lengths.tolist())]
+
+
+def _latin_texts(rng, lengths):
+    # 音节拼成 6 个字符左右的单词，凑够目标长度后截断
+    syllables = rng.integers(0, len(_SYLLABLES), int(lengths.sum()))
+    texts, pos = [], 0
+    for n in lengths.tolist():
+        words, word, total = [], "", 0
+        while total < n:
+            word += _SYLLABLES[syllables[pos % len(syllables)]]
+            pos += 1
+            total += 2
+            if len(word) >= 6:
+                words.append(word)
+                word = ""
+        if word:
+            words.append(word)
+        texts.append(" ".join(words).capitalize()[:n].rstrip())
+    return texts
+
+
+def make_keys(n, seed=0, numeric=True):
+    """递增但不连续的数字编号（如 10000123），numeric=False 时为 ui_xxx 形式的字符串编号"""
+    rng = np.random.default_rng(seed)
+    ids = 10_000_000 + np.cumsum(rng.integers(1, 50, n))
+    if numeric:
+        return [str(i) for i in ids.tolist()]
+    return [f"ui_{i:x}" for i in ids.tolist()]
+
+
+def make_texts(n, seed=0, cjk_ratio=0.7, dup_ratio=0.1, mean_len=18, sigma=0.6):
+    """n 条文本：cjk_ratio 比例为中日韩文本，其余为拉丁文本；dup_ratio 比例复制前面已有的文本"""
+    rng = np.random.default_rng(seed)
+    lengths = _lengths(rng, n, mean_len, sigma)
+    is_cjk = rng.random(n) < cjk_ratio
+    texts = np.empty(n, dtype=object)
+    texts[is_cjk] = _cjk_texts(rng, lengths[is_cjk])
+    texts[~is_cjk] = _latin_texts(rng, lengths[~is_cjk])
+    dup = np.flatnonzero(rng.random(n) < dup_ratio)
+    dup = dup[dup > 0]
+    texts[dup] = texts[rng.integers(0, dup)]
+    return texts.tolist()
+
+
+def make_corpus(n, seed=0, numeric_keys=True, cjk_ratio=0.7, dup_ratio=0.1, mean_len=18, sigma=0.6):
+    """{编号: 原文}"""
+    return dict(zip(make_keys(n, seed, numeric_keys), make_texts(n, seed, cjk_ratio, dup_ratio, mean_len, sigma)))
+
+
+def make_translation(original_dict, seed=1, coverage=0.95, ratio_sigma=0.5):
+    """
+    拉丁文译文：长度为原文的 1.5 倍左右（对数正态扰动，覆盖过短/合格/过长），
+    coverage 比例的编号有译文
+    """
+    rng = np.random.default_rng(seed)
+    keys = list(original_dict.keys())
+    orig_lens = np.fromiter((len(v) for v in original_dict.values()), dtype=np.float64, count=len(keys))
+    lengths = np.maximum(1, (orig_lens * rng.lognormal(np.log(1.5), ratio_sigma, len(keys))).astype(np.int64))
+    texts = _latin_texts(rng, lengths)
+    keep = rng.random(len(keys)) < coverage
+    return {k: t for k, t, m in zip(keys, texts, keep) if m}
+
+
+def kv_bytes(mapping):
+    return "\n".join(f"{k}={v}" for k, v in mapping.items()).encode("utf-8")
+
+
+def _named_file(data, name):
+    f = io.BytesIO(data)
+    f.name = name
+    return f
+
+
+def workflow_payloads(mapping, batch_size=WORKFLOW_BATCH_SIZE):
+    """模拟 Workflow MESSAGE 事件解码后的结果：每批一个 {"download_url": ["编号=译文", ...]}"""
+    items = [f"{k}={v}" for k, v in mapping.items()]
+    return [{"download_url": items[i:i + batch_size]} for i in range(0, len(items), batch_size)]
+
+
+# ---------------------------
+# 基准用例：setup(n) 准备输入（不计时），返回无参函数（计时）
+# ---------------------------
+def _setup_parse_txt(n):
+    data = kv_bytes(make_corpus(n))
+    return lambda: parse_txt(data)
+
+
+def _setup_length_status(n):
+    original = make_corpus(n)
+    translation = make_translation(original)
+    return lambda: calculate_length_status(original, translation, DEFAULT_STATUSES)
+
+
+def _setup_process_iteration(n):
+    original = make_corpus(n)
+    translation = make_translation(original)
+    iteration = make_translation(original, seed=2, coverage=0.1)
+    # process_iteration 会原地更新译文字典，每次计时使用新的副本
+    return lambda: process_iteration(original, dict(translation), iteration, ["合格"], DEFAULT_STATUSES)
+
+
+def _language_data(n):
+    original = make_corpus(n)
+    data = OrderedDict([("zh", original)])
+    for i, lang in enumerate(LANGUAGES):
+        data[lang] = make_translation(original, seed=10 + i)
+    return data
+
+
+def _setup_cell_tags(n):
+    df = merge_language_dicts(_language_data(n))
+    return lambda: compute_cell_tags(df, DEFAULT_STATUSES, "zh")
+
+
+def _setup_merge_files(n):
+    data = _language_data(n)
+    raw = [(kv_bytes(mapping), f"{lang}.txt") for lang, mapping in data.items()]
+    names = list(data.keys())
+    return lambda: merge_files_to_excel([_named_file(b, name) for b, name in raw], names)
+
+
+def _setup_export_languages(n):
+    df = merge_language_dicts(_language_data(n))
+    return lambda: export_language_files(df)
+
+
+def _setup_workflow_results(n):
+    payloads = workflow_payloads(make_translation(make_corpus(n), coverage=1.0))
+    return lambda: parse_workflow_results(payloads)
+
+
+CASES = OrderedDict([
+    ("parse_txt", _setup_parse_txt),
+    ("calculate_length_status", _setup_length_status),
+    ("process_iteration", _setup_process_iteration),
+    ("compute_cell_tags", _setup_cell_tags),
+    ("merge_files_to_excel", _setup_merge_files),
+    ("export_language_files", _setup_export_languages),
+    ("parse_workflow_results", _setup_workflow_results),
+])
+
+
+def run_case(name, n, repeat=DEFAULT_REPEAT):
+    """
+    返回 (最快一次的秒数, 噪声)：至少运行 repeat 次；小规模时继续重复到累计 MIN_TOTAL_SECONDS，
+    减少毫秒级用例的抖动。噪声为各次耗时下四分位数相对最快一次的比例（对比用的是最快一次，中位数会高估其波动）
+    """
+    fn = CASES[name](n)
+    times = []
+    best, total, runs = float("inf"), 0.0, 0
+    while runs < repeat or (total < MIN_TOTAL_SECONDS and runs < MAX_REPEAT):
+        # 与 timeit 相同，计时期间关闭垃圾回收
+        gc.collect()
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            fn()
+            elapsed = time.perf_counter() - start
+        finally:
+            gc.enable()
+        best = min(best, elapsed)
+        total += elapsed
+        runs += 1
+        times.append(elapsed)
+    return best, float(np.percentile(times, 25)) / best - 1 if best > 0 else 0.0
+
+
+def environment():
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "pyarrow": pa.__version__,
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def pinned_versions(path=REQUIREMENTS_FILE):
+    """requirements.txt 中 PINNED_PACKAGES 的固定版本 {包名: 版本}"""
+    pins = {}
+    if not os.path.exists(path):
+        return pins
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            name, sep, version = line.split("#", 1)[0].strip().partition("==")
+            if sep and name.strip().lower() in PINNED_PACKAGES:
+                pins[name.strip().lower()] = version.strip()
+    return pins
+
+
+def version_mismatches(expected, env, keys=VERSION_KEYS):
+    """expected 与 env 中版本不一致的项，如 ["pandas 3.0.6（应为 2.3.2）"]"""
+    return [f"{k} {env.get(k)}（应为 {expected[k]}）" for k in keys if k in expected and env.get(k) != expected[k]]
+
+
+def run_suite(cases, scales, repeat=DEFAULT_REPEAT, progress=None):
+    """返回 ({"用例@规模": 秒数}, {"用例@规模": 噪声})"""
+    results, noise = OrderedDict(), OrderedDict()
+    for n in scales:
+        for name in cases:
+            seconds, spread = run_case(name, n, repeat)
+            results[f"{name}@{n}"] = seconds
+            noise[f"{name}@{n}"] = spread
+            if progress:
+                progress(name, n, seconds)
+    return results, noise
+
+
+def worker_counts(max_workers=None):
+    """1, 2, 4, ... 直到 CPU 数（含 CPU 数本身）"""
+    max_workers = max_workers or os.cpu_count() or 1
+    counts, w = [], 1
+    while w < max_workers:
+        counts.append(w)
+        w *= 2
+    return counts + [max_workers]
+
+
+def run_scaling(n, workers_list=None, metric=DEFAULT_METRIC, languages=LANGUAGES, repeat=2, progress=None):
+    """
+    多进程分片分类（build_length_matrix_sharded）在不同进程数下的耗时
+    每个进程数先运行一次预热（启动进程池、构建度量表），再取 repeat 次中最快一次
+    返回每行 {进程数, 耗时(ms), 加速比, 并行效率}
+    """
+    original_dict = make_corpus(n)
+    translation_dicts = OrderedDict((lang, make_translation(original_dict, seed=i + 1)) for i, lang in enumerate(languages))
+    rows, single = [], None
+    for workers in workers_list or worker_counts():
+        def fn():
+            shard.build_length_matrix_sharded(original_dict, translation_dicts, DEFAULT_STATUSES, metric, workers=workers)
+        fn()
+        best = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            best = min(best, time.perf_counter() - start)
+        single = single or best
+        rows.append({"进程数": workers, "耗时(ms)": round(best * 1000, 1),
+                     "加速比": round(single / best, 2), "并行效率": f"{single / best / workers:.0%}"})
+        if progress:
+            progress(workers, best)
+    shard.shutdown()
+    return pd.DataFrame(rows)
+
+
+def stub_workflow(latency=0.2, sigma=0.5, pass_rate=0.6, failure_rate=0.02, stuck_rate=0.0, candidates=1, seed=0):
+    """
+    本地桩 Workflow：每次调用耗时服从中位数 latency 秒的对数正态分布，按 failure_rate 抛出异常，
+    每条返回 candidates 个候选，每个候选以 pass_rate 的概率与原文等长（合格），否则只有首字符（过短）；
+    按编号哈希选出的 stuck_rate 比例的编号永远返回过短译文
+    返回的结构与 Coze MESSAGE 内容相同：[{"download_url": ["编号=译文", ...]}]
+    """
+    rng = random.Random(seed)
+    lock = threading.Lock()
+
+    def stuck(key):
+        return zlib.crc32(key.encode("utf-8")) % 10000 < stuck_rate * 10000
+
+    def call_batch(fields, batch_index):
+        with lock:
+            delay = latency * rng.lognormvariate(0, sigma)
+            failed = rng.random() < failure_rate
+            passes = [[rng.random() < pass_rate for _ in range(candidates)] for _ in fields]
+        time.sleep(delay)
+        if failed:
+            raise RuntimeError("桩 Workflow 调用失败")
+        items = []
+        for field, oks in zip(fields, passes):
+            key, text = field.split("=", 1)
+            for i, ok in enumerate(oks):
+                # 不合格的候选长度各不相同，避免被当作重复候选去掉
+                items.append(f"{key}={text if ok and not stuck(key) else text[:1] + '…' * i}")
+        return [{"download_url": items}]
+
+    return call_batch
+
+
+def run_automation(n, modes=MODES, loop_interval=1, threshold=0, progress=None, max_attempts=DEFAULT_MAX_ATTEMPTS,
+                   candidate_counts=(1,), **stub_options):
+    """
+    在本地桩 Workflow 上运行自动化：n 个编号初始均无译文（全部过短），直到待翻译数 ≤ threshold
+    或剩余编号均达到 max_attempts 次发送上限；每种调度方式 × 每个候选数各运行一次，
+    返回每行一个 AutomationRun.summary() 加 调度方式、候选数 列
+    """
+    original_dict = make_corpus(n)
+    statuses = DEFAULT_STATUSES
+    rows = []
+    for candidates in candidate_counts:
+        for mode in modes:
+            run = AutomationRun(original_dict, {}, statuses, [statuses[0]["name"]], ["过短", "过长"],
+                                stub_workflow(candidates=candidates, **stub_options), threshold=threshold,
+                                max_attempts=max_attempts)
+            summary = run.run(mode, loop_interval)
+            rows.append(OrderedDict([("调度方式", mode), ("候选数", candidates)] + list(summary.items())))
+            if progress:
+                progress(f"{mode} × {candidates}", summary)
+    return pd.DataFrame(rows)
+
+
+def load_baseline(path=BASELINE_FILE):
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_baseline(results, noise, path=BASELINE_FILE):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({
+            "created": int(time.time()),
+            "environment": environment(),
+            "requirements": pinned_versions(),
+            "results": {k: round(v, 6) for k, v in results.items()},
+            "noise": {k: round(v, 4) for k, v in noise.items()},
+        }, f, ensure_ascii=False, indent=2)
+        f.write("\n")
+
+
+def compare(results, baseline, tolerance=DEFAULT_TOLERANCE, noise=None):
+    """
+    与基线对比：每项一行 {用例, 规模, 耗时(ms), 基线(ms), 变化, 允许, 回退}
+    允许的变慢比例为 tolerance + NOISE_FACTOR × max(基线噪声, 本次噪声)
+    """
+    base = (baseline or {}).get("results", {})
+    base_noise = (baseline or {}).get("noise", {})
+    noise = noise or {}
+    rows = []
+    for key, seconds in results.items():
+        name, n = key.rsplit("@", 1)
+        allowed = tolerance + NOISE_FACTOR * max(base_noise.get(key, 0.0), noise.get(key, 0.0))
+        row = {"用例": name, "规模": int(n), "耗时(ms)": round(seconds * 1000, 1),
+               "基线(ms)": None, "变化": "", "允许": f"+{allowed:.0%}", "回退": False}
+        if key in base and base[key] > 0:
+            change = seconds / base[key] - 1
+            row["基线(ms)"] = round(base[key] * 1000, 1)
+            row["变化"] = f"{change:+.1%}"
+            row["回退"] = change > allowed
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="翻译工具热点路径基准测试")
+    parser.add_argument("--scales", nargs="+", type=int, default=DEFAULT_SCALES, help="语料规模（编号数）")
+    parser.add_argument("--cases", nargs="+", choices=list(CASES), default=list(CASES), help="只运行指定用例")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="每项重复次数（取最快一次）")
+    parser.add_argument("--rounds", type=int, default=1, help="整套用例运行轮数，每项取各轮最快（机器负载不稳时生成基线用）")
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="基线文件")
+    parser.add_argument("--save", action="store_true", help="把本次结果保存为基线")
+    parser.add_argument("--check", action="store_true", help="有回退时返回非零退出码")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="允许比基线慢的比例（另加 %d 倍噪声），默认 0.2" % NOISE_FACTOR)
+    parser.add_argument("--allow-version-mismatch", action="store_true",
+                        help="版本与 requirements.txt（--save）或基线（--check）不一致时仍然保存 / 对比")
+    parser.add_argument("--scaling", type=int, default=0, metavar="N",
+                        help="只测多进程分片分类：N 个编号 × %d 个语言在 1、2、4…CPU 数个进程下的加速比" % len(LANGUAGES))
+    parser.add_argument("--workers", nargs="+", type=int, help="--scaling 使用的进程数列表")
+    parser.add_argument("--metric", choices=METRIC_NAMES, default=DEFAULT_METRIC, help="--scaling 使用的长度计算方式")
+    parser.add_argument("--automation", type=int, default=0, metavar="N",
+                        help="只测自动化调度：N 个编号在本地桩 Workflow 上对比 连续队列 / 按轮次")
+    parser.add_argument("--latency", type=float, default=0.2, help="--automation 桩 Workflow 单次调用的中位耗时（秒）")
+    parser.add_argument("--pass-rate", type=float, default=0.6, help="--automation 每条译文通过长度检查的概率")
+    parser.add_argument("--loop-interval", type=int, default=1, help="--automation 按轮次的循环间隔（秒）")
+    parser.add_argument("--stuck-rate", type=float, default=0.0, help="--automation 永远不通过长度检查的编号比例")
+    parser.add_argument("--max-attempts", type=int, default=DEFAULT_MAX_ATTEMPTS,
+                        help="--automation 单个编号最多发送次数（0 为不限，此时 --stuck-rate 需配合 --threshold）")
+    parser.add_argument("--threshold", type=int, default=0, help="--automation 停止阈值（待翻译数）")
+    parser.add_argument("--candidates", nargs="+", type=int, default=[1], help="--automation 每个编号请求的候选数（可多个，逐一对比）")
+    args = parser.parse_args(argv)
+
+    if args.automation:
+        report = run_automation(args.automation, loop_interval=args.loop_interval, threshold=args.threshold,
+                                max_attempts=args.max_attempts, latency=args.latency, pass_rate=args.pass_rate,
+                                stuck_rate=args.stuck_rate, candidate_counts=args.candidates,
+                                progress=lambda mode, s: print(f"  {mode}  {s['耗时(秒)']:8.2f} s  {s['每分钟翻译编号数']:10.1f} 条/分钟", flush=True))
+        print()
+        print(report.to_string(index=False))
+        return 0
+
+    if args.scaling:
+        print("环境: " + ", ".join(f"{k} {v}" for k, v in environment().items()))
+        report = run_scaling(args.scaling, args.workers, args.metric,
+                             progress=lambda w, s: print(f"  进程数 {w:>3}  {s * 1000:10.1f} ms", flush=True))
+        print()
+        print(report.to_string(index=False))
+        return 0
+
+    def progress(name, n, seconds):
+        print(f"  {name:<26} {n:>9,}  {seconds * 1000:10.1f} ms", flush=True)
+
+    # 计时之前先确认内置标记规则的剔除结果没有回归
+    pattern_failures = check_default_patterns()
+    for name, text, expected, actual in pattern_failures:
+        print(f"标记规则回归：{name}  {text!r} 应剔除为 {expected!r}，实际为 {actual!r}")
+
+    env = environment()
+    print("环境: " + ", ".join(f"{k} {v}" for k, v in env.items()))
+    baseline = load_baseline(args.baseline)
+    # 版本不一致时的计时不可比：先检查再计时
+    unpinned = version_mismatches(pinned_versions(), env)
+    if unpinned:
+        print("注意：与 requirements.txt 固定的版本不一致: " + ", ".join(unpinned))
+        if args.save and not args.allow_version_mismatch:
+            print("拒绝保存基线：请在固定版本的环境中生成（或加 --allow-version-mismatch）")
+            return 2
+    drift = version_mismatches(baseline["environment"], env) if baseline else []
+    if drift:
+        print("注意：与基线的版本不一致: " + ", ".join(drift))
+        if args.check and not args.allow_version_mismatch:
+            print("拒绝对比：请在基线的版本上运行，或重新生成基线（或加 --allow-version-mismatch）")
+            return 2
+
+    results, noise = run_suite(args.cases, args.scales, args.repeat, progress)
+    rounds = [(results, noise)]
+    for _ in range(args.rounds - 1):
+        rounds.append(run_suite(args.cases, args.scales, args.repeat, progress))
+    results = OrderedDict((k, min(r[k] for r, _ in rounds)) for k in results)
+    # 取各轮的中位数：个别轮次整体受机器负载影响时不放大噪声
+    noise = OrderedDict((k, max(float(np.median([n[k] for _, n in rounds])),
+                                float(np.median([r[k] for r, _ in rounds])) / results[k] - 1))
+                        for k in results)
+
+    report = compare(results, baseline, args.tolerance, noise)
+    if args.check and report["回退"].any():
+        # 单独复测超出范围的项，排除整套运行中偶发的机器负载
+        print(f"\n复测 {int(report['回退'].sum())} 项")
+        for row in report[report["回退"]].itertuples():
+            key = f"{row.用例}@{row.规模}"
+            seconds, spread = run_case(row.用例, row.规模, args.repeat)
+            progress(row.用例, row.规模, seconds)
+            noise[key] = max(noise[key], spread)
+            results[key] = min(results[key], seconds)
+        report = compare(results, baseline, args.tolerance, noise)
+    print()
+    print(report.to_string(index=False))
+    if baseline and not drift and baseline.get("environment") != env:
+        print("\n注意：基线在不同的机器上生成: " + json.dumps(baseline.get("environment"), ensure_ascii=False))
+
+    if args.save:
+        save_baseline(results, noise, args.baseline)
+        print(f"\n已保存基线: {args.baseline}")
+    regressions = int(report["回退"].sum())
+    if regressions:
+        print(f"\n{regressions} 项比基线慢且超出允许范围")
+    return 1 if args.check and (regressions or pattern_failures) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,346 @@
+"""
+命令行批处理入口（不启动 Streamlit）：
+
+    python cli.py check  原文.txt 译文目录/ -o out/ [--iteration 迭代目录/] [--split-lines 500] [--previous 上一版原文.txt]
+                         [--glossary 术语表.xlsx|术语库链接] [--shards 8]
+    python cli.py merge  语言目录/ -o combined_languages.xlsx   （-o 以 .arrow 结尾时保存为项目快照）
+    python cli.py split  combined_languages.xlsx -o out/ [--format ini] [--zip]   （也可传入 .arrow 快照）
+
+check 会对每个译文文件执行长度检查（可选迭代合并），多个语言文件通过进程池并行处理，
+输出与“长度检查”页面相同的 筛选原文 txt/zip、最新翻译 txt，以及统计汇总。
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import zipfile
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from core import (
+    DEFAULT_STATUSES, parse_txt, parse_ini_file, calculate_length_status, compute_statistics,
+    process_iteration, merge_language_dicts, export_language_files, filter_by_labels,
+    format_kv_lines, write_split_zip, language_name,
+)
+from keyindex import KeyIndex, format_bytes
+from markup import DEFAULT_MARKUP_PATTERNS, build_markup_patterns
+from metrics import DEFAULT_METRIC, METRIC_NAMES
+from shard import calculate_length_status_sharded
+from snapshot import SNAPSHOT_EXT, read_snapshot, write_snapshot
+from sourcediff import carry_over, complete_translation, diff_sources, diff_summary, queued_original
+from terminology import TermMatcher, annotate_terminology, count_violations, fetch_glossary, load_glossary
+
+TEXT_EXTS = (".txt", ".ini")
+
+
+def collect_files(paths, exts=TEXT_EXTS):
+    """展开命令行中的文件/目录参数，目录内按文件名排序"""
+    files = []
+    for p in paths:
+        if os.path.isdir(p):
+            for name in sorted(os.listdir(p)):
+                if name.lower().endswith(exts):
+                    files.append(os.path.join(p, name))
+        else:
+            files.append(p)
+    return files
+
+
+def load_statuses(path):
+    if not path:
+        return DEFAULT_STATUSES
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def write_text(path, text):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+# ---------------------------
+# check：长度检查 + 迭代合并（进程池中每个语言文件一个任务）
+# ---------------------------
+_worker_original = None
+_worker_key_index = None
+_worker_incremental = None
+
+
+def _init_worker(original_dict, key_index=None, incremental=None):
+    # 原文只解析一次、编号索引只建一次，由进程池初始化时下发到每个工作进程
+    # incremental: 增量模式下的 {"diff": 原文版本差异, "order": 新版原文的全部编号}
+    global _worker_original, _worker_key_index, _worker_incremental
+    _worker_original = original_dict
+    _worker_key_index = key_index
+    _worker_incremental = incremental
+
+
+def check_one(task):
+    original_dict = _worker_original
+    key_index = _worker_key_index
+    incremental = _worker_incremental
+    start = time.perf_counter()
+    lang = task["lang"]
+    statuses = task["statuses"]
+    out_dir = task["out_dir"]
+
+    uploaded_translation = translation_dict = parse_txt(task["translation"])
+    if incremental:
+        translation_dict = carry_over(translation_dict, incremental["diff"])
+    iteration_stats = None
+    if task.get("iteration"):
+        iteration_dict = parse_txt(task["iteration"])
+        translation_dict, _, iteration_stats, _ = process_iteration(
+            original_dict, translation_dict, iteration_dict, task["iterable_labels"], statuses,
+            task["metric"], task["markup"]
+        )
+
+    if task.get("shards"):
+        df_result, stats_df = calculate_length_status_sharded(original_dict, translation_dict, statuses, task["metric"], task["markup"],
+                                                              key_index, task["shards"])
+    else:
+        df_result = calculate_length_status(original_dict, translation_dict, statuses, task["metric"], task["markup"], key_index)
+        stats_df = compute_statistics(df_result, statuses, total_field="原文")
+    if task.get("matcher") is not None:
+        df_result = annotate_terminology(df_result, task["matcher"])
+
+    export_df = filter_by_labels(df_result, task["export_labels"])
+    split_lines = task["split_lines"]
+    if not export_df.empty:
+        if split_lines > 0:
+            with open(os.path.join(out_dir, f"{lang}_筛选原文拆分.zip"), "wb") as f:
+                write_split_zip(f, export_df["编号"], export_df["原文"], split_lines, task["compresslevel"])
+        else:
+            write_text(os.path.join(out_dir, f"{lang}_筛选原文.txt"),
+                       format_kv_lines(export_df["编号"], export_df["原文"]))
+
+    stale = []
+    if incremental:
+        # 按新版原文顺序输出每个编号：沿用的译文 + 迭代更新的译文，修改但未更新的编号保留旧译文并单独列出待复核
+        translation_dict, stale = complete_translation(incremental["order"], translation_dict, uploaded_translation,
+                                                       incremental["diff"])
+        if stale:
+            write_text(os.path.join(out_dir, f"{lang}_待复核旧译文.txt"),
+                       format_kv_lines(stale, [original_dict[k] for k in stale]))
+    write_text(os.path.join(out_dir, f"{lang}_最新翻译.txt"),
+               format_kv_lines(translation_dict.keys(), translation_dict.values()))
+    if task["xlsx"]:
+        with pd.ExcelWriter(os.path.join(out_dir, f"{lang}_长度检查.xlsx"), engine="openpyxl") as writer:
+            df_result.to_excel(writer, index=False, sheet_name="长度检查")
+            stats_df.to_excel(writer, index=False, sheet_name="统计")
+
+    return {
+        "lang": lang,
+        "stats": stats_df,
+        "pending": len(export_df),
+        "iteration_stats": iteration_stats,
+        "stale": len(stale),
+        "term_violations": count_violations(df_result) if task.get("matcher") is not None else None,
+        "seconds": time.perf_counter() - start,
+    }
+
+
+def cmd_check(args):
+    start = time.perf_counter()
+    statuses = load_statuses(args.statuses)
+    status_names = [s["name"] for s in statuses]
+    iterable_labels = args.iterable or [status_names[0]]
+    export_labels = args.export or [n for n in status_names if n in ["过短", "过长"]]
+    markup = build_markup_patterns(list(DEFAULT_MARKUP_PATTERNS) if args.ignore_markup else [], args.markup_regex)
+
+    original_dict = parse_txt(args.original)
+    incremental = None
+    if args.previous:
+        # 增量模式：只检查新增/修改的编号
+        diff = diff_sources(parse_txt(args.previous), original_dict)
+        incremental = {"diff": diff, "order": list(original_dict.keys())}
+        original_dict = queued_original(original_dict, diff)
+        summary = diff_summary(diff)
+        print("原文版本差异：" + " / ".join(f"{k} {v}" for k, v in summary.items()))
+    key_index = KeyIndex(original_dict.keys())
+    matcher = None
+    if args.glossary:
+        try:
+            glossary = fetch_glossary(args.glossary) if args.glossary.startswith(("http://", "https://")) else load_glossary(args.glossary)
+        except (OSError, ValueError) as e:
+            print(f"无法读取术语表: {e}", file=sys.stderr)
+            return 1
+        matcher = TermMatcher(glossary)
+        print(f"术语表 {len(matcher)} 条")
+    translations = [f for f in collect_files(args.translations)
+                    if os.path.abspath(f) != os.path.abspath(args.original)]
+    if not translations:
+        print("未找到译文文件", file=sys.stderr)
+        return 1
+
+    # 迭代文件按语言名（文件名）与译文对应
+    iterations = {}
+    if args.iteration:
+        iterations = {language_name(f): f for f in collect_files(args.iteration)}
+
+    os.makedirs(args.output, exist_ok=True)
+    tasks = []
+    for path in translations:
+        lang = language_name(path)
+        tasks.append({
+            "lang": lang,
+            "translation": path,
+            "iteration": iterations.get(lang),
+            "statuses": statuses,
+            "iterable_labels": iterable_labels,
+            "export_labels": export_labels,
+            "split_lines": args.split_lines,
+            "compresslevel": args.compresslevel,
+            "out_dir": args.output,
+            "xlsx": args.xlsx,
+            "metric": args.metric,
+            "markup": markup,
+            "matcher": matcher,
+            "shards": args.shards,
+        })
+
+    # 分片模式：语言依次处理，每个语言的长度检查按编号区间分给 --shards 个进程
+    workers = 1 if args.shards else args.workers or min(len(tasks), os.cpu_count() or 1)
+    parse_seconds = time.perf_counter() - start
+    if workers <= 1:
+        _init_worker(original_dict, key_index, incremental)
+        results = [check_one(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(original_dict, key_index, incremental)) as executor:
+            results = list(executor.map(check_one, tasks))
+
+    # 统计汇总：每个语言一行
+    summary_rows = []
+    for res in results:
+        row = {"语言": res["lang"]}
+        for rec in res["stats"].to_dict("records"):
+            row[rec["类型"]] = rec["数量"]
+        row["待翻译字段数"] = res["pending"]
+        if res["term_violations"] is not None:
+            row["术语缺失"] = res["term_violations"]
+        if res["iteration_stats"]:
+            row["迭代已更新"] = res["iteration_stats"]["updated_translations"]
+            row["迭代被跳过"] = res["iteration_stats"]["skipped_not_iterable"]
+        if incremental:
+            row["保留旧译文"] = res["stale"]
+        row["耗时(秒)"] = round(res["seconds"], 3)
+        summary_rows.append(row)
+    summary_df = pd.DataFrame(summary_rows)
+    summary_df.to_csv(os.path.join(args.output, "统计汇总.csv"), index=False, encoding="utf-8-sig")
+
+    print(summary_df.to_string(index=False))
+    total_keys = len(original_dict) * len(tasks)
+    elapsed = time.perf_counter() - start
+    if args.shards:
+        print(f"\n原文 {len(original_dict)} 条 × {len(tasks)} 个语言，分片进程数 {args.shards}")
+    else:
+        print(f"\n原文 {len(original_dict)} 条 × {len(tasks)} 个语言，进程数 {workers}")
+    report = key_index.memory_report()
+    if report["整数索引"]:
+        print(f"编号索引：整数 {format_bytes(report['索引字节数'])}，字符串约 {format_bytes(report['字符串索引字节数(估算)'])}，"
+              f"节省 {format_bytes(report['节省字节数'])}")
+    else:
+        print("编号索引：包含非数字编号，使用字符串索引")
+    print(f"原文解析 {parse_seconds:.3f}s，总耗时 {elapsed:.3f}s（{total_keys / elapsed:,.0f} 条/秒）")
+    return 0
+
+
+def cmd_merge(args):
+    start = time.perf_counter()
+    files = collect_files(args.inputs)
+    if not files:
+        print("未找到可合并的文件", file=sys.stderr)
+        return 1
+
+    workers = args.workers or min(len(files), os.cpu_count() or 1)
+    if workers <= 1:
+        parsed = [parse_ini_file(f) for f in files]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            parsed = list(executor.map(parse_ini_file, files))
+
+    language_data = OrderedDict((language_name(f), d) for f, d in zip(files, parsed))
+    df = merge_language_dicts(language_data)
+    if args.output.lower().endswith("." + SNAPSHOT_EXT):
+        write_snapshot(args.output, df, base_language=next(iter(language_data)))
+    else:
+        df.to_excel(args.output, index=False, engine="openpyxl")
+
+    print(f"总条目数: {len(df)}")
+    for lang in language_data:
+        print(f"{lang}: 缺失 {(df[lang] == '').sum()} 条")
+    print(f"已写入 {args.output}，耗时 {time.perf_counter() - start:.3f}s")
+    return 0
+
+
+def cmd_split(args):
+    start = time.perf_counter()
+    if args.input.lower().endswith("." + SNAPSHOT_EXT):
+        df, _ = read_snapshot(args.input)
+    else:
+        df = pd.read_excel(args.input, engine="openpyxl")
+    files_dict = export_language_files(df, args.format)
+    os.makedirs(args.output, exist_ok=True)
+    if args.zip:
+        zip_path = os.path.join(args.output, f"languages_{int(time.time())}.zip")
+        with zipfile.ZipFile(zip_path, "w") as zf:
+            for filename, content in files_dict.items():
+                zf.writestr(filename, content.encode("utf-8"))
+        print(f"已写入 {zip_path}")
+    else:
+        for filename, content in files_dict.items():
+            write_text(os.path.join(args.output, filename), content)
+    print(f"已生成 {len(files_dict)} 个文件，耗时 {time.perf_counter() - start:.3f}s")
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="本地化工作流辅助工具 - 命令行批处理")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("check", help="长度检查（可选迭代合并）")
+    p.add_argument("original", help="原文文件 (.txt)")
+    p.add_argument("translations", nargs="+", help="译文文件或目录")
+    p.add_argument("-o", "--output", default="output", help="输出目录")
+    p.add_argument("--iteration", nargs="+", help="迭代文件或目录（按文件名与译文对应）")
+    p.add_argument("--previous", help="上一版原文：只检查新增/修改的编号，未变编号沿用现有译文")
+    p.add_argument("--statuses", help="标签配置 JSON（[{name,min,max,color}]），默认合格/过短/过长")
+    p.add_argument("--iterable", nargs="+", help="可迭代标签，默认第一个标签")
+    p.add_argument("--export", nargs="+", help="导出标签，默认 过短 过长")
+    p.add_argument("--metric", choices=METRIC_NAMES, default=DEFAULT_METRIC, help="长度计算方式")
+    p.add_argument("--ignore-markup", action="store_true", help="长度计算时忽略全部内置占位符/富文本标记")
+    p.add_argument("--markup-regex", default="", help="额外忽略的自定义正则")
+    p.add_argument("--split-lines", type=int, default=0, help="每个拆分文件行数，0 表示不拆分")
+    p.add_argument("--compresslevel", type=int, choices=range(10), default=0, help="拆分 zip 压缩级别，0 表示不压缩")
+    p.add_argument("--xlsx", action="store_true", help="同时导出每个语言的长度检查 xlsx")
+    p.add_argument("--glossary", help="术语表文件（txt/csv/tsv/xlsx）或术语库链接：标记原文含源术语而译文缺少目标术语的字段")
+    p.add_argument("-j", "--workers", type=int, default=0, help="进程数，默认按 CPU 和文件数")
+    p.add_argument("--shards", type=int, default=0,
+                   help="按编号区间分片的进程数：语言依次处理，单个语言的长度检查用多进程（编号数百万、语言较少时使用）")
+    p.set_defaults(func=cmd_check)
+
+    p = sub.add_parser("merge", help="合并多语言 txt/ini 为 xlsx")
+    p.add_argument("inputs", nargs="+", help="语言文件或目录（首个文件为基础语言）")
+    p.add_argument("-o", "--output", default="combined_languages.xlsx", help="输出 xlsx 或 .arrow 项目快照")
+    p.add_argument("-j", "--workers", type=int, default=0, help="进程数")
+    p.set_defaults(func=cmd_merge)
+
+    p = sub.add_parser("split", help="将 xlsx 拆分为各语言 txt/ini")
+    p.add_argument("input", help="xlsx 文件或 .arrow 项目快照（需包含 编号 列）")
+    p.add_argument("-o", "--output", default="output", help="输出目录")
+    p.add_argument("--format", choices=["txt", "ini"], default="txt")
+    p.add_argument("--zip", action="store_true", help="打包为 ZIP")
+    p.set_defaults(func=cmd_split)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
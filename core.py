@@ -0,0 +1,482 @@
+"""
+与 Streamlit 无关的核心处理逻辑：解析、长度检查、迭代合并、多语言合并与拆分。
+各个 tab 和命令行批处理（cli.py）共用这里的实现，保证页面与流水线输出一致。
+"""
+import io
+import itertools
+import os
+import zipfile
+from collections import OrderedDict, namedtuple
+
+import numpy as np
+import pandas as pd
+import pyarrow.compute as pc
+
+from keyindex import KeyIndex
+from markup import visible_length, visible_lengths
+from metrics import CODE_POINTS, DEFAULT_METRIC, as_str_list, to_arrow_text
+from stats import count_non_empty, summarize
+from timing import span, timed
+
+WRITE_CHUNK_LINES = 4096
+
+# 语料文本列统一用 Arrow 字符串类型：比 object 列紧凑，长度/非空判断直接走 Arrow compute
+TEXT_DTYPE = pd.StringDtype("pyarrow")
+
+DEFAULT_STATUSES = [
+    {"name": "合格", "min": -0.4, "max": 2, "color": "#00A000"},
+    {"name": "过短", "min": -99999, "max": -0.4, "color": "#0071A6"},
+    {"name": "过长", "min": 2, "max": 99999, "color": "#A60000"}
+]
+
+
+def read_bytes(source):
+    """读取 UploadedFile / BytesIO / bytes / 文件路径 的原始字节"""
+    if isinstance(source, (bytes, bytearray)):
+        return bytes(source)
+    if hasattr(source, "getvalue"):
+        return source.getvalue()
+    with open(source, "rb") as f:
+        return f.read()
+
+
+@timed("解析")
+def parse_txt(file):
+    """解析 编号=内容 格式的文本（tab1 / tab7 / tab8 的规则）"""
+    result = {}
+    # 使用 utf-8-sig 自动移除 BOM，并用 errors='replace' 防止奇怪编码报错
+    text = read_bytes(file).decode("utf-8-sig", errors="replace")
+    for line in text.splitlines():
+        if "=" in line:
+            key, value = line.split("=", 1)
+            key = key.strip()
+            value = value.strip()
+            if key:  # 忽略空 key
+                result[key] = value
+    return result
+
+
+@timed("解析")
+def parse_ini_file(file):
+    """解析单个 txt/ini 文件返回编号->内容字典（跳过空行和 ; # 注释，tab3 的规则）"""
+    content_dict = {}
+    for line in read_bytes(file).decode('utf-8').splitlines():
+        line = line.strip()
+        if not line or line.startswith(';') or line.startswith('#'):
+            continue
+        if '=' in line:
+            key, value = line.split('=', 1)
+            content_dict[key.strip()] = value.strip()
+    return content_dict
+
+
+def match_status(ratio, statuses):
+    """按顺序返回第一个区间包含 ratio 的标签名，没有匹配时返回 None"""
+    for s in statuses:
+        s_min = float("-inf") if s.get("min") is None else s["min"]
+        s_max = float("inf") if s.get("max") is None else s["max"]
+        if s_min <= ratio <= s_max:
+            return s["name"]
+    return None
+
+
+def calculate_single_status(orig_text, trans_text, statuses, metric=DEFAULT_METRIC, markup=None):
+    orig_len = visible_length(orig_text, metric, markup)
+    trans_len = visible_length(trans_text, metric, markup)
+
+    if orig_len == 0:
+        return "原文为空"
+
+    ratio = (trans_len - orig_len) / orig_len
+    ratio = round(ratio, 4)
+
+    status = match_status(ratio, statuses)
+    return "未分类" if status is None else status
+
+
+def text_series(values):
+    """构建 Arrow 字符串列（TEXT_DTYPE，缺失值为 NA）；已是 Arrow 字符串的数据不复制"""
+    return pd.Series(pd.arrays.ArrowStringArray(to_arrow_text(values)))
+
+
+def align_translation(keys, translation_dict):
+    """按原文编号顺序对齐译文，缺失的编号补空字符串；keys 可传入已建好的 KeyIndex 复用"""
+    index = keys if isinstance(keys, KeyIndex) else KeyIndex(keys)
+    return text_series(index.align(translation_dict))
+
+
+def compute_ratios(orig_lens, trans_lens):
+    """向量化计算 (译文长度 - 原文长度) / 原文长度，保留 4 位小数；原文为空的位置为 NaN"""
+    orig_lens = np.asarray(orig_lens, dtype=np.float64)
+    trans_lens = np.asarray(trans_lens, dtype=np.float64)
+    ratios = np.full(orig_lens.shape, np.nan)
+    np.divide(trans_lens - orig_lens, orig_lens, out=ratios, where=orig_lens != 0)
+    return np.round(ratios, 4)
+
+
+def code_labels(statuses):
+    """标签编号对应的标签名：0..len(statuses)-1 为各标签，其后依次为 未分类、原文为空"""
+    return [s["name"] for s in statuses] + ["未分类", "原文为空"]
+
+
+def classify_ratio_codes(ratios, statuses):
+    """
+    向量化版本的 match_status，返回 int16 标签编号（见 code_labels）：按顺序取第一个命中的标签
+    NaN（原文为空）为 原文为空，未命中任何区间为 未分类
+    """
+    codes = np.full(len(ratios), len(statuses), dtype=np.int16)
+    # 倒序赋值，使排在前面的标签覆盖后面的，等价于“首个命中”
+    for i in range(len(statuses) - 1, -1, -1):
+        s = statuses[i]
+        s_min = float("-inf") if s.get("min") is None else s["min"]
+        s_max = float("inf") if s.get("max") is None else s["max"]
+        codes[(ratios >= s_min) & (ratios <= s_max)] = i
+    codes[np.isnan(ratios)] = len(statuses) + 1
+    return codes
+
+
+def classify_ratios(ratios, statuses):
+    """同 classify_ratio_codes，返回标签名的 object 数组"""
+    return np.asarray(code_labels(statuses), dtype=object)[classify_ratio_codes(ratios, statuses)]
+
+
+def format_ratio_percent(ratios):
+    return [f"{r*100:.2f}%" if r == r else "" for r in ratios]
+
+
+# 原文一侧的检查数据：编号索引、编号列、原文列、原文长度；同一原文多次检查（多轮、多语言）时复用
+SourceTexts = namedtuple("SourceTexts", ["key_index", "keys", "texts", "lengths", "metric", "markup"])
+
+
+def prepare_source(original_dict, metric=DEFAULT_METRIC, markup=None, key_index=None):
+    """对齐并计算原文长度一次，结果可传给 calculate_length_status(source=...) 复用"""
+    with span("对齐"):
+        if key_index is None:
+            key_index = KeyIndex(original_dict.keys())
+        keys = text_series(key_index.keys)
+        texts = text_series(list(original_dict.values()))
+    with span("分类"):
+        lengths = visible_lengths(texts, metric, markup)
+    return SourceTexts(key_index, keys, texts, lengths, metric, markup)
+
+
+def calculate_length_status(original_dict, translation_dict, statuses, metric=DEFAULT_METRIC, markup=None, key_index=None,
+                            source=None):
+    """source: prepare_source 的结果（须与 metric / markup 一致），传入时不再重新对齐原文、计算原文长度"""
+    if source is None:
+        source = prepare_source(original_dict, metric, markup, key_index)
+    with span("对齐"):
+        trans_series = align_translation(source.key_index, translation_dict)
+    with span("分类"):
+        orig_lens = source.lengths
+        trans_lens = visible_lengths(trans_series, metric, markup)
+        ratios = compute_ratios(orig_lens, trans_lens)
+        tags = text_series(classify_ratios(ratios, statuses))
+
+    return pd.DataFrame({
+        "编号": source.keys,
+        "原文": source.texts,
+        "译文": trans_series,
+        "原文长度": orig_lens,
+        "译文长度": trans_lens,
+        "比值": ratios,
+        "比值(%)": text_series(format_ratio_percent(ratios)),
+        "标签": tags
+    })
+
+
+def build_length_matrix(original_dict, translation_dicts, statuses, metric=DEFAULT_METRIC, markup=None, key_index=None):
+    """
+    多语言长度检查矩阵：原文只解析、计算长度一次，所有语言一起对齐并分类
+    translation_dicts: OrderedDict 语言名 -> {编号: 译文}
+    返回 (matrix_df, texts_df)
+      matrix_df: 编号 / 原文 / 每个语言一列标签
+      texts_df:  编号 / 原文 / 每个语言一列译文（用于统计与导出）
+    """
+    # 编号索引只建一次，所有语言共用（数字编号时为 int64 数组查找）
+    with span("对齐"):
+        if key_index is None:
+            key_index = KeyIndex(original_dict.keys())
+        keys = text_series(key_index.keys)
+        orig_series = text_series(list(original_dict.values()))
+    with span("分类"):
+        orig_lens = visible_lengths(orig_series, metric, markup)
+
+    tag_columns = OrderedDict([("编号", keys), ("原文", orig_series)])
+    text_columns = OrderedDict([("编号", keys), ("原文", orig_series)])
+    for lang, translation_dict in translation_dicts.items():
+        with span("对齐"):
+            trans_series = align_translation(key_index, translation_dict)
+        with span("分类"):
+            trans_lens = visible_lengths(trans_series, metric, markup)
+            tag_columns[lang] = text_series(classify_ratios(compute_ratios(orig_lens, trans_lens), statuses))
+        text_columns[lang] = trans_series
+    return pd.DataFrame(tag_columns), pd.DataFrame(text_columns)
+
+
+@timed("分类")
+def compute_cell_tags(df, statuses, base_col, metric=DEFAULT_METRIC, markup=None):
+    """
+    整合工作台的单元格标签：每个非基础语言列相对基础语言列分类
+    返回 {语言列: 标签数组}，基础语言为空或未命中任何区间时标签为 None
+    """
+    tag_columns = {}
+    # 直接在原列上计算长度（Arrow 字符串列零拷贝，空值长度为 0），不再逐列复制为 object/str
+    base_lens = visible_lengths(df[base_col], metric, markup)
+    for col in df.columns:
+        if col == '编号' or col == base_col:
+            continue
+        tags = classify_ratios(compute_ratios(base_lens, visible_lengths(df[col], metric, markup)), statuses)
+        tags[(tags == "原文为空") | (tags == "未分类")] = None
+        tag_columns[col] = tags
+    return tag_columns
+
+
+def language_statistics_frame(total_valid, summaries, statuses):
+    """
+    每语言统计表：summaries 为 OrderedDict 语言名 -> {"non_empty": 译文有效字段数, "tags": {标签: 数量}}
+    占比以原文有效字段数 total_valid 为分母
+    """
+    records = []
+    for lang, summary in summaries.items():
+        rec = {"语言": lang, "原文有效字段数量": total_valid, "译文有效字段数量": summary["non_empty"]}
+        for s in statuses:
+            count = summary["tags"].get(s["name"], 0)
+            ratio = (count / total_valid * 100) if total_valid else 0
+            rec[s["name"]] = f"{count} ({ratio:.2f}%)"
+        records.append(rec)
+    return pd.DataFrame(records)
+
+
+@timed("统计")
+def compute_language_statistics(matrix_df, texts_df, statuses):
+    """每个语言一行：原文/译文有效字段数量 + 各标签数量与占比（口径同 compute_statistics）"""
+    langs = [c for c in matrix_df.columns if c not in ("编号", "原文")]
+    summaries = OrderedDict()
+    for lang in langs:
+        summary = summarize(matrix_df[lang], OrderedDict([(lang, texts_df[lang])]))
+        summaries[lang] = {"non_empty": summary["non_empty"][lang], "tags": summary["tags"]}
+    return language_statistics_frame(count_non_empty(texts_df["原文"]), summaries, statuses)
+
+
+def build_language_exports(matrix_df, labels, part_prefix="筛选原文"):
+    """每个语言按标签筛选出原文，返回 {文件名: 内容}"""
+    labels = list(labels)
+    files = {}
+    for lang in [c for c in matrix_df.columns if c not in ("编号", "原文")]:
+        selected = matrix_df[matrix_df[lang].isin(labels)]
+        if selected.empty:
+            continue
+        files[f"{lang}_{part_prefix}.txt"] = format_kv_lines(selected["编号"], selected["原文"])
+    return files
+
+
+def statistics_frame(total_valid, trans_valid, tag_counts, statuses, total_field="原文"):
+    """单语言统计表：有效字段数量 + 各标签数量与占比（以 total_valid 为分母）"""
+    records = []
+    records.append({"类型": f"{total_field}有效字段数量", "数量": total_valid, "占比": ""})
+    records.append({"类型": "译文有效字段数量", "数量": trans_valid, "占比": ""})
+    for s in statuses:
+        count = tag_counts.get(s["name"], 0)
+        ratio = (count / total_valid * 100) if total_valid else 0
+        records.append({"类型": s["name"], "数量": count, "占比": f"{ratio:.2f}%"})
+    return pd.DataFrame(records)
+
+
+@timed("统计")
+def compute_statistics(df, statuses, total_field="原文"):
+    summary = summarize(df["标签"], OrderedDict([(total_field, df[total_field]), ("译文", df["译文"])]))
+    return statistics_frame(summary["non_empty"][total_field], summary["non_empty"]["译文"], summary["tags"], statuses, total_field)
+
+
+@timed("迭代合并")
+def process_iteration(original_dict, translation_dict, iteration_dict, iterable_labels, custom_statuses, metric=DEFAULT_METRIC, markup=None):
+    """
+    Apply iteration dict to translation_dict according to iterable_labels and custom_statuses.
+    Returns: (new_translation_dict, updated_records, iteration_stats, iteration_labels_count)
+    """
+    iteration_stats = {
+        "total_in_iteration": 0,
+        "matched_in_original": 0,
+        "updated_translations": 0,
+        "skipped_not_iterable": 0,
+        "iteration_labels_distribution": {}
+    }
+
+    updated_records = []
+    iteration_labels_count = {}
+
+    if not iteration_dict:
+        return translation_dict, updated_records, iteration_stats, iteration_labels_count
+
+    iteration_stats["total_in_iteration"] = len(iteration_dict)
+    iterable_labels_norm = [label.strip() for label in iterable_labels]
+
+    if metric != CODE_POINTS or markup:
+        # 先批量计算长度写入缓存，循环里的单条计算直接命中
+        matched = [k for k in iteration_dict if k in original_dict]
+        visible_lengths([original_dict[k] for k in matched] + [iteration_dict[k] for k in matched]
+                        + [translation_dict.get(k, "") for k in matched], metric, markup)
+
+    for key, iteration_value in iteration_dict.items():
+        if key not in original_dict:
+            # key not in original, skip
+            continue
+        iteration_stats["matched_in_original"] += 1
+        original_text = original_dict[key]
+        iteration_label = calculate_single_status(original_text, iteration_value, custom_statuses, metric, markup)
+        iteration_labels_count[iteration_label] = iteration_labels_count.get(iteration_label, 0) + 1
+
+        if iteration_label not in iterable_labels_norm:
+            iteration_stats["skipped_not_iterable"] += 1
+            continue
+
+        old_translation = translation_dict.get(key, "")
+        translation_dict[key] = iteration_value
+        iteration_stats["updated_translations"] += 1
+
+        # build updated_records for display
+        orig_len = visible_length(original_text, metric, markup)
+        if orig_len == 0:
+            original_ratio = None
+            original_ratio_pct = ""
+            new_ratio = None
+            new_ratio_pct = ""
+        else:
+            original_ratio = round((visible_length(old_translation, metric, markup) - orig_len) / orig_len, 4)
+            original_ratio_pct = f"{original_ratio*100:.2f}%"
+            new_ratio = round((visible_length(iteration_value, metric, markup) - orig_len) / orig_len, 4)
+            new_ratio_pct = f"{new_ratio*100:.2f}%"
+
+        updated_records.append({
+            "编号": key,
+            "原文": original_text,
+            "原译文": old_translation,
+            "新译文": iteration_value,
+            "原比值": original_ratio,
+            "原比值(%)": original_ratio_pct,
+            "新比值": new_ratio,
+            "新比值(%)": new_ratio_pct,
+            "新标签": iteration_label
+        })
+
+    iteration_stats["iteration_labels_distribution"] = iteration_labels_count
+    return translation_dict, updated_records, iteration_stats, iteration_labels_count
+
+
+@timed("多语言合并")
+def merge_language_dicts(language_data):
+    """
+    合并多个 {编号: 内容} 字典（OrderedDict，列名 -> 字典）到 DataFrame
+    首个语言为基础语言，先按其编号顺序排列，其余文件独有编号排序后追加
+    """
+    language_names = list(language_data.keys())
+    base_language = language_names[0]
+
+    # 基础语言编号顺序 + 其他文件独有编号（基础语言编号建索引，批量找出不在其中的编号）
+    base_index = KeyIndex(language_data[base_language].keys())
+    extra_keys = set()
+    for lang in language_names[1:]:
+        lang_keys = list(language_data[lang].keys())
+        missing = ~base_index.contains(lang_keys)
+        extra_keys.update(k for k, m in zip(lang_keys, missing) if m)
+    if extra_keys:
+        key_index = KeyIndex(base_index.keys + sorted(extra_keys))
+    else:
+        key_index = base_index
+
+    result_data = OrderedDict()
+    result_data['编号'] = text_series(key_index.keys)
+    for lang in language_names:
+        result_data[lang] = text_series(key_index.align(language_data[lang]))
+
+    return pd.DataFrame(result_data)
+
+
+def merge_files_to_excel(files, custom_names):
+    """
+    合并多个文件到 DataFrame，列名使用 custom_names
+    返回 df
+    """
+    language_data = OrderedDict()
+    for idx, file in enumerate(files):
+        language_data[custom_names[idx]] = parse_ini_file(file)
+    return merge_language_dicts(language_data)
+
+
+@timed("导出")
+def export_language_files(df, output_format="txt"):
+    """
+    根据 DataFrame 拆分生成各语言文件，返回 {文件名: 内容}
+    """
+    if '编号' not in df.columns:
+        raise ValueError("Excel文件中缺少 '编号' 列！")
+
+    created_files = {}
+    ids = df['编号'].astype(str).str.strip()
+    language_columns = [col for col in df.columns if col != '编号']
+    for lang in language_columns:
+        values = pc.fill_null(to_arrow_text(df[lang]), "").to_pylist()
+        buffer = io.StringIO()
+        for id_value, cell_value in zip(ids, values):
+            buffer.write(f"{id_value}={cell_value}\n")
+        created_files[f"{lang}.{output_format}"] = buffer.getvalue()
+    return created_files
+
+
+def filter_by_labels(df_result, labels):
+    """按标签筛选长度检查结果（导出条件）"""
+    return df_result[df_result["标签"].isin(list(labels))]
+
+
+def format_kv_lines(keys, values):
+    # Arrow 字符串列逐个迭代很慢，先整列转为 Python 列表
+    return "\n".join(f"{k}={v}" for k, v in zip(as_str_list(keys), as_str_list(values)))
+
+
+@timed("导出")
+def write_split_zip(target, keys, values, split_lines, compresslevel=0, part_prefix="筛选原文"):
+    """
+    把 编号=原文 行按 split_lines 拆分为多个 txt，逐行流式写入 target 中的 zip，返回文件数
+    compresslevel 为 0 时不压缩（ZIP_STORED），1-9 使用 ZIP_DEFLATED 对应级别
+    """
+    if compresslevel:
+        compression = zipfile.ZIP_DEFLATED
+    else:
+        compression, compresslevel = zipfile.ZIP_STORED, None
+    total_lines = len(keys)
+    num_parts = (total_lines + split_lines - 1) // split_lines
+    rows = zip(as_str_list(keys), as_str_list(values))
+    with zipfile.ZipFile(target, "w", compression=compression, compresslevel=compresslevel) as zip_file:
+        for i in range(num_parts):
+            remaining = min(split_lines, total_lines - i * split_lines)
+            with zip_file.open(f"{part_prefix}_part_{i+1}.txt", "w") as part:
+                # 每次写入一小段行，避免在内存中拼出整个分卷
+                first = True
+                while remaining > 0:
+                    chunk = list(itertools.islice(rows, min(remaining, WRITE_CHUNK_LINES)))
+                    remaining -= len(chunk)
+                    text = "\n".join(f"{k}={v}" for k, v in chunk)
+                    part.write((text if first else "\n" + text).encode("utf-8"))
+                    first = False
+    return num_parts
+
+
+def split_zip_download(export_df, split_lines, compresslevel=0, part_prefix="筛选原文"):
+    """
+    拆分导出的延迟下载：返回 (生成 zip 字节的无参函数, 文件数)，函数直接作为 st.download_button 的 data，
+    点击下载时才写压缩包；页面重跑不再每次生成一遍（下载按钮对文件流同样会整体读成 bytes）
+    """
+    keys, values = export_df["编号"], export_df["原文"]
+    num_parts = (len(keys) + split_lines - 1) // split_lines
+
+    def build():
+        buffer = io.BytesIO()
+        write_split_zip(buffer, keys, values, split_lines, compresslevel, part_prefix)
+        return buffer.getvalue()
+    return build, num_parts
+
+
+def language_name(path):
+    """文件名（去扩展名）作为语言列名"""
+    return os.path.splitext(os.path.basename(path))[0]
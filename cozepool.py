@@ -0,0 +1,247 @@
+"""
+进程级 Coze 客户端池：按 (Token, Base URL) 复用同一个 Coze 客户端
+
+Streamlit 每次重跑、每个会话原本都会新建 Coze 客户端，HTTP 连接与 TLS 会话无法跨轮次、跨用户复用。
+这里的客户端在进程内长期存在，底层 httpx 连接池保持长连接（keep-alive），连接数上限可配置；
+上限由客户端自己的并发计数控制（每个请求从发出到响应关闭占一个名额），调整时沿用同一个客户端和连接池，
+正在进行的流式请求不受影响，新请求按新上限排队。
+建立 TCP 连接与 TLS 握手的耗时通过 httpcore 的 trace 扩展记录到计时面板（"Coze 建立连接" / "Coze TLS 握手"），
+pool_stats(token, base_url) 给出调用方自己的客户端的请求数、新建连接数与连接复用率（不暴露其他 Token 的客户端）。
+空闲超过 CLIENT_IDLE_SECONDS 的客户端、以及超过 MAX_CLIENTS 个时最久未用的空闲客户端会被关闭并移出；
+调用方应在每次发请求前用 get_client 取客户端，而不是长期持有同一个 Coze 对象。
+
+环境变量 COZE_BASE_URL 可以替换默认的 Base URL（例如指向 mockcoze.py 启动的本地模拟服务做离线压测）。
+"""
+import atexit
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import httpx
+from cozepy import COZE_CN_BASE_URL, Coze, SyncHTTPClient, TokenAuth
+
+from timing import active
+
+DEFAULT_POOL_SIZE = 10
+# 连接池大小的上限（tab8 输入框的最大值），底层 httpx 连接池按它创建
+MAX_POOL_SIZE = 100
+DEFAULT_BASE_URL = os.environ.get("COZE_BASE_URL") or COZE_CN_BASE_URL
+# 空闲长连接保留时间（秒）
+KEEPALIVE_EXPIRY = 120
+# 客户端没有进行中的请求且超过这么久未使用时关闭（秒）
+CLIENT_IDLE_SECONDS = 30 * 60
+# 同时保留的客户端数上限，超出时关闭最久未用的空闲客户端
+MAX_CLIENTS = 16
+
+# trace 事件名前缀 → 计时面板中的阶段名
+_TRACED_STEPS = {
+    "connection.connect_tcp": "Coze 建立连接",
+    "connection.start_tls": "Coze TLS 握手",
+}
+
+_lock = threading.Lock()
+# (Token, Base URL) → _PooledClient，按最近使用排序（最久未用的在前）
+_clients = OrderedDict()
+
+
+class _Limiter:
+    """可调整上限的并发计数：上限调小时已在进行的请求不受影响，新请求等到低于新上限再开始"""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.in_use = 0
+        self._cond = threading.Condition()
+
+    def set_limit(self, limit):
+        with self._cond:
+            self.limit = limit
+            self._cond.notify_all()
+
+    def acquire(self, timeout=None):
+        """占一个名额；timeout 秒内没有空闲名额时返回 False"""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self.in_use < self.limit, timeout):
+                return False
+            self.in_use += 1
+            return True
+
+    def release(self):
+        with self._cond:
+            self.in_use -= 1
+            self._cond.notify()
+
+
+class _ReleasingStream(httpx.SyncByteStream):
+    """响应体关闭时归还并发名额（流式响应在读完或中途关闭时）"""
+
+    def __init__(self, stream, release):
+        self._stream = stream
+        self._release = release
+
+    def __iter__(self):
+        yield from self._stream
+
+    def close(self):
+        try:
+            self._stream.close()
+        finally:
+            release, self._release = self._release, None
+            if release is not None:
+                release()
+
+
+class _LimitedTransport(httpx.BaseTransport):
+    """在 httpx 传输层外按 _Limiter 限制同时进行的请求数；等待名额超过连接池超时时抛出 httpx.PoolTimeout"""
+
+    def __init__(self, transport, limiter):
+        self.transport = transport
+        self.limiter = limiter
+
+    def handle_request(self, request):
+        timeout = request.extensions.get("timeout", {}).get("pool")
+        if not self.limiter.acquire(timeout):
+            raise httpx.PoolTimeout("等待 Coze 连接池名额超时", request=request)
+        try:
+            response = self.transport.handle_request(request)
+        except BaseException:
+            self.limiter.release()
+            raise
+        return httpx.Response(response.status_code, headers=response.headers,
+                              stream=_ReleasingStream(response.stream, self.limiter.release),
+                              extensions=response.extensions)
+
+    def close(self):
+        self.transport.close()
+
+
+class _PooledClient:
+    """一个 (Token, Base URL) 对应的 Coze 客户端及其连接统计"""
+
+    def __init__(self, token, base_url, pool_size):
+        self.token = token
+        self.base_url = base_url
+        self.requests = 0
+        self.connections = 0
+        self.connect_seconds = 0.0
+        self.last_used = time.monotonic()
+        self._lock = threading.Lock()
+        self.limiter = _Limiter(pool_size)
+        transport = httpx.HTTPTransport(limits=httpx.Limits(
+            max_connections=MAX_POOL_SIZE, max_keepalive_connections=MAX_POOL_SIZE, keepalive_expiry=KEEPALIVE_EXPIRY))
+        self.http_client = SyncHTTPClient(
+            transport=_LimitedTransport(transport, self.limiter),
+            event_hooks={"request": [self._on_request]},
+        )
+        self.coze = Coze(auth=TokenAuth(token=token), base_url=base_url, http_client=self.http_client)
+
+    @property
+    def pool_size(self):
+        return self.limiter.limit
+
+    def _on_request(self, request):
+        with self._lock:
+            self.requests += 1
+        self.last_used = time.monotonic()
+        # 事件钩子在发起请求的线程中执行，此时取出该线程激活的 Recorder 交给 trace 回调
+        request.extensions["trace"] = self._tracer(active())
+
+    def _tracer(self, recorder):
+        started = {}
+
+        def trace(event_name, info):
+            step, _, phase = event_name.rpartition(".")
+            name = _TRACED_STEPS.get(step)
+            if name is None:
+                return
+            if phase == "started":
+                started[step] = time.perf_counter()
+            elif phase == "complete" and step in started:
+                seconds = time.perf_counter() - started.pop(step)
+                with self._lock:
+                    self.connect_seconds += seconds
+                    if step == "connection.connect_tcp":
+                        self.connections += 1
+                if recorder is not None:
+                    recorder.record(name, seconds)
+
+        return trace
+
+    def stats(self):
+        with self._lock:
+            reused = max(self.requests - self.connections, 0)
+            return {
+                "Base URL": self.base_url,
+                "Token": self.token[:8] + "…",
+                "连接池大小": self.pool_size,
+                "请求数": self.requests,
+                "新建连接": self.connections,
+                "连接复用率": f"{reused / self.requests:.1%}" if self.requests else "",
+                "建立连接耗时(ms)": round(self.connect_seconds * 1000, 1),
+            }
+
+    def idle(self, now):
+        """没有进行中的请求时，距上次使用的秒数；有进行中的请求时为 None"""
+        if self.limiter.in_use:
+            return None
+        return now - self.last_used
+
+    def close(self):
+        self.http_client.close()
+
+
+def _evict_locked(keep):
+    """移出空闲过久的客户端，以及超过 MAX_CLIENTS 时最久未用的空闲客户端（持有 _lock 时调用），返回待关闭的客户端"""
+    now = time.monotonic()
+    evicted = []
+    for key, pooled in list(_clients.items()):
+        if key == keep:
+            continue
+        idle = pooled.idle(now)
+        if idle is None:
+            continue
+        if idle > CLIENT_IDLE_SECONDS or len(_clients) > MAX_CLIENTS:
+            evicted.append(_clients.pop(key))
+    return evicted
+
+
+def get_client(token, base_url=None, pool_size=DEFAULT_POOL_SIZE):
+    """
+    返回 (token, base_url) 对应的进程级 Coze 客户端，不存在时创建；base_url 默认为 DEFAULT_BASE_URL
+    pool_size（不超过 MAX_POOL_SIZE）变化时沿用同一个客户端，只调整之后请求的并发上限
+    """
+    base_url = base_url or DEFAULT_BASE_URL
+    key = (token, base_url)
+    pool_size = max(1, min(pool_size, MAX_POOL_SIZE))
+    with _lock:
+        pooled = _clients.get(key)
+        if pooled is None:
+            pooled = _clients[key] = _PooledClient(token, base_url, pool_size)
+        else:
+            _clients.move_to_end(key)
+            if pooled.pool_size != pool_size:
+                pooled.limiter.set_limit(pool_size)
+        pooled.last_used = time.monotonic()
+        evicted = _evict_locked(key)
+    for p in evicted:
+        p.close()
+    return pooled.coze
+
+
+def pool_stats(token, base_url=None):
+    """(token, base_url) 对应客户端的连接统计，客户端不存在时返回 None"""
+    with _lock:
+        pooled = _clients.get((token, base_url or DEFAULT_BASE_URL))
+    return pooled.stats() if pooled is not None else None
+
+
+def close_all():
+    """关闭并清空所有池化客户端（进程退出时调用）"""
+    with _lock:
+        pooled = list(_clients.values())
+        _clients.clear()
+    for p in pooled:
+        p.close()
+
+
+atexit.register(close_all)
@@ -0,0 +1,28 @@
+"""
+页面片段：片段内的控件变化只重跑该片段（st.fragment），不重新解析文件、计算标签
+
+    @fragment("结果表格")
+    def result_grid(df):
+        color = st.color_picker(...)   # 改颜色只重绘表格
+        AgGrid(df, ...)
+
+页面整体重跑时片段函数照常执行并返回值；片段单独重跑时返回值被丢弃，片段需要交给页面的值应通过控件的 key
+保存在 session_state 中。片段的执行耗时记入计时面板（"片段：名称"），单独重跑时记为一次重跑。
+"""
+from functools import wraps
+
+import streamlit as st
+
+from timing import fragment_scope
+
+
+def fragment(name):
+    """把函数声明为页面片段，name 为计时面板中的名称"""
+    def decorator(func):
+        @wraps(func)
+        def run(*args, **kwargs):
+            recorder = st.session_state.get("timing_recorder") if st.session_state.get("timing_enabled") else None
+            with fragment_scope(f"片段：{name}", recorder):
+                return func(*args, **kwargs)
+        return st.fragment(run)
+    return decorator
@@ -0,0 +1,122 @@
+"""
+编号索引：编号全部是十进制数字（如 17637612、2587312713）时，用 int64 数组代替字符串保存，
+编号→位置的映射是建立在 int64 数组上的 pandas 整数哈希索引，查找/对齐整列批量完成，
+不再为每个语言构建以字符串为键的 Series/字典。
+含前导零、字母或超出 int64 的编号无法无损转为整数，自动退回字符串字典索引，调用方无需区分。
+"""
+import sys
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# 不含前导零、最多 18 位的十进制数，转换为 int64 后可无损还原
+NUMERIC_KEY_PATTERN = r"^(0|[1-9][0-9]{0,17})$"
+
+
+def numeric_keys(keys):
+    """编号全部可无损转为整数时返回 int64 数组，否则返回 None"""
+    arr = pa.array(keys, type=pa.string())
+    if len(arr) == 0 or arr.null_count:
+        return None
+    if not pc.all(pc.match_substring_regex(arr, NUMERIC_KEY_PATTERN)).as_py():
+        return None
+    return pc.cast(arr, pa.int64()).to_numpy()
+
+
+class KeyIndex:
+    """按原文编号顺序建立的索引，用于把译文/迭代文件对齐到原文行"""
+
+    def __init__(self, keys):
+        self.keys = keys if isinstance(keys, list) else list(keys)
+        self.ids = numeric_keys(self.keys)
+        if self.ids is not None:
+            self._index = pd.Index(self.ids, copy=False)
+            self._positions = None
+        else:
+            self._index = None
+            self._positions = {k: i for i, k in enumerate(self.keys)}
+
+    @property
+    def is_numeric(self):
+        return self.ids is not None
+
+    def __len__(self):
+        return len(self.keys)
+
+    def positions(self, keys):
+        """每个编号在索引中的位置，不存在的为 -1"""
+        keys = keys if isinstance(keys, list) else list(keys)
+        if not keys:
+            return np.empty(0, dtype=np.int64)
+        if self._positions is not None:
+            get = self._positions.get
+            return np.fromiter((get(k, -1) for k in keys), dtype=np.int64, count=len(keys))
+
+        ids = numeric_keys(keys)
+        if ids is None:
+            # 查询编号里混入非数字编号：能转换的走数组查找，其余必然不存在
+            arr = pa.array(keys, type=pa.string())
+            valid = pc.fill_null(pc.match_substring_regex(arr, NUMERIC_KEY_PATTERN), False)
+            valid = valid.to_numpy(zero_copy_only=False)
+            result = np.full(len(keys), -1, dtype=np.int64)
+            if valid.any():
+                result[valid] = self.positions(pc.filter(arr, pa.array(valid)).to_pylist())
+            return result
+
+        if len(ids) == len(self.ids) and np.array_equal(ids, self.ids):
+            # 译文与原文编号顺序一致（最常见的情况），无需查找
+            return np.arange(len(ids), dtype=np.int64)
+        return self._index.get_indexer(ids).astype(np.int64, copy=False)
+
+    def contains(self, keys):
+        return self.positions(keys) >= 0
+
+    def align(self, mapping, fill=""):
+        """把 {编号: 内容} 按索引顺序对齐为 object 数组，缺失的编号补 fill"""
+        result = np.full(len(self.keys), fill, dtype=object)
+        if not mapping:
+            return result
+        pos = self.positions(list(mapping.keys()))
+        hit = pos >= 0
+        values = np.fromiter(mapping.values(), dtype=object, count=len(mapping))
+        # 同一编号只会出现一次（字典键），直接按位置散列写入
+        result[pos[hit]] = values[hit]
+        return result
+
+    def nbytes(self):
+        """索引本身占用的字节数（整数数组或字符串字典）"""
+        if self.ids is not None:
+            # 首次查找后整数哈希表才建立，统计时确保已建立
+            self._index.get_indexer(self.ids[:1])
+            return self._index.memory_usage()
+        return sys.getsizeof(self._positions) + sum(sys.getsizeof(k) for k in self.keys)
+
+    def string_index_nbytes(self):
+        """同样的编号用字符串字典索引时的估算字节数（用于对比节省的内存）"""
+        if self._positions is not None:
+            return self.nbytes()
+        # 字典底层表按 2 的幂扩容，每个条目约 3 个指针宽度 + 字符串对象本身
+        slots = 1 << max(3, (len(self.keys) * 3 // 2).bit_length())
+        return sys.getsizeof({}) + slots * 24 + sum(sys.getsizeof(k) for k in self.keys)
+
+    def memory_report(self):
+        """{"编号数", "整数索引", "索引字节数", "字符串索引字节数(估算)", "节省字节数"}"""
+        used = self.nbytes()
+        baseline = self.string_index_nbytes()
+        return {
+            "编号数": len(self.keys),
+            "整数索引": self.is_numeric,
+            "索引字节数": used,
+            "字符串索引字节数(估算)": baseline,
+            "节省字节数": baseline - used,
+        }
+
+
+def format_bytes(n):
+    for unit in ("B", "KiB", "MiB"):
+        if abs(n) < 1024:
+            return f"{n:.0f} {unit}" if unit == "B" else f"{n:.1f} {unit}"
+        n /= 1024
+    return f"{n:.1f} GiB"
@@ -0,0 +1,137 @@
+"""
+离线压测：在本地模拟 Coze Workflow 服务（mockcoze.py）上运行自动化引擎，走与 tab8 相同的调用路径
+（池化 Coze 客户端 → 流式调用 → 解析 → 逐批合并），报告吞吐、批次延迟与收敛轮数：
+
+    python loadtest.py --keys 2000 --latency 0.3 --error-rate 0.02
+    python loadtest.py --keys 5000 --workers 5 10 20 --modes 连续队列     # 不同并发数对比
+    python loadtest.py --url http://127.0.0.1:8889 --keys 2000            # 压测已启动的模拟服务（python mockcoze.py）
+
+每个 并发数 × 调度方式 一行：
+- 每秒接受编号数：Workflow 结果被接受的编号数 / 耗时；
+- 批次 p50 / p99：单次 Workflow 调用（含流式读取）的耗时；
+- 收敛轮数：按轮次为实际轮数；连续队列没有轮次，取被接受编号中最多的发送次数（最慢的编号重发了几轮）；
+- 每接受编号 Token：Workflow 报告（或估算）的 Token 总数 / 接受的编号数；
+- 平均通过发送次数、失败批次、连接复用率等见各列。
+"""
+import argparse
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from automation import DEFAULT_MAX_ATTEMPTS, MAX_WORKERS, MODES, AutomationRun
+from bench import make_corpus
+from core import DEFAULT_STATUSES
+from cozepool import get_client, pool_stats
+from mockcoze import MockCozeServer, add_workflow_arguments, workflow_from_args
+from workflow import stream_workflow_messages
+
+MOCK_TOKEN = "pat_mock_loadtest"
+MOCK_WORKFLOW_ID = "mock"
+
+
+def timed_caller(client, workflow_id=MOCK_WORKFLOW_ID, language="en", candidates=1):
+    """返回 (call_batch, latencies)：call_batch 按 tab8 的参数调用 Workflow，latencies 收集每次调用的耗时（秒）"""
+    latencies = []
+    lock = threading.Lock()
+
+    def call_batch(fields, batch_index):
+        parameters = {"url": fields, "language": language, "terminology": ""}
+        if candidates > 1:
+            parameters["candidates"] = candidates
+        start = time.perf_counter()
+        try:
+            return stream_workflow_messages(client, workflow_id, parameters)
+        finally:
+            with lock:
+                latencies.append(time.perf_counter() - start)
+
+    return call_batch, latencies
+
+
+def convergence_rounds(run):
+    """按轮次为实际轮数；连续队列取被接受编号中最多的发送次数"""
+    if run.rounds > 1:
+        return run.rounds
+    attempts = run.attempts.attempts
+    accepted = [attempts[k] for k in attempts if k not in run.attempts.best and not run.attempts.is_parked(k)]
+    return max(accepted, default=0)
+
+
+def run_load(base_url, n, modes=MODES, workers_list=(MAX_WORKERS,), threshold=0, loop_interval=1,
+             max_attempts=DEFAULT_MAX_ATTEMPTS, candidates=1, pool_size=None, progress=None):
+    """对 base_url 上的模拟服务运行自动化，返回每个 并发数 × 调度方式 一行的 DataFrame"""
+    original_dict = make_corpus(n)
+    rows = []
+    for workers in workers_list:
+        client = get_client(MOCK_TOKEN, base_url, pool_size or max(workers, 1))
+        for mode in modes:
+            call_batch, latencies = timed_caller(client, candidates=candidates)
+            run = AutomationRun(original_dict, {}, DEFAULT_STATUSES, [DEFAULT_STATUSES[0]["name"]], ["过短", "过长"],
+                                call_batch, threshold=threshold, workers=workers, max_attempts=max_attempts)
+            summary = run.run(mode, loop_interval)
+            elapsed = summary["耗时(秒)"]
+            p50, p99 = np.percentile(latencies, [50, 99]) * 1000 if latencies else (0.0, 0.0)
+            connection = pool_stats(MOCK_TOKEN, base_url) or {}
+            row = OrderedDict([
+                ("并发数", workers),
+                ("调度方式", mode),
+                ("编号数", n),
+                ("耗时(秒)", elapsed),
+                ("每秒接受编号数", round(summary["Workflow 接受"] / elapsed, 1) if elapsed else 0.0),
+                ("批次数", summary["批次数"]),
+                ("批次 p50(ms)", round(float(p50), 1)),
+                ("批次 p99(ms)", round(float(p99), 1)),
+                ("收敛轮数", convergence_rounds(run)),
+                ("平均通过发送次数", summary["平均通过发送次数"]),
+                ("每接受编号 Token", summary["每接受编号 Token"]),
+                ("失败批次", summary["失败批次"]),
+                ("搁置待复核", summary["搁置待复核"]),
+                ("连接复用率", connection.get("连接复用率", "")),
+            ])
+            rows.append(row)
+            if progress:
+                progress(row)
+    return pd.DataFrame(rows)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="在本地模拟 Coze Workflow 服务上压测自动化引擎")
+    parser.add_argument("--url", help="已启动的模拟服务地址；不指定时在本进程内启动一个")
+    parser.add_argument("--keys", type=int, default=2000, help="编号数")
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=MODES, help="调度方式")
+    parser.add_argument("--workers", nargs="+", type=int, default=[MAX_WORKERS], help="并发数（可多个，逐一对比）")
+    parser.add_argument("--pool-size", type=int, help="Coze 连接池大小，默认等于并发数")
+    parser.add_argument("--threshold", type=int, default=0, help="停止阈值（待翻译数）")
+    parser.add_argument("--loop-interval", type=int, default=1, help="按轮次的循环间隔（秒）")
+    parser.add_argument("--max-attempts", type=int, default=DEFAULT_MAX_ATTEMPTS, help="单个编号最多发送次数（0 为不限）")
+    parser.add_argument("--candidates", type=int, default=1, help="每个编号请求的候选数")
+    add_workflow_arguments(parser)
+    args = parser.parse_args(argv)
+
+    server = None
+    base_url = args.url
+    if not base_url:
+        server = MockCozeServer(workflow_from_args(args)).start()
+        base_url = server.base_url
+    print(f"模拟服务: {base_url}", flush=True)
+    try:
+        report = run_load(base_url, args.keys, args.modes, args.workers, args.threshold, args.loop_interval,
+                          args.max_attempts, args.candidates, args.pool_size,
+                          progress=lambda r: print(f"  并发 {r['并发数']:>3} {r['调度方式']}  {r['耗时(秒)']:8.2f} s  "
+                                                   f"{r['每秒接受编号数']:8.1f} 条/秒", flush=True))
+    finally:
+        if server is not None:
+            server.stop()
+    print()
+    print(report.to_string(index=False))
+    if server is not None:
+        print("\n模拟服务: " + ", ".join(f"{k} {v}" for k, v in server.workflow.stats().items()))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,155 @@
+"""
+长度计算前剔除占位符与富文本标记（{0}、%s、<color=#fff>…</color>、\\n 等）
+
+所有启用的规则合并编译成一个正则，对整列文本一次性替换（优先用 pyarrow 的 RE2 批量执行，
+规则不被 RE2 支持时退回 Python re）。RE2 没有环视，规则的例外（MARKUP_EXCEPTIONS）作为
+第一个捕获组放在最前面，命中时替换回原文。剔除后的长度按 (规则, 度量, 文本内容) 缓存，
+自动化迭代中未变化的原文/译文不会被重复剔除和计算。
+"""
+import re
+from collections import OrderedDict
+from functools import lru_cache
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from metrics import CODE_POINTS, DEFAULT_METRIC, UTF8_BYTES, as_str_list, measure, measure_lengths
+
+DEFAULT_MARKUP_PATTERNS = OrderedDict([
+    ("格式占位符 {0} {name}", r"\{[^{}\s]*\}"),
+    # 标志位不含空格与 #：否则 "100% done" 中的 "% d" 会被当作占位符剔除
+    ("printf 占位符 %s %d %1$s", r"%(?:\d+\$)?[-+0]*\d*(?:\.\d+)?[sdifuxXoeEgGc@%]"),
+    ("富文本标签 <color=#fff>…</color>", r"</?[A-Za-z][^<>]*>"),
+    ("转义序列 \\n \\t", r"\\[nrt\"'\\]"),
+])
+
+# 规则的例外：命中的文本原样保留。printf 转换符后紧跟字母（"50%off"、"Save 20%else"）
+# 或 % 紧跟在数字后（"20%x"）时是普通文字而不是占位符；转义的 %% 不算例外
+_PRINTF_SPEC = r"%(?:\d+\$)?[-+0]*\d*(?:\.\d+)?[sdifuxXoeEgGc@]"
+MARKUP_EXCEPTIONS = {
+    DEFAULT_MARKUP_PATTERNS["printf 占位符 %s %d %1$s"]: rf"\d{_PRINTF_SPEC}|{_PRINTF_SPEC}[A-Za-z]",
+}
+
+# 内置规则的回归样例：(规则名, 文本, 剔除后的文本)，由 check_default_patterns 检查（bench.py 每次运行前执行）
+PATTERN_CASES = [
+    ("printf 占位符 %s %d %1$s", "100% done", "100% done"),
+    ("printf 占位符 %s %d %1$s", "完成 50% 以上", "完成 50% 以上"),
+    ("printf 占位符 %s %d %1$s", "%s 获得 %d 金币", " 获得  金币"),
+    ("printf 占位符 %s %d %1$s", "%1$s / %2$d", " / "),
+    ("printf 占位符 %s %d %1$s", "%-5d|%05.2f|%+d|%@|100%%", "||||100"),
+    ("printf 占位符 %s %d %1$s", "50%off today", "50%off today"),
+    ("printf 占位符 %s %d %1$s", "Save 20%else", "Save 20%else"),
+    ("printf 占位符 %s %d %1$s", "20%x", "20%x"),
+    ("printf 占位符 %s %d %1$s", "第%d关%s奖励", "第关奖励"),
+    ("格式占位符 {0} {name}", "{0} 对 {name} 造成 {1} 伤害", " 对  造成  伤害"),
+    ("富文本标签 <color=#fff>…</color>", "<color=#fff>红</color> < 3", "红 < 3"),
+    ("转义序列 \\n \\t", "第一行\\n第二行", "第一行第二行"),
+]
+
+# 单组规则的长度缓存条目上限
+CACHE_LIMIT = 2_000_000
+
+_length_caches = {}
+
+
+def build_markup_patterns(names, custom_pattern=""):
+    """
+    根据选中的内置规则名和自定义正则组合规则，返回可哈希的元组（无规则时返回 None）
+    自定义正则无效时抛出 ValueError
+    """
+    patterns = [DEFAULT_MARKUP_PATTERNS[n] for n in names if n in DEFAULT_MARKUP_PATTERNS]
+    custom_pattern = (custom_pattern or "").strip()
+    if custom_pattern:
+        try:
+            re.compile(custom_pattern)
+        except re.error as e:
+            raise ValueError(f"自定义规则不是有效的正则表达式: {e}")
+        patterns.append(custom_pattern)
+    return tuple(patterns) or None
+
+
+@lru_cache(maxsize=32)
+def compile_markup(patterns):
+    """
+    把多条规则合并为一个交替正则，只编译一次，返回 (正则文本, 编译结果, 替换串)
+    有例外时例外是第 1 个捕获组，替换串为 \\1（未命中例外时为空串）
+    """
+    combined = "|".join(f"(?:{p})" for p in patterns)
+    exceptions = [MARKUP_EXCEPTIONS[p] for p in patterns if p in MARKUP_EXCEPTIONS]
+    replacement = ""
+    if exceptions:
+        combined = f"({'|'.join(exceptions)})|{combined}"
+        replacement = r"\1"
+    return combined, re.compile(combined), replacement
+
+
+def _strip_array(texts, patterns):
+    combined, compiled, replacement = compile_markup(patterns)
+    try:
+        return pc.replace_substring_regex(pa.array(texts, type=pa.string()), pattern=combined, replacement=replacement)
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+        # RE2 不支持的语法（如环视、反向引用）退回 Python re
+        return pa.array([compiled.sub(replacement, t) for t in texts], type=pa.string())
+
+
+def strip_markup(texts, patterns):
+    """批量剔除标记，返回剔除后的字符串列表"""
+    texts = as_str_list(texts)
+    if not patterns or not texts:
+        return texts
+    return _strip_array(texts, patterns).to_pylist()
+
+
+def check_default_patterns():
+    """
+    用 PATTERN_CASES 检查内置规则（RE2 批量替换与 Python re 两条路径）
+    返回不符合预期的 (规则名, 文本, 期望, 实际) 列表，全部通过时为空
+    """
+    failures = []
+    for name, text, expected in PATTERN_CASES:
+        patterns = (DEFAULT_MARKUP_PATTERNS[name],)
+        _, compiled, replacement = compile_markup(patterns)
+        for actual in (strip_markup([text], patterns)[0], compiled.sub(replacement, text)):
+            if actual != expected:
+                failures.append((name, text, expected, actual))
+                break
+    return failures
+
+
+def _stripped_lengths(texts, metric, patterns):
+    stripped = _strip_array(texts, patterns)
+    # 字符数与字节数直接在 Arrow 数组上计算，省去转回 Python 字符串
+    if metric == CODE_POINTS:
+        return pc.utf8_length(stripped).to_numpy(zero_copy_only=False).astype(np.int64)
+    if metric == UTF8_BYTES:
+        return pc.binary_length(stripped).to_numpy(zero_copy_only=False).astype(np.int64)
+    return measure_lengths(stripped.to_pylist(), metric)
+
+
+def visible_lengths(texts, metric=DEFAULT_METRIC, patterns=None):
+    """剔除标记后的批量长度；patterns 为空时等同 measure_lengths"""
+    if not patterns:
+        return measure_lengths(texts, metric)
+    texts = as_str_list(texts)
+    cache = _length_caches.setdefault((patterns, metric), {})
+    if len(cache) > CACHE_LIMIT:
+        cache.clear()
+    result = np.fromiter((cache.get(t, -1) for t in texts), dtype=np.int64, count=len(texts))
+    missing = np.flatnonzero(result < 0)
+    if len(missing):
+        todo = [texts[i] for i in missing]
+        computed = _stripped_lengths(todo, metric, patterns)
+        result[missing] = computed
+        cache.update(zip(todo, computed.tolist()))
+    return result
+
+
+def visible_length(text, metric=DEFAULT_METRIC, patterns=None):
+    """单个字符串剔除标记后的长度"""
+    if not patterns:
+        return measure(text, metric)
+    cached = _length_caches.get((patterns, metric), {}).get(text)
+    if cached is None:
+        cached = int(visible_lengths([text], metric, patterns)[0])
+    return cached
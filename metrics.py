@@ -0,0 +1,186 @@
+"""
+长度度量：字符数 / 显示宽度 / 字素簇 / UTF-8 字节数
+
+所有度量都按列批量计算：把一批字符串拼接后一次性转为码点数组，
+通过查表得到每个码点的宽度/属性，再按字符串边界求和，避免逐字符的 Python 循环。
+字符数与 UTF-8 字节数直接在 Arrow 字符串数组上计算（Arrow 字符串列零拷贝）；
+显示宽度与字素簇结果按字符串缓存，迭代轮次中未变化的字符串不会重复计算。
+"""
+import sys
+import unicodedata
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+CODE_POINTS = "字符数"
+DISPLAY_WIDTH = "显示宽度"
+GRAPHEMES = "字素簇"
+UTF8_BYTES = "UTF-8 字节数"
+
+METRIC_NAMES = [CODE_POINTS, DISPLAY_WIDTH, GRAPHEMES, UTF8_BYTES]
+DEFAULT_METRIC = CODE_POINTS
+
+# 单个度量缓存的最大条目数，超过后整体清空重新累积
+CACHE_LIMIT = 2_000_000
+
+_width_table = None
+_extend_table = None
+_caches = {name: {} for name in (DISPLAY_WIDTH, GRAPHEMES)}
+
+ZWJ = 0x200D
+REGIONAL_INDICATOR_FIRST = 0x1F1E6
+REGIONAL_INDICATOR_LAST = 0x1F1FF
+
+
+def _build_tables():
+    """构建全码点的显示宽度表与“附加于前一字符”（不开启新字素簇）表"""
+    global _width_table, _extend_table
+    size = sys.maxunicode + 1
+    width = np.ones(size, dtype=np.uint8)
+    extend = np.zeros(size, dtype=bool)
+    for cp in range(size):
+        ch = chr(cp)
+        category = unicodedata.category(ch)
+        if category in ("Mn", "Me", "Cf") or 0x1160 <= cp <= 0x11FF:
+            # 组合符号、格式控制符、韩文中声/终声：宽度为 0，且附加在前一字素上
+            width[cp] = 0
+            extend[cp] = True
+        elif category == "Mc":
+            extend[cp] = True
+        elif category == "Cc":
+            width[cp] = 0
+        elif unicodedata.east_asian_width(ch) in ("W", "F"):
+            width[cp] = 2
+    # 肤色修饰符附加在前一个 emoji 上
+    extend[0x1F3FB:0x1F400] = True
+    width[0x1F3FB:0x1F400] = 0
+    _width_table, _extend_table = width, extend
+
+
+def _tables():
+    if _width_table is None:
+        _build_tables()
+    return _width_table, _extend_table
+
+
+def to_arrow_text(values):
+    """转为 Arrow 字符串数组；缺失值为 null，非字符串值（如 Excel 数字）转为字符串。Arrow 字符串列不复制"""
+    if isinstance(values, (pa.Array, pa.ChunkedArray)):
+        return values
+    if isinstance(getattr(values, "dtype", None), pd.StringDtype) and values.dtype.storage == "pyarrow":
+        return pa.array(values)
+    try:
+        return pa.array(values, type=pa.string(), from_pandas=True)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        series = values if isinstance(values, pd.Series) else pd.Series(values, dtype=object)
+        return pa.array(series.astype(object).where(series.notna(), None).map(
+            lambda v: v if v is None else str(v)), type=pa.string())
+
+
+def as_str_list(texts):
+    """转为 Python 字符串列表，缺失值（None/NaN/NA）为空字符串"""
+    if isinstance(texts, (pa.Array, pa.ChunkedArray)) or getattr(texts, "dtype", object) != object:
+        return pc.fill_null(to_arrow_text(texts), "").to_pylist()
+    return ["" if t is None or t != t else str(t) for t in texts]
+
+
+def _codepoints(texts):
+    """拼接后的 UTF-32 码点数组，以及每个字符串在其中的起止位置"""
+    lengths = np.fromiter((len(t) for t in texts), dtype=np.int64, count=len(texts))
+    ends = np.cumsum(lengths)
+    starts = ends - lengths
+    cps = np.frombuffer("".join(texts).encode("utf-32-le"), dtype=np.uint32)
+    return cps, starts, ends
+
+
+def _segment_sums(values, starts, ends):
+    csum = np.concatenate(([0], np.cumsum(values, dtype=np.int64)))
+    return csum[ends] - csum[starts]
+
+
+def _display_width(texts):
+    width, _ = _tables()
+    cps, starts, ends = _codepoints(texts)
+    return _segment_sums(width[cps], starts, ends)
+
+
+def _grapheme_count(texts):
+    """
+    近似扩展字素簇计数：组合符号/变体选择符/肤色修饰符不开启新簇，
+    ZWJ 之后的字符并入前一簇，区域指示符两两组成一个旗帜
+    """
+    _, extend = _tables()
+    cps, starts, ends = _codepoints(texts)
+    n = len(cps)
+    if n == 0:
+        return np.zeros(len(texts), dtype=np.int64)
+    is_start = ~extend[cps]
+    after_zwj = np.zeros(n, dtype=bool)
+    after_zwj[1:] = cps[:-1] == ZWJ
+    is_start &= ~after_zwj
+
+    # 区域指示符：连续一串中只有第 1、3、5… 个开启新簇
+    ri = (cps >= REGIONAL_INDICATOR_FIRST) & (cps <= REGIONAL_INDICATOR_LAST)
+    if ri.any():
+        idx = np.arange(n)
+        boundary = np.zeros(n, dtype=bool)
+        boundary[starts[starts < ends]] = True
+        run_start = np.where(~ri | boundary, idx, 0)
+        run_start = np.maximum.accumulate(run_start)
+        pos_in_run = idx - run_start + np.where(ri[run_start], 0, -1)
+        is_start[ri & (pos_in_run % 2 == 1)] = False
+
+    # 每个非空字符串的第一个字符总是开启一个簇
+    is_start[starts[starts < ends]] = True
+    return _segment_sums(is_start, starts, ends)
+
+
+_COMPUTE = {
+    DISPLAY_WIDTH: _display_width,
+    GRAPHEMES: _grapheme_count,
+}
+
+# 直接在 Arrow 数组上计算的度量，缺失值长度为 0
+_ARROW_COMPUTE = {
+    CODE_POINTS: pc.utf8_length,
+    UTF8_BYTES: pc.binary_length,
+}
+
+
+def arrow_lengths(arr, metric=DEFAULT_METRIC):
+    """Arrow 字符串数组的字符数 / UTF-8 字节数"""
+    lengths = _ARROW_COMPUTE.get(metric, pc.utf8_length)(arr)
+    return pc.fill_null(lengths, 0).to_numpy(zero_copy_only=False).astype(np.int64)
+
+
+def measure_lengths(texts, metric=DEFAULT_METRIC):
+    """批量计算一组字符串的长度，返回 int64 数组"""
+    if metric not in _COMPUTE:
+        return arrow_lengths(to_arrow_text(texts), metric)
+
+    texts = as_str_list(texts)
+    cache = _caches[metric]
+    if len(cache) > CACHE_LIMIT:
+        cache.clear()
+    result = np.fromiter((cache.get(t, -1) for t in texts), dtype=np.int64, count=len(texts))
+    missing = np.flatnonzero(result < 0)
+    if len(missing):
+        todo = [texts[i] for i in missing]
+        computed = _COMPUTE[metric](todo)
+        result[missing] = computed
+        cache.update(zip(todo, computed.tolist()))
+    return result
+
+
+def measure(text, metric=DEFAULT_METRIC):
+    """单个字符串的长度"""
+    if metric == UTF8_BYTES:
+        return len(text.encode("utf-8"))
+    if metric not in _COMPUTE:
+        return len(text)
+    cached = _caches[metric].get(text)
+    if cached is None:
+        cached = int(measure_lengths([text], metric)[0])
+    return cached
@@ -0,0 +1,229 @@
+"""
+本地模拟 Coze Workflow 流式接口：离线压测 tab6 / tab7 / tab8 与自动化引擎，不调用真实 Workflow
+
+实现 cozepy 使用的 POST /v1/workflow/stream_run（SSE：id / event / data），
+每次调用返回一个 Message 事件，content 为 {"download_url": [...]}，随后是 Done 事件：
+
+    python mockcoze.py --port 8889 --latency 0.5 --error-rate 0.02 --length-bias 1.2
+
+启动页面前设置环境变量 COZE_BASE_URL=http://127.0.0.1:8889，tab6 / tab7 / tab8 即调用本地模拟服务；
+自动化引擎的压测见 loadtest.py。可配置：
+- 延迟：中位数 latency 秒的对数正态分布（sigma），另加每个编号 latency_per_key 秒；
+- 错误：error_rate 概率返回 Error 事件（该批次没有内容），http_error_rate 概率返回 HTTP 500（调用抛出异常）；
+- 译文长度：译文长度 = 原文长度 × 对数正态(中位数 length_bias, length_sigma)，
+  length_bias 偏离 1 越远、length_sigma 越大，越多译文落在合格区间之外；
+- 返回形状：list 为 ["编号=译文", ...]；json 为 ['["编号=译文", ...]']（一层 JSON 字符串）；mixed 两者交替，
+  都是 parse_workflow_results 支持的形状；参数中有 candidates 时每个编号返回多行候选；
+- 用量：Message 事件带 usage（按 usage.estimate_tokens 计算的输入 / 输出 Token），usage=False 时不报告，
+  用于检查客户端的估算路径。
+"""
+import argparse
+import json
+import random
+import string
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from usage import estimate_tokens
+
+DEFAULT_PORT = 8889
+STREAM_PATH = "/v1/workflow/stream_run"
+SHAPE_LIST = "list"
+SHAPE_JSON = "json"
+SHAPE_MIXED = "mixed"
+SHAPES = [SHAPE_LIST, SHAPE_JSON, SHAPE_MIXED]
+
+
+class MockWorkflow:
+    """模拟 Workflow 的行为参数与调用计数；respond 可以在多个请求线程中同时调用"""
+
+    def __init__(self, latency=0.3, sigma=0.5, latency_per_key=0.0, error_rate=0.0, http_error_rate=0.0,
+                 length_bias=1.2, length_sigma=0.5, shape=SHAPE_LIST, usage=True, seed=0):
+        self.latency = latency
+        self.sigma = sigma
+        self.latency_per_key = latency_per_key
+        self.error_rate = error_rate
+        self.http_error_rate = http_error_rate
+        self.length_bias = length_bias
+        self.length_sigma = length_sigma
+        self.shape = shape
+        self.usage = usage
+        self.requests = 0
+        self.errors = 0
+        self.http_errors = 0
+        self.keys = 0
+        self.tokens = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _translate(self, rng, text):
+        length = max(1, round(len(text) * rng.lognormvariate(0, self.length_sigma) * self.length_bias))
+        return "".join(rng.choice(string.ascii_lowercase) for _ in range(length))
+
+    def respond(self, parameters):
+        """
+        按参数生成一次调用的结果：(HTTP 状态码, 事件列表 [(event, data)], 延迟秒数)
+        parameters["url"] 为 ["编号=原文", ...]
+        """
+        fields = parameters.get("url") or []
+        candidates = max(1, int(parameters.get("candidates") or 1))
+        with self._lock:
+            self.requests += 1
+            self.keys += len(fields)
+            index = self.requests
+            rng = random.Random(self._rng.random())
+            delay = self.latency * rng.lognormvariate(0, self.sigma) + self.latency_per_key * len(fields)
+            if rng.random() < self.http_error_rate:
+                self.http_errors += 1
+                return 500, [], delay
+            if rng.random() < self.error_rate:
+                self.errors += 1
+                return 200, [("Error", {"error_code": 5000, "error_message": "模拟 Workflow 执行失败"}), ("Done", None)], delay
+
+        items = []
+        for field in fields:
+            if "=" not in field:
+                continue
+            key, text = field.split("=", 1)
+            items.extend(f"{key}={self._translate(rng, text)}" for _ in range(candidates))
+        shape = self.shape if self.shape != SHAPE_MIXED else (SHAPE_LIST, SHAPE_JSON)[index % 2]
+        download_url = items if shape == SHAPE_LIST else [json.dumps(items, ensure_ascii=False)]
+        message = {
+            "content": json.dumps({"download_url": download_url}, ensure_ascii=False),
+            "node_title": "End",
+            "node_seq_id": "0",
+            "node_is_finish": True,
+        }
+        if self.usage:
+            input_count = estimate_tokens("\n".join(fields))
+            output_count = estimate_tokens("\n".join(items))
+            message["usage"] = {"token_count": input_count + output_count,
+                                "input_count": input_count, "output_count": output_count}
+            with self._lock:
+                self.tokens += input_count + output_count
+        return 200, [("Message", message), ("Done", None)], delay
+
+    def stats(self):
+        with self._lock:
+            return {"请求数": self.requests, "编号数": self.keys, "Error 事件": self.errors, "HTTP 错误": self.http_errors,
+                    "Token": self.tokens}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    # HTTP/1.1 + Content-Length：客户端可以复用长连接
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, content_type, body):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            body = {}
+        if self.path.split("?", 1)[0] != STREAM_PATH:
+            self._send(404, "application/json", json.dumps({"code": 4004, "msg": "not found"}).encode("utf-8"))
+            return
+
+        status, events, delay = self.server.workflow.respond(body.get("parameters") or {})
+        time.sleep(delay)
+        if status != 200:
+            self._send(status, "application/json",
+                       json.dumps({"code": 5000, "msg": "模拟服务端错误"}, ensure_ascii=False).encode("utf-8"))
+            return
+        chunks = []
+        for i, (event, data) in enumerate(events):
+            payload = "" if data is None else json.dumps(data, ensure_ascii=False)
+            chunks.append(f"id: {i}\nevent: {event}\ndata: {payload}\n\n")
+        self._send(200, "text/event-stream", "".join(chunks).encode("utf-8"))
+
+
+class MockCozeServer:
+    """
+    在后台线程运行的模拟服务：
+        with MockCozeServer(MockWorkflow(latency=0.2)) as server:
+            client = get_client("pat_mock", server.base_url)
+    port 为 0 时使用随机空闲端口
+    """
+
+    def __init__(self, workflow=None, host="127.0.0.1", port=0):
+        self.workflow = workflow or MockWorkflow()
+        self.httpd = ThreadingHTTPServer((host, port), _Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.workflow = self.workflow
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="mock-coze", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+
+def add_workflow_arguments(parser):
+    """MockWorkflow 的命令行参数（mockcoze.py 与 loadtest.py 共用）"""
+    parser.add_argument("--latency", type=float, default=0.3, help="单次调用的中位延迟（秒）")
+    parser.add_argument("--sigma", type=float, default=0.5, help="延迟对数正态分布的 sigma")
+    parser.add_argument("--latency-per-key", type=float, default=0.0, help="每个编号额外增加的延迟（秒）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="返回 Error 事件的概率")
+    parser.add_argument("--http-error-rate", type=float, default=0.0, help="返回 HTTP 500 的概率")
+    parser.add_argument("--length-bias", type=float, default=1.2, help="译文长度 / 原文长度 的中位数")
+    parser.add_argument("--length-sigma", type=float, default=0.5, help="译文长度比例对数正态分布的 sigma")
+    parser.add_argument("--shape", choices=SHAPES, default=SHAPE_LIST, help="download_url 的返回形状")
+    parser.add_argument("--no-usage", action="store_true", help="Message 事件不带 usage（客户端按内容长度估算）")
+    parser.add_argument("--seed", type=int, default=0)
+
+
+def workflow_from_args(args):
+    return MockWorkflow(latency=args.latency, sigma=args.sigma, latency_per_key=args.latency_per_key,
+                        error_rate=args.error_rate, http_error_rate=args.http_error_rate,
+                        length_bias=args.length_bias, length_sigma=args.length_sigma, shape=args.shape,
+                        usage=not args.no_usage, seed=args.seed)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="本地模拟 Coze Workflow 流式接口")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    add_workflow_arguments(parser)
+    args = parser.parse_args(argv)
+
+    server = MockCozeServer(workflow_from_args(args), args.host, args.port)
+    print(f"模拟 Coze Workflow 服务: {server.base_url}{STREAM_PATH}（Ctrl+C 停止）", flush=True)
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+        print(json.dumps(server.workflow.stats(), ensure_ascii=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
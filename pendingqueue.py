@@ -0,0 +1,175 @@
+"""
+待翻译队列：集合判断成员 + 优先级堆决定发送顺序
+
+- 成员用 dict（编号 → 当前条目序号）保存，in / 删除都是 O(1)，批量删除已接受的编号为 O(接受数)；
+- 发送顺序由 heapq 最小堆给出（优先级取负），最偏离规格的编号最先发出，同优先级按加入顺序；
+- 删除和改优先级都不动堆，旧条目在弹出时按序号判断已失效后跳过，失效条目过多时整体重建。
+
+优先级来源：
+- 比值偏离：比值到目标标签（默认第一个可迭代标签，即 合格）区间的距离，越远越先发送；
+- 原文长度：原文越长越先发送；
+- 文件权重：外部文件给出的 编号=权重，权重越大越先发送，未列出的编号为 0；
+- 文件顺序：不排序，按原文顺序发送。
+"""
+import heapq
+import itertools
+
+import numpy as np
+
+from core import parse_txt
+
+PRIORITY_RATIO = "比值偏离"
+PRIORITY_LENGTH = "原文长度"
+PRIORITY_WEIGHT = "文件权重"
+PRIORITY_ORDER = "文件顺序"
+PRIORITY_MODES = [PRIORITY_RATIO, PRIORITY_LENGTH, PRIORITY_WEIGHT, PRIORITY_ORDER]
+
+# 堆中失效条目超过有效条目的倍数时重建
+_COMPACT_FACTOR = 2
+
+
+class PendingQueue:
+    """按优先级出队的待翻译编号集合；priority 越大越先出队"""
+
+    def __init__(self, keys=(), priorities=None):
+        self._seq = itertools.count()
+        self._entries = {}
+        self._priorities = {}
+        self._heap = []
+        keys = list(keys)
+        if priorities is None:
+            priorities = itertools.repeat(0.0)
+        for key, priority in zip(keys, priorities):
+            seq = next(self._seq)
+            priority = float(priority)
+            self._entries[key] = seq
+            self._priorities[key] = priority
+            self._heap.append((-priority, seq, key))
+        heapq.heapify(self._heap)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def __iter__(self):
+        return iter(self.ordered())
+
+    def __bool__(self):
+        return bool(self._entries)
+
+    def priority(self, key):
+        return self._priorities.get(key)
+
+    def push(self, key, priority=None):
+        """加入编号或更新其优先级；priority 为 None 时沿用原优先级（新编号为 0）"""
+        if priority is None:
+            priority = self._priorities.get(key, 0.0)
+        seq = next(self._seq)
+        self._entries[key] = seq
+        self._priorities[key] = float(priority)
+        heapq.heappush(self._heap, (-float(priority), seq, key))
+        self._maybe_compact()
+
+    def discard(self, key):
+        if self._entries.pop(key, None) is not None:
+            self._priorities.pop(key, None)
+
+    def remove_many(self, keys):
+        """批量删除（已接受的编号），O(len(keys))；返回实际删除的数量"""
+        removed = 0
+        for key in keys:
+            if self._entries.pop(key, None) is not None:
+                self._priorities.pop(key, None)
+                removed += 1
+        self._maybe_compact()
+        return removed
+
+    def retain(self, keys):
+        """只保留同时出现在 keys 中的编号（与新的筛选结果同步）"""
+        keep = keys if isinstance(keys, (set, frozenset, dict)) else set(keys)
+        self.remove_many([k for k in self._entries if k not in keep])
+
+    def pop(self):
+        """弹出优先级最高的编号；队列为空时抛出 KeyError"""
+        while self._heap:
+            _, seq, key = heapq.heappop(self._heap)
+            if self._entries.get(key) == seq:
+                del self._entries[key]
+                del self._priorities[key]
+                return key
+        raise KeyError("pop from an empty PendingQueue")
+
+    def pop_batch(self, n):
+        """弹出至多 n 个编号（按优先级）"""
+        batch = []
+        while len(batch) < n and self._entries:
+            batch.append(self.pop())
+        return batch
+
+    def ordered(self):
+        """按出队顺序列出全部编号（不修改队列）"""
+        live = [(p, seq, key) for p, seq, key in self._heap if self._entries.get(key) == seq]
+        live.sort()
+        return [key for _, _, key in live]
+
+    def _maybe_compact(self):
+        if len(self._heap) > _COMPACT_FACTOR * len(self._entries) + 64:
+            self._heap = [(p, seq, key) for p, seq, key in self._heap if self._entries.get(key) == seq]
+            heapq.heapify(self._heap)
+
+
+# ---------------------------
+# 优先级
+# ---------------------------
+def load_weights(source):
+    """读取 编号=权重 文件（路径或上传的文件），无法解析为数字的行忽略"""
+    weights = {}
+    for key, value in parse_txt(source).items():
+        try:
+            weights[key] = float(value)
+        except ValueError:
+            continue
+    return weights
+
+
+def ratio_distance(ratios, status):
+    """比值到标签区间 [min, max] 的距离，区间内为 0；NaN（原文为空）为 0"""
+    ratios = np.asarray(ratios, dtype=np.float64)
+    s_min = -np.inf if status.get("min") is None else status["min"]
+    s_max = np.inf if status.get("max") is None else status["max"]
+    distance = np.maximum(np.maximum(s_min - ratios, ratios - s_max), 0.0)
+    return np.nan_to_num(distance, nan=0.0)
+
+
+def compute_priorities(df_result, mode=PRIORITY_RATIO, statuses=None, target_label=None, weights=None):
+    """
+    长度检查结果每行的优先级（与 df_result 行对齐的 float64 数组）
+    target_label: 比值偏离所参照的标签，默认第一个标签
+    """
+    n = len(df_result)
+    if mode == PRIORITY_RATIO and statuses:
+        target = next((s for s in statuses if s["name"] == target_label), statuses[0])
+        return ratio_distance(df_result["比值"].to_numpy(dtype=np.float64, na_value=np.nan), target)
+    if mode == PRIORITY_LENGTH:
+        return df_result["原文长度"].to_numpy(dtype=np.float64)
+    if mode == PRIORITY_WEIGHT and weights:
+        return np.fromiter((weights.get(k, 0.0) for k in df_result["编号"].tolist()), dtype=np.float64, count=n)
+    return np.zeros(n, dtype=np.float64)
+
+
+def build_queue(df_result, labels, mode=PRIORITY_RATIO, statuses=None, target_label=None, weights=None, keys=None):
+    """
+    用标签属于 labels 的行建立待翻译队列
+    keys: 可选，只保留其中的编号（例如会话中尚未被接受的编号）
+    """
+    mask = df_result["标签"].isin(list(labels)).to_numpy()
+    priorities = compute_priorities(df_result, mode, statuses, target_label, weights)[mask]
+    selected = df_result["编号"][mask].tolist()
+    if keys is not None:
+        keep = keys if isinstance(keys, (set, frozenset, dict, PendingQueue)) else set(keys)
+        pairs = [(k, p) for k, p in zip(selected, priorities.tolist()) if k in keep]
+        selected = [k for k, _ in pairs]
+        priorities = [p for _, p in pairs]
+    return PendingQueue(selected, priorities)
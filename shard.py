@@ -0,0 +1,322 @@
+"""
+多进程分片分类：百万级编号 × 多语言的长度检查按编号区间分给进程池
+
+- 原文与各语言译文（已按编号对齐）以 Arrow large_string 的 偏移/字节 两个缓冲区复制进一块
+  multiprocessing.shared_memory，子进程直接在共享内存上重建 Arrow 数组，不经过 pickle；
+- 长度、比值、标签编号的输出数组在同一块共享内存中，每个分片只写自己的编号区间；
+- 每个分片返回各语言的标签计数与有效字段数，主进程相加即得统计，不必再扫描整列；
+- 标签列由标签编号一次 take 得到。
+编号数不足两个分片或进程数为 1 时在当前进程计算，结果与多进程完全一致。
+进程池用 spawn 启动（Streamlit 服务是多线程进程，fork 不安全），首次使用时创建，之后复用。
+整个进程共用一个按 CPU 核数创建的进程池（多个会话可能同时提交分片），调用方的进程数只限制本次调用
+同时在执行的分片数，不会重建进程池，也不会取消其他调用提交的分片。
+"""
+import multiprocessing
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from core import (
+    align_translation, classify_ratio_codes, code_labels, compute_ratios,
+    format_ratio_percent, language_statistics_frame, statistics_frame, text_series,
+)
+from keyindex import KeyIndex
+from markup import visible_lengths
+from metrics import DEFAULT_METRIC, to_arrow_text
+from stats import count_non_empty
+from timing import span, timed
+
+# 每个分片至少包含的编号数；编号数不足两个分片时不启用进程池
+MIN_SHARD_SIZE = 50_000
+# 每个进程分到的分片数，分片小一些便于负载均衡
+SHARDS_PER_WORKER = 4
+# 共享内存中各数组的对齐字节数
+_ALIGN = 64
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def default_workers():
+    return os.cpu_count() or 1
+
+
+def _get_executor():
+    """进程共用的进程池（大小为 CPU 核数），首次使用时创建"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(max_workers=default_workers(),
+                                            mp_context=multiprocessing.get_context("spawn"))
+        return _executor
+
+
+def shutdown():
+    """等已提交的分片执行完后关闭进程池（之后再次使用时重新创建）"""
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=True)
+
+
+def shard_bounds(n, workers):
+    """把 [0, n) 切成若干 (lo, hi) 区间；不值得分片时只有一个区间"""
+    if workers <= 1 or n < 2 * MIN_SHARD_SIZE:
+        return [(0, n)]
+    count = min(workers * SHARDS_PER_WORKER, n // MIN_SHARD_SIZE)
+    edges = np.linspace(0, n, count + 1).astype(np.int64).tolist()
+    return list(zip(edges[:-1], edges[1:]))
+
+
+# ---------------------------
+# 共享内存
+# ---------------------------
+def _map_arrays(shm, layout):
+    return {name: np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf, offset=offset)
+            for name, (dtype, shape, offset) in layout.items()}
+
+
+class _SharedBlock:
+    """一块共享内存中依次排布的多个 numpy 数组；(name, layout) 传给子进程即可映射出同样的数组"""
+
+    def __init__(self, specs):
+        layout, offset = {}, 0
+        for name, dtype, shape in specs:
+            dtype = np.dtype(dtype)
+            offset = -(-offset // _ALIGN) * _ALIGN
+            layout[name] = (dtype.str, tuple(shape), offset)
+            offset += dtype.itemsize * int(np.prod(shape))
+        self.shm = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+        self.layout = layout
+        self.arrays = _map_arrays(self.shm, layout)
+
+    @property
+    def spec(self):
+        return self.shm.name, self.layout
+
+    def close(self):
+        self.arrays = None
+        self.shm.close()
+        self.shm.unlink()
+
+
+def _large_text(values):
+    """Arrow large_string 数组，缺失值为空字符串"""
+    arr = pc.fill_null(to_arrow_text(values), "")
+    if isinstance(arr, pa.ChunkedArray):
+        arr = arr.combine_chunks()
+    return arr.cast(pa.large_string())
+
+
+def _text_buffers(arr):
+    """large_string 数组的 (偏移, 字节)，偏移从 0 开始"""
+    _, offsets_buf, data_buf = arr.buffers()
+    offsets = np.frombuffer(offsets_buf, dtype=np.int64)[arr.offset:arr.offset + len(arr) + 1]
+    data = np.frombuffer(data_buf, dtype=np.uint8) if data_buf is not None else np.empty(0, dtype=np.uint8)
+    return offsets - offsets[0], data[offsets[0]:offsets[-1]]
+
+
+def _text_array(offsets, data):
+    """在（共享内存中的）偏移/字节数组上零拷贝重建 large_string 数组"""
+    return pa.Array.from_buffers(pa.large_string(), len(offsets) - 1,
+                                 [None, pa.py_buffer(offsets), pa.py_buffer(data)])
+
+
+# ---------------------------
+# 分片计算
+# ---------------------------
+def _classify_range(texts, lo, hi, statuses, metric, markup, out):
+    """
+    texts[0] 为原文，其后为各语言译文；把 [lo, hi) 区间的长度/比值/标签编号写入 out
+    返回 (每列有效字段数, 每个语言各标签编号的数量)
+    """
+    num_codes = len(statuses) + 2
+    parts = [t.slice(lo, hi - lo) for t in texts]
+    non_empty = np.array([count_non_empty(p) for p in parts], dtype=np.int64)
+    counts = np.zeros((len(parts) - 1, num_codes), dtype=np.int64)
+    orig_lens = visible_lengths(parts[0], metric, markup)
+    out["lengths"][0, lo:hi] = orig_lens
+    for j, part in enumerate(parts[1:]):
+        trans_lens = visible_lengths(part, metric, markup)
+        ratios = compute_ratios(orig_lens, trans_lens)
+        codes = classify_ratio_codes(ratios, statuses)
+        out["lengths"][j + 1, lo:hi] = trans_lens
+        out["ratios"][j, lo:hi] = ratios
+        out["codes"][j, lo:hi] = codes
+        counts[j] = np.bincount(codes, minlength=num_codes)
+    return non_empty, counts
+
+
+def _run_shard(shm, layout, num_texts, lo, hi, statuses, metric, markup):
+    arrays = _map_arrays(shm, layout)
+    texts = [_text_array(arrays[f"offsets{i}"], arrays[f"data{i}"]) for i in range(num_texts)]
+    return _classify_range(texts, lo, hi, statuses, metric, markup, arrays)
+
+
+def _shard_worker(spec, num_texts, lo, hi, statuses, metric, markup):
+    """子进程入口：映射共享内存，计算一个分片"""
+    name, layout = spec
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        # 放在单独的函数里，返回后对共享内存的视图都已释放，才能关闭映射
+        return _run_shard(shm, layout, num_texts, lo, hi, statuses, metric, markup)
+    finally:
+        try:
+            shm.close()
+        except BufferError:
+            # 异常的 traceback 仍引用着视图，映射随进程回收
+            pass
+
+
+@timed("分片分类")
+def classify_sharded(orig_texts, trans_texts, statuses, metric=DEFAULT_METRIC, markup=None, workers=None):
+    """
+    原文列与若干等长（已按编号对齐）的译文列分片分类
+    返回 dict：
+      lengths   (1+L, n) int64，第 0 行为原文长度
+      ratios    (L, n) float64，codes (L, n) int16（见 core.code_labels）
+      non_empty (1+L,) 每列有效字段数，counts (L, len(statuses)+2) 每个语言各标签编号的数量
+    """
+    texts = [_large_text(t) for t in [orig_texts, *trans_texts]]
+    n, num_langs = len(texts[0]), len(texts) - 1
+    bounds = shard_bounds(n, workers or default_workers())
+    shapes = [("lengths", np.int64, (num_langs + 1, n)), ("ratios", np.float64, (num_langs, n)), ("codes", np.int16, (num_langs, n))]
+
+    if len(bounds) == 1:
+        out = {name: np.empty(shape, dtype=dtype) for name, dtype, shape in shapes}
+        non_empty, counts = _classify_range(texts, 0, n, statuses, metric, markup, out)
+        out.update(non_empty=non_empty, counts=counts)
+        return out
+
+    buffers = [_text_buffers(t) for t in texts]
+    specs = list(shapes)
+    for i, (offsets, data) in enumerate(buffers):
+        specs += [(f"offsets{i}", np.int64, offsets.shape), (f"data{i}", np.uint8, data.shape)]
+    block = _SharedBlock(specs)
+    in_flight = set()
+    try:
+        for i, (offsets, data) in enumerate(buffers):
+            block.arrays[f"offsets{i}"][:] = offsets
+            block.arrays[f"data{i}"][:] = data
+        del buffers, texts
+        executor = _get_executor()
+        non_empty = np.zeros(num_langs + 1, dtype=np.int64)
+        counts = np.zeros((num_langs, len(statuses) + 2), dtype=np.int64)
+        # 同时在执行的分片不超过本次调用的进程数，其余分片等有分片完成后再提交
+        pending = iter(bounds)
+        limit = workers or default_workers()
+        while True:
+            for lo, hi in pending:
+                in_flight.add(executor.submit(_shard_worker, block.spec, num_langs + 1, lo, hi,
+                                              statuses, metric, markup))
+                if len(in_flight) >= limit:
+                    break
+            if not in_flight:
+                break
+            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                part_non_empty, part_counts = future.result()
+                non_empty += part_non_empty
+                counts += part_counts
+        out = {name: block.arrays[name].copy() for name, _, _ in shapes}
+    finally:
+        # 出错时等本次调用已提交的分片结束再释放共享内存
+        wait(in_flight)
+        block.close()
+    out.update(non_empty=non_empty, counts=counts)
+    return out
+
+
+def label_counts(counts, labels):
+    """标签编号计数 → {标签名: 数量}（同名标签合并，None 标签忽略）"""
+    result = {}
+    for label, count in zip(labels, counts.tolist()):
+        if label is not None and count:
+            result[label] = result.get(label, 0) + count
+    return result
+
+
+def label_column(codes, labels):
+    """标签编号 → Arrow 字符串标签列"""
+    return text_series(pc.take(pa.array(labels, type=pa.string()), pa.array(codes)))
+
+
+# ---------------------------
+# 与 core 对应的分片版本
+# ---------------------------
+def calculate_length_status_sharded(original_dict, translation_dict, statuses, metric=DEFAULT_METRIC, markup=None,
+                                    key_index=None, workers=None):
+    """calculate_length_status 的分片版本，另外返回由分片计数得到的统计表（同 compute_statistics）"""
+    with span("对齐"):
+        if key_index is None:
+            key_index = KeyIndex(original_dict.keys())
+        keys = text_series(key_index.keys)
+        orig_series = text_series(list(original_dict.values()))
+        trans_series = align_translation(key_index, translation_dict)
+    result = classify_sharded(orig_series, [trans_series], statuses, metric, markup, workers)
+    labels = code_labels(statuses)
+    ratios = result["ratios"][0]
+    df = pd.DataFrame({
+        "编号": keys,
+        "原文": orig_series,
+        "译文": trans_series,
+        "原文长度": result["lengths"][0],
+        "译文长度": result["lengths"][1],
+        "比值": ratios,
+        "比值(%)": text_series(format_ratio_percent(ratios)),
+        "标签": label_column(result["codes"][0], labels),
+    })
+    stats_df = statistics_frame(int(result["non_empty"][0]), int(result["non_empty"][1]),
+                                label_counts(result["counts"][0], labels), statuses)
+    return df, stats_df
+
+
+def build_length_matrix_sharded(original_dict, translation_dicts, statuses, metric=DEFAULT_METRIC, markup=None,
+                                key_index=None, workers=None):
+    """
+    build_length_matrix 的分片版本，另外返回每语言统计（同 compute_language_statistics）
+    返回 (matrix_df, texts_df, stats_df)
+    """
+    with span("对齐"):
+        if key_index is None:
+            key_index = KeyIndex(original_dict.keys())
+        keys = text_series(key_index.keys)
+        orig_series = text_series(list(original_dict.values()))
+        trans_columns = OrderedDict((lang, align_translation(key_index, d)) for lang, d in translation_dicts.items())
+    result = classify_sharded(orig_series, list(trans_columns.values()), statuses, metric, markup, workers)
+    labels = code_labels(statuses)
+
+    tag_columns = OrderedDict([("编号", keys), ("原文", orig_series)])
+    text_columns = OrderedDict([("编号", keys), ("原文", orig_series)])
+    summaries = OrderedDict()
+    for j, (lang, trans_series) in enumerate(trans_columns.items()):
+        tag_columns[lang] = label_column(result["codes"][j], labels)
+        text_columns[lang] = trans_series
+        summaries[lang] = {"non_empty": int(result["non_empty"][j + 1]), "tags": label_counts(result["counts"][j], labels)}
+    stats_df = language_statistics_frame(int(result["non_empty"][0]), summaries, statuses)
+    return pd.DataFrame(tag_columns), pd.DataFrame(text_columns), stats_df
+
+
+def compute_cell_tags_sharded(df, statuses, base_col, metric=DEFAULT_METRIC, markup=None, workers=None):
+    """
+    compute_cell_tags 的分片版本
+    返回 (tag_columns, summaries)：summaries 为 {语言列: {"non_empty": 有效字段数, "tags": {标签: 数量}}}
+    """
+    langs = [c for c in df.columns if c != '编号' and c != base_col]
+    result = classify_sharded(df[base_col], [df[c] for c in langs], statuses, metric, markup, workers)
+    # 原文为空 / 未分类 的单元格不着色，标签为 None
+    labels = [s["name"] for s in statuses] + [None, None]
+    lookup = np.asarray(labels, dtype=object)
+    tag_columns, summaries = {}, {}
+    for j, lang in enumerate(langs):
+        tag_columns[lang] = lookup[result["codes"][j]]
+        summaries[lang] = {"non_empty": int(result["non_empty"][j + 1]), "tags": label_counts(result["counts"][j], labels)}
+    return tag_columns, summaries
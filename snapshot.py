@@ -0,0 +1,89 @@
+"""
+项目快照：把合并后的多语言表格连同基础语言、标签配置保存为压缩的 Arrow 列式文件（Feather v2 / IPC）
+
+相比 xlsx，写入和读回都不经过 openpyxl 逐单元格处理；读取时只解压、加载用到的列，
+从磁盘路径打开时通过内存映射读取。基础语言与标签配置以 JSON 存在表结构的元数据中。
+"""
+import io
+import json
+import time
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+from core import TEXT_DTYPE, read_bytes
+from timing import timed
+
+SNAPSHOT_EXT = "arrow"
+SNAPSHOT_MIME = "application/vnd.apache.arrow.file"
+META_KEY = b"translation_tool"
+FORMAT_VERSION = 1
+# lz4 解压极快，读回速度接近未压缩；zstd 体积更小
+DEFAULT_COMPRESSION = "lz4"
+
+
+@timed("快照读写")
+def write_snapshot(target, df, base_language=None, statuses=None, compression=DEFAULT_COMPRESSION):
+    """把表格和配置写入 target（路径或可写的二进制文件对象）"""
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    meta = dict(table.schema.metadata or {})
+    meta[META_KEY] = json.dumps({
+        "version": FORMAT_VERSION,
+        "base_language": base_language,
+        "statuses": statuses,
+        "created": int(time.time()),
+    }, ensure_ascii=False).encode("utf-8")
+    feather.write_feather(table.replace_schema_metadata(meta), target, compression=compression)
+
+
+def snapshot_bytes(df, base_language=None, statuses=None, compression=DEFAULT_COMPRESSION):
+    """快照内容（bytes），用于下载按钮"""
+    buffer = io.BytesIO()
+    write_snapshot(buffer, df, base_language, statuses, compression)
+    return buffer.getvalue()
+
+
+def _source(source):
+    # 磁盘路径直接内存映射；上传的文件 / bytes 包装为零拷贝的 Arrow 缓冲区
+    if isinstance(source, str):
+        return source
+    return pa.BufferReader(read_bytes(source))
+
+
+def _parse_meta(schema):
+    raw = (schema.metadata or {}).get(META_KEY)
+    if raw is None:
+        raise ValueError("不是本工具保存的项目快照（缺少配置元数据）")
+    return json.loads(raw.decode("utf-8"))
+
+
+def read_snapshot_info(source):
+    """只读取表结构：返回 (列名列表, 配置字典)，不加载任何数据列"""
+    try:
+        schema = pa.ipc.open_file(_source(source)).schema
+    except pa.ArrowInvalid as e:
+        raise ValueError(f"无法读取项目快照: {e}")
+    return list(schema.names), _parse_meta(schema)
+
+
+@timed("快照读写")
+def read_snapshot(source, columns=None):
+    """
+    读取快照，返回 (DataFrame, 配置字典)
+    columns 为 None 时读取全部列，否则只解压、加载指定的列（顺序按传入顺序）
+    文本列为 Arrow 字符串类型（TEXT_DTYPE）
+    """
+    try:
+        table = feather.read_table(_source(source), columns=columns, memory_map=isinstance(source, str))
+    except pa.ArrowInvalid as e:
+        raise ValueError(f"无法读取项目快照: {e}")
+    meta = _parse_meta(table.schema)
+
+    def types_mapper(arrow_type):
+        if pa.types.is_string(arrow_type) or pa.types.is_large_string(arrow_type):
+            return TEXT_DTYPE
+        return None
+
+    df = table.to_pandas(types_mapper=types_mapper, ignore_metadata=True)
+    return df, meta
@@ -0,0 +1,96 @@
+"""
+原文版本差异：比较上一版与新版原文，只把新增/修改的编号送去检查和翻译
+
+每条原文先算出 64 位内容哈希（整列批量计算），按编号对齐后比较哈希即可得出
+新增 / 修改 / 删除 / 未变 四类编号；未变编号的现有译文直接沿用，删除的编号从译文中去掉。
+输出的最新译文仍覆盖新版原文的每个编号（complete_translation）：修改的编号没有新译文时保留旧译文并列为待复核，
+新增的编号没有译文时输出空值，不会因为增量检查而从译文文件中消失。
+"""
+import numpy as np
+import pandas as pd
+
+from keyindex import KeyIndex
+from metrics import as_str_list
+
+
+def content_hashes(texts):
+    """每条文本的 64 位内容哈希（uint64 数组）"""
+    values = np.asarray(as_str_list(texts), dtype=object)
+    return pd.util.hash_array(values, categorize=False)
+
+
+def diff_sources(old_original, new_original):
+    """
+    比较两版原文 {编号: 原文}
+    返回 {"added", "changed", "unchanged": 新版中的编号列表（按新版顺序）, "removed": 旧版中被删除的编号列表}
+    """
+    new_keys = list(new_original.keys())
+    old_keys = list(old_original.keys())
+    new_hashes = content_hashes(new_original.values())
+    old_hashes = content_hashes(old_original.values())
+
+    # 旧版编号在新版中的位置，把旧哈希对齐到新版的行上
+    positions = KeyIndex(new_keys).positions(old_keys)
+    present = positions >= 0
+    old_at_new = np.zeros(len(new_keys), dtype=np.uint64)
+    seen = np.zeros(len(new_keys), dtype=bool)
+    old_at_new[positions[present]] = old_hashes[present]
+    seen[positions[present]] = True
+
+    changed = seen & (old_at_new != new_hashes)
+    unchanged = seen & ~changed
+    return {
+        "added": [k for k, m in zip(new_keys, ~seen) if m],
+        "changed": [k for k, m in zip(new_keys, changed) if m],
+        "unchanged": [k for k, m in zip(new_keys, unchanged) if m],
+        "removed": [k for k, m in zip(old_keys, ~present) if m],
+    }
+
+
+def carry_over(translation_dict, diff):
+    """未变编号沿用现有译文（新版顺序），修改/新增编号不带旧译文，删除的编号去掉"""
+    return {k: translation_dict[k] for k in diff["unchanged"] if k in translation_dict}
+
+
+def queued_original(new_original, diff):
+    """只包含新增与修改编号的原文（新版顺序），作为检查与翻译的范围"""
+    queued = set(diff["added"]) | set(diff["changed"])
+    return {k: v for k, v in new_original.items() if k in queued}
+
+
+def plan_incremental(old_original, new_original, translation_dict):
+    """
+    增量检查/翻译的输入
+    返回 (diff, carried_translation, queued_original)
+    """
+    diff = diff_sources(old_original, new_original)
+    return diff, carry_over(translation_dict, diff), queued_original(new_original, diff)
+
+
+def complete_translation(keys, translation_dict, uploaded_translation, diff):
+    """
+    增量模式下导出的完整译文（按新版原文编号 keys 的顺序，覆盖每个编号）：
+    沿用或本次更新的译文照常输出；修改的编号没有新译文时保留上传的旧译文，其余编号输出空值
+    返回 (译文字典, 保留旧译文、需要复核的编号列表)
+    """
+    changed = set(diff["changed"])
+    completed, stale = {}, []
+    for key in keys:
+        if key in translation_dict:
+            completed[key] = translation_dict[key]
+        elif key in changed and key in uploaded_translation:
+            completed[key] = uploaded_translation[key]
+            stale.append(key)
+        else:
+            completed[key] = ""
+    return completed, stale
+
+
+def diff_summary(diff):
+    """各类编号数量，用于页面和命令行展示"""
+    return {
+        "新增": len(diff["added"]),
+        "修改": len(diff["changed"]),
+        "删除": len(diff["removed"]),
+        "未变": len(diff["unchanged"]),
+    }
@@ -0,0 +1,75 @@
+"""
+统计引擎：有效字段数与各标签数量一次聚合得出
+
+各列先转为 Arrow 字符串数组，非空判断（去首尾空白后长度 > 0）和标签计数都用 Arrow compute
+向量化完成；同一批 Arrow 缓冲区顺带算出内容哈希，作为缓存键，
+Streamlit 重跑时内容未变的表格直接返回上次的统计结果。
+"""
+import hashlib
+from collections import OrderedDict
+
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from metrics import to_arrow_text
+
+# 最近使用的统计结果缓存条目数
+CACHE_SIZE = 64
+
+_cache = OrderedDict()
+
+
+def _update_hash(h, arr):
+    chunks = arr.chunks if isinstance(arr, pa.ChunkedArray) else [arr]
+    for chunk in chunks:
+        h.update(f"{chunk.offset}:{len(chunk)}".encode())
+        for buf in chunk.buffers():
+            if buf is not None:
+                h.update(buf)
+    h.update(b"|")
+
+
+def content_hash(*arrays):
+    """多列 Arrow 数组内容的哈希（顺序敏感）"""
+    h = hashlib.blake2b(digest_size=16)
+    for arr in arrays:
+        _update_hash(h, arr)
+    return h.hexdigest()
+
+
+def count_non_empty(values):
+    """去除首尾空白后非空的条目数"""
+    arr = to_arrow_text(values)
+    non_empty = pc.greater(pc.binary_length(pc.utf8_trim_whitespace(arr)), 0)
+    return int(pc.sum(non_empty).as_py() or 0)
+
+
+def count_tags(tags):
+    """所有标签的数量，一次 value_counts（忽略空标签）"""
+    counts = pc.value_counts(to_arrow_text(tags))
+    return {v: int(c) for v, c in zip(counts.field("values").to_pylist(), counts.field("counts").to_pylist())
+            if v is not None}
+
+
+def summarize(tags, text_columns=None):
+    """
+    一次聚合得到 {"rows", "non_empty": {列名: 数量}, "tags": {标签: 数量}}
+    text_columns: OrderedDict 列名 -> 文本列，用于统计有效字段数
+    """
+    text_columns = text_columns or {}
+    tag_arr = to_arrow_text(tags)
+    text_arrs = OrderedDict((name, to_arrow_text(col)) for name, col in text_columns.items())
+    key = (content_hash(tag_arr, *text_arrs.values()), tuple(text_arrs))
+    if key in _cache:
+        _cache.move_to_end(key)
+        return _cache[key]
+
+    result = {
+        "rows": len(tag_arr),
+        "non_empty": {name: count_non_empty(arr) for name, arr in text_arrs.items()},
+        "tags": count_tags(tag_arr),
+    }
+    _cache[key] = result
+    if len(_cache) > CACHE_SIZE:
+        _cache.popitem(last=False)
+    return result
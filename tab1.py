@@ -5,27 +5,44 @@ from datetime import datetime
 from collections import OrderedDict
 from st_aggrid import AgGrid, GridOptionsBuilder, JsCode, GridUpdateMode, DataReturnMode
 
+from fragment import fragment
+from core import (
+    parse_txt, calculate_length_status, compute_statistics, process_iteration,
+    build_length_matrix, compute_language_statistics, build_language_exports,
+    split_zip_download, format_kv_lines,
+)
+from keyindex import KeyIndex, format_bytes
+from markup import DEFAULT_MARKUP_PATTERNS, build_markup_patterns
+from metrics import METRIC_NAMES
+from shard import build_length_matrix_sharded, calculate_length_status_sharded, default_workers
+from sourcediff import complete_translation, diff_summary, plan_incremental
+from timing import span
+from terminology import TERM_COLUMN, TERM_TAG, annotate_terminology, count_violations, get_matcher, resolve_glossary
+
 def tab1_content():
     st.header("翻译长度检查")
     st.info("上传原文文件和翻译文件后，工具会计算每个字段的长度比值，并标记为标签。可自定义标签，也可使用默认过短/合格/过长标签。")
 
+    check_mode = st.radio("检查模式", options=["单个译文（可迭代）", "多语言矩阵"], horizontal=True, key="tab1_check_mode")
+    multi_mode = check_mode == "多语言矩阵"
+
     # 上传原文文件和翻译文件
     original_file = st.file_uploader("上传原文文件 (.txt)", type="txt")
-    translation_file = st.file_uploader("上传翻译文件 (.txt)", type="txt")
-    iteration_file = st.file_uploader("上传迭代文件 (.txt, 可选)", type="txt")
-
-    def parse_txt(file):
-        result = {}
-        # 使用 utf-8-sig 自动移除 BOM，并用 errors='replace' 防止奇怪编码报错
-        text = file.getvalue().decode("utf-8-sig", errors="replace")
-        for line in text.splitlines():
-            if "=" in line:
-                key, value = line.split("=", 1)
-                key = key.strip()
-                value = value.strip()
-                if key:  # 忽略空 key
-                    result[key] = value
-        return result
+    if multi_mode:
+        translation_files = st.file_uploader("上传多个翻译文件 (.txt)，文件名作为语言名", type="txt",
+                                             accept_multiple_files=True, key="tab1_translation_files")
+        translation_file = None
+        iteration_file = None
+        previous_file = None
+    else:
+        translation_files = []
+        translation_file = st.file_uploader("上传翻译文件 (.txt)", type="txt")
+        iteration_file = st.file_uploader("上传迭代文件 (.txt, 可选)", type="txt")
+        previous_file = st.file_uploader("上传上一版原文 (.txt, 可选：只检查新增/修改的编号)", type="txt",
+                                         key="tab1_previous_original")
+        glossary_file = st.file_uploader("上传术语表 (.txt/.csv/.tsv/.xlsx, 可选：检查译文是否使用目标术语)",
+                                         type=["txt", "csv", "tsv", "xlsx"], key="tab1_glossary")
+        glossary_url = st.text_input("或填写术语库链接（下载后缓存在本地）", value="", key="tab1_glossary_url")
 
     # ---- 标签自定义配置 ----
     st.subheader("自定义标签设置（可选）")
@@ -40,19 +57,115 @@ def tab1_content():
     status_count = st.number_input("标签数量", min_value=1, max_value=10, value=len(default_statuses), step=1, key="tab1_status_count")
     custom_statuses = []
 
-    st.write("标签配置")
-    for i in range(status_count):
-        default = default_statuses[i] if i < len(default_statuses) else {"name": f"标签{i+1}", "min": -99999, "max": 99999, "color": "#FFFFFF"}
-        col1, col2, col3, col4 = st.columns([3,2,2,2])
-        with col1:
-            name = st.text_input(f"标签{i+1} 名称", value=default["name"])
-        with col2:
-            min_val = st.number_input(f"标签{i+1} 最小值", value=float(default["min"]))
-        with col3:
-            max_val = st.number_input(f"标签{i+1} 最大值", value=float(default["max"]))
-        with col4:
-            color = st.color_picker(f"标签{i+1} 颜色", value=default["color"])
-        custom_statuses.append({"name": name.strip(), "min": min_val, "max": max_val, "color": color})
+    # 区间与长度计算方式放在表单中：修改时不重跑页面，点"应用标签配置"后才重新计算标签；
+    # 颜色只影响表格样式，在表格片段中设置
+    with st.form("tab1_status_form", border=False):
+        st.write("标签配置")
+        for i in range(status_count):
+            default = default_statuses[i] if i < len(default_statuses) else {"name": f"标签{i+1}", "min": -99999, "max": 99999, "color": "#FFFFFF"}
+            col1, col2, col3 = st.columns([3,2,2])
+            with col1:
+                name = st.text_input(f"标签{i+1} 名称", value=default["name"])
+            with col2:
+                min_val = st.number_input(f"标签{i+1} 最小值", value=float(default["min"]))
+            with col3:
+                max_val = st.number_input(f"标签{i+1} 最大值", value=float(default["max"]))
+            custom_statuses.append({"name": name.strip(), "min": min_val, "max": max_val, "color": default["color"]})
+
+        length_metric = st.selectbox("长度计算方式", options=METRIC_NAMES, index=0, key="tab1_length_metric",
+                                     help="字符数：按码点计数；显示宽度：中日韩全角字符计 2；字素簇：按用户可见字符计数；UTF-8 字节数：按引擎限制的编码字节计数")
+        markup_names = st.multiselect("长度计算时忽略的标记", options=list(DEFAULT_MARKUP_PATTERNS), default=[], key="tab1_markup_names")
+        custom_markup = st.text_input("自定义忽略规则（正则，可选）", value="", key="tab1_custom_markup")
+        st.form_submit_button("应用标签配置")
+    try:
+        markup = build_markup_patterns(markup_names, custom_markup)
+    except ValueError as e:
+        st.warning(f"{e}，已忽略自定义规则")
+        markup = build_markup_patterns(markup_names)
+    use_shards = st.checkbox("多进程分片计算（百万级编号）", value=False, key="tab1_sharded",
+                             help="按编号区间分给多个进程计算长度与标签，文本经共享内存传给子进程；首次使用需启动进程池")
+    shard_workers = 0
+    if use_shards:
+        shard_workers = int(st.number_input("进程数", min_value=1, max_value=64, value=default_workers(), step=1, key="tab1_shard_workers"))
+
+    # ---- 多语言矩阵：原文解析一次，所有译文一起对齐、分类 ----
+    if multi_mode:
+        if original_file and translation_files:
+            original_dict = parse_txt(original_file)
+            translation_dicts = OrderedDict(
+                (os.path.splitext(f.name)[0], parse_txt(f)) for f in translation_files
+            )
+            key_index = KeyIndex(original_dict.keys())
+            if shard_workers:
+                matrix_df, texts_df, language_stats_df = build_length_matrix_sharded(
+                    original_dict, translation_dicts, custom_statuses, length_metric, markup, key_index, shard_workers)
+            else:
+                matrix_df, texts_df = build_length_matrix(original_dict, translation_dicts, custom_statuses, length_metric, markup, key_index)
+                language_stats_df = compute_language_statistics(matrix_df, texts_df, custom_statuses)
+            report = key_index.memory_report()
+            if report["整数索引"]:
+                st.caption(f"编号全部为数字，使用整数索引：{format_bytes(report['索引字节数'])}"
+                           f"（字符串索引约 {format_bytes(report['字符串索引字节数(估算)'])}，"
+                           f"节省 {format_bytes(report['节省字节数'])}）")
+            else:
+                st.caption("编号包含非数字字符，使用字符串索引")
+
+            st.subheader("每语言统计信息")
+            st.dataframe(language_stats_df)
+
+            # ---- 标签矩阵（片段：改颜色只重绘表格，不重新对齐、分类） ----
+            @fragment("标签矩阵")
+            def matrix_grid():
+                st.subheader("编号 × 语言 标签矩阵")
+                status_colors = {}
+                for i, (s, col) in enumerate(zip(custom_statuses, st.columns(len(custom_statuses)))):
+                    status_colors[s["name"]] = col.color_picker(f"{s['name']} 颜色", value=s["color"], key=f"tab1_status_color_{i}")
+                gb = GridOptionsBuilder.from_dataframe(matrix_df)
+                gb.configure_default_column(filter=True, sortable=True, resizable=True)
+                cellstyle_jscode = JsCode(f"""
+                function(params) {{
+                    const colors = {json.dumps(status_colors)};
+                    if (colors[params.value]) {{
+                        return {{backgroundColor: colors[params.value]}};
+                    }} else {{
+                        return {{}};
+                    }}
+                }}
+                """)
+                for lang in translation_dicts:
+                    gb.configure_column(lang, cellStyle=cellstyle_jscode)
+                gb.configure_column("原文", tooltipField="原文")
+                with span("表格渲染"):
+                    # 固定 key：表格身份不随数据和样式变化，改颜色时就地重绘；不再对整张表的序列化参数求哈希
+                    AgGrid(matrix_df, gridOptions=gb.build(), height=600, fit_columns_on_grid_load=True,
+                           enable_enterprise_modules=False, allow_unsafe_jscode=True, key="tab1_matrix_grid")
+
+            # ---- 按语言导出（片段：改导出标签只重新生成导出文件） ----
+            @fragment("按语言导出")
+            def matrix_export():
+                st.subheader("按语言导出筛选原文")
+                export_labels = st.multiselect(
+                    "导出哪些标签的字段",
+                    options=[s["name"] for s in custom_statuses],
+                    default=[s["name"] for s in custom_statuses if s["name"] in ["过短", "过长"]],
+                    key="tab1_matrix_export_labels"
+                )
+                export_files = build_language_exports(matrix_df, export_labels)
+                if export_files:
+                    zip_buffer = io.BytesIO()
+                    with zipfile.ZipFile(zip_buffer, "w") as zip_file:
+                        for filename, content in export_files.items():
+                            zip_file.writestr(filename, content)
+                    st.download_button(label=f"下载各语言筛选原文 ({len(export_files)} 个文件)",
+                                       data=zip_buffer.getvalue(),
+                                       file_name=f"各语言筛选原文_{int(time.time())}.zip",
+                                       mime="application/zip")
+                else:
+                    st.info("没有符合导出条件的字段。")
+
+            matrix_grid()
+            matrix_export()
+        return
 
     # ---- 可迭代标签选择 ----
     st.subheader("选择可迭代标签(默认合格)")
@@ -64,132 +177,27 @@ def tab1_content():
         default=[custom_statuses[0]["name"]]  # 默认第一个标签（通常是"合格"）
     )
 
-    # ----- 计算单个条目的标签函数 -----
-    def calculate_single_status(orig_text, trans_text, statuses):
-        orig_len = len(orig_text)
-        trans_len = len(trans_text)
-
-        if orig_len == 0:
-            return "原文为空"
-
-        ratio = (trans_len - orig_len) / orig_len
-        ratio = round(ratio, 4)
-
-        for s in statuses:
-            s_min = float("-inf") if s.get("min") is None else s["min"]
-            s_max = float("inf") if s.get("max") is None else s["max"]
-            if s_min <= ratio <= s_max:
-                return s["name"]
-        
-        return "未分类"
-
-    # ----- 计算比值和标签的函数 -----
-    def calculate_length_status(original_dict, translation_dict, statuses):
-        data = []
-        for key, orig_text in original_dict.items():
-            trans_text = translation_dict.get(key, "")
-            orig_len = len(orig_text)
-            trans_len = len(trans_text)
-
-            if orig_len == 0:
-                ratio = None
-                ratio_percent = ""
-            else:
-                ratio = (trans_len - orig_len) / orig_len
-                ratio = round(ratio, 4)
-                ratio_percent = f"{ratio*100:.2f}%"
-
-            status = "原文为空" if orig_len == 0 else None
-
-            if ratio is not None:
-                for s in statuses:
-                    s_min = float("-inf") if s.get("min") is None else s["min"]
-                    s_max = float("inf") if s.get("max") is None else s["max"]
-                    if s_min <= ratio <= s_max:
-                        status = s["name"]
-                        break
-                if status is None:
-                    status = "未分类"
-
-            data.append({
-                "编号": key,
-                "原文": orig_text,
-                "译文": trans_text,
-                "原文长度": orig_len,
-                "译文长度": trans_len,
-                "比值": ratio,
-                "比值(%)": ratio_percent,
-                "标签": status
-            })
-        return pd.DataFrame(data)
-
-    # ---- 统计信息函数 ----
-    def compute_statistics(df, statuses, total_field="原文"):
-        records = []
-        total_valid = df[total_field].apply(lambda x: bool(x.strip())).sum()
-        records.append({"类型": f"{total_field}有效字段数量", "数量": total_valid, "占比": ""})
-        total_trans = df["译文"].apply(lambda x: bool(x.strip())).sum()
-        records.append({"类型": "译文有效字段数量", "数量": total_trans, "占比": ""})
-        for s in statuses:
-            count = df[df["标签"] == s["name"]].shape[0]
-            ratio = (count / total_valid * 100) if total_valid else 0
-            records.append({"类型": s["name"], "数量": count, "占比": f"{ratio:.2f}%"})
-        return pd.DataFrame(records)
-
     if original_file and translation_file:
         original_dict = parse_txt(original_file)
         translation_dict = parse_txt(translation_file)
+        uploaded_translation = translation_dict
+        full_original_dict = original_dict
 
-        # 初始化迭代统计
-        iteration_stats = {
-            "total_in_iteration": 0,
-            "matched_in_original": 0,
-            "updated_translations": 0,
-            "skipped_not_iterable": 0,
-            "iteration_labels_distribution": {}
-        }
+        # ---- 增量模式：只检查新增/修改的编号，未变编号沿用现有译文 ----
+        if previous_file:
+            diff, translation_dict, original_dict = plan_incremental(parse_txt(previous_file), full_original_dict, translation_dict)
+            summary = diff_summary(diff)
+            st.info(f"原文版本差异：新增 {summary['新增']} / 修改 {summary['修改']} / 删除 {summary['删除']} / 未变 {summary['未变']}，"
+                    f"本次只检查 {len(original_dict)} 个新增或修改的编号。")
 
         # ---- 迭代文件更新翻译字典 ----
         if iteration_file:
             iteration_dict = parse_txt(iteration_file)
-            iteration_stats["total_in_iteration"] = len(iteration_dict)
-            
-            # 规范化可迭代标签列表
+            translation_dict, updated_records, iteration_stats, iteration_labels_count = process_iteration(
+                original_dict, translation_dict, iteration_dict, iterable_labels, custom_statuses, length_metric, markup
+            )
             iterable_labels_norm = [label.strip() for label in iterable_labels]
-            
-            # 用于跟踪哪些记录被更新了
-            updated_keys = []
-            
-            # 首先分析迭代文件中每个条目的标签分布
-            iteration_labels_count = {}
-            
-            for key, iteration_value in iteration_dict.items():
-                if key in original_dict:
-                    iteration_stats["matched_in_original"] += 1
-                    
-                    # 获取原文内容
-                    original_text = original_dict[key]
-                    
-                    # 计算迭代条目的标签（基于迭代文件的译文和原文）
-                    iteration_label = calculate_single_status(original_text, iteration_value, custom_statuses)
-                    
-                    # 记录标签分布
-                    iteration_labels_count[iteration_label] = iteration_labels_count.get(iteration_label, 0) + 1
-                    
-                    # 检查迭代条目的标签是否在可迭代标签列表中
-                    if iteration_label in iterable_labels_norm:
-                        # 更新翻译字典
-                        translation_dict[key] = iteration_value
-                        iteration_stats["updated_translations"] += 1
-                        updated_keys.append((key, iteration_label))
-                    else:
-                        iteration_stats["skipped_not_iterable"] += 1
-                else:
-                    # 迭代文件中的键在原文中不存在，跳过
-                    pass
-            
-            iteration_stats["iteration_labels_distribution"] = iteration_labels_count
-            
+
             # 显示迭代统计信息
             if iteration_stats["total_in_iteration"] > 0:
                 st.success(f"迭代文件处理完成:")
@@ -219,69 +227,37 @@ def tab1_content():
                 with col2:
                     st.dataframe(iteration_df)
                 
-                if updated_keys:
-                    # 构建展示表格
-                    display_rows = []
-                    before_update_translation = translation_dict.copy()
-                    updated_records = []
-
-                    for key, iteration_value in iteration_dict.items():
-                        if key in original_dict:
-                            original_text = original_dict.get(key, "")
-                            old_translation = before_update_translation.get(key, "")
-                            # 计算迭代条目的标签（基于迭代文件的译文）
-                            iteration_label = calculate_single_status(original_text, iteration_value, custom_statuses)
-
-                            if iteration_label in iterable_labels_norm:
-                                # 更新翻译字典（这是实际生效的更新）
-                                translation_dict[key] = iteration_value
-
-                                # 计算原比值与新比值（与 calculate_length_status 保持一致的定义）
-                                orig_len = len(original_text)
-                                old_trans_len = len(old_translation)
-                                new_trans_len = len(iteration_value)
-
-                                if orig_len == 0:
-                                    original_ratio = None
-                                    original_ratio_pct = ""
-                                    new_ratio = None
-                                    new_ratio_pct = ""
-                                else:
-                                    original_ratio = round((old_trans_len - orig_len) / orig_len, 4)
-                                    original_ratio_pct = f"{original_ratio*100:.2f}%"
-                                    new_ratio = round((new_trans_len - orig_len) / orig_len, 4)
-                                    new_ratio_pct = f"{new_ratio*100:.2f}%"
-
-                                # 计算新标签（基于新译文）
-                                new_label = calculate_single_status(original_text, iteration_value, custom_statuses)
-
-                                updated_records.append({
-                                    "编号": key,
-                                    "原文": original_text,
-                                    "原译文": old_translation,
-                                    "新译文": iteration_value,
-                                    "原比值": original_ratio,
-                                    "原比值(%)": original_ratio_pct,
-                                    "新比值": new_ratio,
-                                    "新比值(%)": new_ratio_pct,
-                                    "新标签": new_label
-                                })
-
-                    # ---- 在迭代处理结束后：展示全部更新记录（若有） ----
-                    if updated_records:
-                        df_updated = pd.DataFrame(updated_records)
-                        st.subheader("本次迭代更新明细")
-                        # 直接展示完整表格（可滚动、可排序）
-                        st.dataframe(df_updated)
-                    else:
-                        st.info("本次迭代没有更新任何条目（或无匹配可迭代标签）。")
+                # ---- 在迭代处理结束后：展示全部更新记录（若有） ----
+                if updated_records:
+                    df_updated = pd.DataFrame(updated_records)
+                    st.subheader("本次迭代更新明细")
+                    # 直接展示完整表格（可滚动、可排序）
+                    st.dataframe(df_updated)
+                else:
+                    st.info("本次迭代没有更新任何条目（或无匹配可迭代标签）。")
 
         # ---- 重新计算最终 DataFrame ----
-        df_result = calculate_length_status(original_dict, translation_dict, custom_statuses)
+        if shard_workers:
+            df_result, stats_df = calculate_length_status_sharded(original_dict, translation_dict, custom_statuses, length_metric, markup,
+                                                                  workers=shard_workers)
+        else:
+            df_result = calculate_length_status(original_dict, translation_dict, custom_statuses, length_metric, markup)
+            stats_df = compute_statistics(df_result, custom_statuses, total_field="原文")
+
+        # ---- 术语检查：原文出现源术语而译文缺少目标术语时加 术语缺失 标签 ----
+        matcher = None
+        try:
+            glossary = resolve_glossary(glossary_file, glossary_url)
+        except ValueError as e:
+            st.warning(str(e))
+            glossary = None
+        if glossary:
+            matcher = get_matcher(glossary)
+            df_result = annotate_terminology(df_result, matcher)
+            st.caption(f"术语检查：术语表 {len(matcher)} 条，{count_violations(df_result)} 条译文缺少目标术语")
 
         # ---- 上传文件整体统计 ----
         st.subheader("字段统计信息（原文 vs 译文）")
-        stats_df = compute_statistics(df_result, custom_statuses, total_field="原文")
         st.dataframe(
             stats_df.reset_index(drop=True)
                     .style
@@ -289,67 +265,85 @@ def tab1_content():
                     .set_properties(subset=["数量","占比"], **{'text-align': 'center'})
         )
 
-        # ---- AgGrid 显示 ----
-        st.subheader("翻译长度检查结果")
-        st.info("下表显示每个字段的原文、译文、长度及标签，可选择导出过短或过长字段。")
-
-        gb = GridOptionsBuilder.from_dataframe(df_result)
-        gb.configure_selection("multiple", use_checkbox=True)
-        gb.configure_default_column(filter=True, sortable=True, resizable=True)
-        status_colors = {s["name"]: s["color"] for s in custom_statuses}
-        cellstyle_jscode = JsCode(f"""
-        function(params) {{
-            const colors = {json.dumps(status_colors)};
-            if (colors[params.value]) {{
-                return {{backgroundColor: colors[params.value]}};
-            }} else {{
-                return {{}};
+        # ---- AgGrid 显示（片段：改颜色、勾选行只重绘表格，不重新解析、计算标签） ----
+        @fragment("结果表格")
+        def result_grid():
+            st.subheader("翻译长度检查结果")
+            st.info("下表显示每个字段的原文、译文、长度及标签，可选择导出过短或过长字段。")
+
+            gb = GridOptionsBuilder.from_dataframe(df_result)
+            gb.configure_selection("multiple", use_checkbox=True)
+            gb.configure_default_column(filter=True, sortable=True, resizable=True)
+            status_colors = {}
+            for i, (s, col) in enumerate(zip(custom_statuses, st.columns(len(custom_statuses)))):
+                status_colors[s["name"]] = col.color_picker(f"{s['name']} 颜色", value=s["color"], key=f"tab1_status_color_{i}")
+            cellstyle_jscode = JsCode(f"""
+            function(params) {{
+                const colors = {json.dumps(status_colors)};
+                if (colors[params.value]) {{
+                    return {{backgroundColor: colors[params.value]}};
+                }} else {{
+                    return {{}};
+                }}
             }}
-        }}
-        """)
-        gb.configure_column("标签", cellStyle=cellstyle_jscode)
-        for col in df_result.columns:
-            gb.configure_column(col, tooltipField=col)
-        grid_options = gb.build()
-        AgGrid(df_result, gridOptions=grid_options, height=600, fit_columns_on_grid_load=True,
-               enable_enterprise_modules=False, allow_unsafe_jscode=True)
-
-        # ---- 导出功能 ----
-        st.subheader("选择导出条件")
-        st.info("选择要导出的字段标签，并可选择拆分导出文件。")
-        export_checks = {}
-        for s in custom_statuses:
-            export_checks[s["name"]] = st.checkbox(f"{s['name']}字段", value=(s["name"] in ["过短","过长"]))
-        export_df = df_result[df_result["标签"].isin([name for name, checked in export_checks.items() if checked])]
-
-        if not export_df.empty:
-            st.write(f"符合条件的字段数量: {len(export_df)}")
-            split_lines = st.number_input("每个拆分文件行数（留空或 0 表示不拆分）", min_value=0, value=0, step=1, key="tab1_split_lines")
-
-            if split_lines > 0:
-                zip_buffer = io.BytesIO()
-                with zipfile.ZipFile(zip_buffer, "w") as zip_file:
-                    total_lines = len(export_df)
-                    num_parts = (total_lines + split_lines - 1) // split_lines
+            """)
+            gb.configure_column("标签", cellStyle=cellstyle_jscode)
+            if matcher is not None:
+                gb.configure_column(TERM_COLUMN, cellStyle=JsCode(f"""
+                function(params) {{
+                    return params.value === {json.dumps(TERM_TAG)} ? {{backgroundColor: "#A65E00"}} : {{}};
+                }}
+                """))
+            for col in df_result.columns:
+                gb.configure_column(col, tooltipField=col)
+            grid_options = gb.build()
+            with span("表格渲染"):
+                # 固定 key：表格身份不随数据和样式变化，改颜色时就地重绘；不再对整张表的序列化参数求哈希
+                AgGrid(df_result, gridOptions=grid_options, height=600, fit_columns_on_grid_load=True,
+                       enable_enterprise_modules=False, allow_unsafe_jscode=True, key="tab1_result_grid")
+
+        # ---- 导出功能（片段：改导出条件只重新生成导出内容） ----
+        @fragment("导出")
+        def export_section():
+            st.subheader("选择导出条件")
+            st.info("选择要导出的字段标签，并可选择拆分导出文件。")
+            export_checks = {}
+            for s in custom_statuses:
+                export_checks[s["name"]] = st.checkbox(f"{s['name']}字段", value=(s["name"] in ["过短","过长"]))
+            export_mask = df_result["标签"].isin([name for name, checked in export_checks.items() if checked])
+            if matcher is not None and st.checkbox(f"{TERM_TAG}字段", value=False, key="tab1_export_terms"):
+                export_mask |= df_result[TERM_COLUMN] == TERM_TAG
+            export_df = df_result[export_mask]
+
+            if not export_df.empty:
+                st.write(f"符合条件的字段数量: {len(export_df)}")
+                split_lines = st.number_input("每个拆分文件行数（留空或 0 表示不拆分）", min_value=0, value=0, step=1, key="tab1_split_lines")
+
+                if split_lines > 0:
+                    compress_level = st.number_input("压缩级别（0 表示不压缩，1-9 越大越小越慢）", min_value=0, max_value=9, value=0, step=1, key="tab1_zip_level")
+                    zip_data, num_parts = split_zip_download(export_df, split_lines, compress_level)
                     st.write(f"将拆分成 {num_parts} 个文件，每个最多 {split_lines} 行。")
-                    for i in range(num_parts):
-                        part_df = export_df.iloc[i*split_lines:(i+1)*split_lines]
-                        part_txt = "\n".join([f"{row['编号']}={row['原文']}" for idx,row in part_df.iterrows()])
-                        part_name = f"筛选原文_part_{i+1}.txt"
-                        zip_file.writestr(part_name, part_txt)
-                zip_buffer.seek(0)
-                st.download_button(label=f"下载拆分后的压缩包 ({num_parts} 个文件)",
-                                   data=zip_buffer.getvalue(),
-                                   file_name=f"筛选原文拆分_{int(time.time())}.zip",
-                                   mime="application/zip")
-            else:
-                export_txt = "\n".join([f"{row['编号']}={row['原文']}" for idx,row in export_df.iterrows()])
-                st.download_button(label="下载筛选结果 (.txt)",
-                                   data=export_txt,
-                                   file_name=f"筛选原文_{int(time.time())}.txt",
-                                   mime="text/plain")
+                    st.download_button(label=f"下载拆分后的压缩包 ({num_parts} 个文件)",
+                                       data=zip_data,
+                                       file_name=f"筛选原文拆分_{int(time.time())}.zip",
+                                       mime="application/zip")
+                else:
+                    export_txt = format_kv_lines(export_df["编号"], export_df["原文"])
+                    st.download_button(label="下载筛选结果 (.txt)",
+                                       data=export_txt,
+                                       file_name=f"筛选原文_{int(time.time())}.txt",
+                                       mime="text/plain")
+
+        result_grid()
+        export_section()
 
         # ---- 导出最新版翻译文件 ----
+        if previous_file:
+            # 按新版原文顺序输出每个编号：沿用的译文 + 本次迭代更新的译文，修改但未更新的编号保留旧译文
+            translation_dict, stale_keys = complete_translation(full_original_dict, translation_dict, uploaded_translation, diff)
+            if stale_keys:
+                st.warning(f"{len(stale_keys)} 个原文已修改的编号还没有新译文，导出文件中保留了旧译文，请复核："
+                           + "、".join(stale_keys[:20]) + ("…" if len(stale_keys) > 20 else ""))
         final_translation_txt = "\n".join([f"{key}={value}" for key,value in translation_dict.items()])
         st.download_button(label="导出最新版的总翻译文件 (.txt)",
                            data=final_translation_txt,
@@ -5,6 +5,9 @@ from datetime import datetime
 from collections import OrderedDict
 from st_aggrid import AgGrid, GridOptionsBuilder, JsCode, GridUpdateMode, DataReturnMode
 
+from core import export_language_files
+from timing import span
+
 def tab4_content():
     st.header("拆分文件")
     st.info("上传 Excel 文件，根据列名生成各语言 TXT/INI 文件，每行格式为 '编号=内容'。")
@@ -22,38 +25,13 @@ def tab4_content():
         st.write(f"总行数: {len(df)}, 总列数: {len(df.columns)}")
         st.dataframe(df.head(num_rows))
 
-    def export_language_files(df, output_format="txt"):
-        """
-        根据 DataFrame 拆分生成各语言文件
-        """
-        created_files = {}
-        
-        # 检查 '编号' 列
-        if '编号' not in df.columns:
-            st.error("Excel文件中缺少 '编号' 列！")
-            return created_files
-
-        language_columns = [col for col in df.columns if col != '编号']
-
-        # 输出到内存（BytesIO）对象，用于下载
-        for lang in language_columns:
-            buffer = io.StringIO()
-            for _, row in df.iterrows():
-                id_value = str(row['编号']).strip()
-                cell_value = "" if pd.isna(row[lang]) else str(row[lang])
-                buffer.write(f"{id_value}={cell_value}\n")
-            buffer.seek(0)
-            filename = f"{lang}.{output_format}"
-            created_files[filename] = buffer.getvalue()
-        
-        return created_files
-
     # ---------------------------
     # 用户交互
     # ---------------------------
     if uploaded_file:
         try:
-            df = pd.read_excel(uploaded_file, engine='openpyxl')
+            with span("Excel 读写"):
+                df = pd.read_excel(uploaded_file, engine='openpyxl')
             preview_excel(df)
 
             st.subheader("输出设置")
@@ -1,11 +1,14 @@
 import streamlit as st
-from cozepy import Coze, TokenAuth, WorkflowEventType, COZE_CN_BASE_URL
+from cozepy import WorkflowEventType
 import pandas as pd
 import json, io, zipfile, time, subprocess, tempfile, os
 from datetime import datetime
 from collections import OrderedDict
 from st_aggrid import AgGrid, GridOptionsBuilder, JsCode, GridUpdateMode, DataReturnMode
 
+from cozepool import get_client
+from timing import span
+
 def tab6_content():
     st.header("Coze Workflow 调试")
     st.info("使用 PAT 调用 Coze Workflow，实时显示事件并解析 download_url")
@@ -33,8 +36,8 @@ def tab6_content():
             # 解析 url 为列表
             url_array = [line.strip() for line in url_list.splitlines() if line.strip()]
             
-            # 初始化 Coze 客户端
-            coze = Coze(auth=TokenAuth(token=coze_token), base_url=COZE_CN_BASE_URL)
+            # 进程级池化的 Coze 客户端：同一 PAT 的多次点击复用长连接
+            coze = get_client(coze_token)
             
             # 构造 workflow 参数
             workflow_params = {
@@ -49,38 +52,39 @@ def tab6_content():
             output_container = st.empty()
             
             try:
-                # 调用 stream
-                stream_iter = coze.workflows.runs.stream(
-                    workflow_id=workflow_id,
-                    parameters=workflow_params
-                )
+                with span("Workflow 调用"):
+                    # 调用 stream
+                    stream_iter = coze.workflows.runs.stream(
+                        workflow_id=workflow_id,
+                        parameters=workflow_params
+                    )
                 
-                download_urls = []
+                    download_urls = []
 
-                for event in stream_iter:
-                    # 显示原始事件
-                    output_container.text(f"Event: {event}")
+                    for event in stream_iter:
+                        # 显示原始事件
+                        output_container.text(f"Event: {event}")
 
-                    # MESSAGE 事件解析
-                    if getattr(event, "event", None) == WorkflowEventType.MESSAGE:
-                        content = getattr(event.message, "content", None)
-                        if content:
-                            try:
-                                data = json.loads(content)
-                                url = data.get("download_url")
-                                if url:
-                                    download_urls.append(url)
-                                    st.success(f"解析到 download_url: {url}")
-                            except Exception as e:
-                                st.warning(f"解析 JSON 出错: {e}")
+                        # MESSAGE 事件解析
+                        if getattr(event, "event", None) == WorkflowEventType.MESSAGE:
+                            content = getattr(event.message, "content", None)
+                            if content:
+                                try:
+                                    data = json.loads(content)
+                                    url = data.get("download_url")
+                                    if url:
+                                        download_urls.append(url)
+                                        st.success(f"解析到 download_url: {url}")
+                                except Exception as e:
+                                    st.warning(f"解析 JSON 出错: {e}")
 
-                    # ERROR 事件
-                    elif getattr(event, "event", None) == WorkflowEventType.ERROR:
-                        st.error(f"Workflow 出现错误: {event.error}")
+                        # ERROR 事件
+                        elif getattr(event, "event", None) == WorkflowEventType.ERROR:
+                            st.error(f"Workflow 出现错误: {event.error}")
 
-                    # INTERRUPT 事件
-                    elif getattr(event, "event", None) == WorkflowEventType.INTERRUPT:
-                        st.warning("Workflow 被中断，需要 resume（目前未自动处理）")
+                        # INTERRUPT 事件
+                        elif getattr(event, "event", None) == WorkflowEventType.INTERRUPT:
+                            st.warning("Workflow 被中断，需要 resume（目前未自动处理）")
 
                 st.info("Workflow 执行完毕")
                 if download_urls:
@@ -4,10 +4,24 @@ import json, io, zipfile, subprocess, tempfile, os, re
 from datetime import datetime
 from collections import OrderedDict
 from st_aggrid import AgGrid, GridOptionsBuilder, JsCode, GridUpdateMode, DataReturnMode
-from cozepy import Coze as coze, TokenAuth, WorkflowEventType, COZE_CN_BASE_URL
 import time as t
 import hashlib
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from cozepool import get_client
+from core import (
+    parse_txt, calculate_length_status, compute_statistics, process_iteration,
+    split_zip_download, format_kv_lines,
+)
+from markup import DEFAULT_MARKUP_PATTERNS, build_markup_patterns
+from metrics import METRIC_NAMES
+from pendingqueue import PRIORITY_MODES, PRIORITY_WEIGHT, PendingQueue, build_queue, load_weights
+from timing import bind, span, timed
+from tmindex import DEFAULT_THRESHOLD, build_memory, suggest_translations
+from usage import UsageMeter, batch_usage
+from workflow import (
+    BatchApplier, WorkflowMessages, parse_workflow_candidates, select_candidates, stream_workflow_messages
+)
 
 def tab7_content():
     if "workflow_results" not in st.session_state:
@@ -23,9 +37,12 @@ def tab7_content():
         st.session_state.iteration_dict = {}
     # 会话中持久化待翻译队列和最新译文，避免重复使用旧译文进行迭代
     if "pending_keys" not in st.session_state:
-        st.session_state.pending_keys = []
+        st.session_state.pending_keys = PendingQueue()
     if "translation_dict" not in st.session_state:
         st.session_state.translation_dict = {}
+    # 翻译记忆：已接受译文的相似原文索引，随迭代接受的结果增量更新
+    if "tab7_memory" not in st.session_state:
+        st.session_state.tab7_memory = None
 
     st.header("工作流测试")
     st.info("上传原文文件和翻译文件后，工具会计算每个字段的长度比值，并标记为标签。可自定义标签，也可使用默认过短/合格/过长标签。")
@@ -35,156 +52,6 @@ def tab7_content():
     translation_file = st.file_uploader("上传翻译文件 (.txt)", type="txt")
     iteration_file = st.file_uploader("上传迭代文件 (.txt, 可选)", type="txt")
 
-    def parse_txt(file):
-        result = {}
-        # 使用 utf-8-sig 自动移除 BOM，并用 errors='replace' 防止奇怪编码报错
-        text = file.getvalue().decode("utf-8-sig", errors="replace")
-        for line in text.splitlines():
-            if "=" in line:
-                key, value = line.split("=", 1)
-                key = key.strip()
-                value = value.strip()
-                if key:  # 忽略空 key
-                    result[key] = value
-        return result
-    
-    def parse_workflow_results(workflow_results):
-        """
-        将 workflow 返回的结果解析成 {编号: 内容} 的 dict
-        规则：
-        - 等号左边是编号（任何字符）
-        - 等号右边是内容
-        """
-        parsed = {}
-
-        if not workflow_results:
-            return parsed
-
-        for batch in workflow_results:
-            if not isinstance(batch, dict):
-                continue
-
-            items = batch.get("download_url", [])
-            if not isinstance(items, list):
-                continue
-
-            for raw_item in items:
-                if not raw_item or not isinstance(raw_item, str):
-                    continue
-
-                text = raw_item.strip()
-
-                # ① 尝试解一层 JSON（处理 ["xxx=yyy"]）
-                if text.startswith("[") and text.endswith("]"):
-                    try:
-                        decoded = json.loads(text)
-                        if isinstance(decoded, list):
-                            for sub in decoded:
-                                _extract_kv_relaxed(sub, parsed)
-                            continue
-                    except Exception:
-                        pass  # 解不开就当普通字符串继续
-
-                # ② 普通字符串
-                _extract_kv_relaxed(text, parsed)
-
-        return parsed
-
-    def _extract_kv_relaxed(text, parsed_dict):
-        if not text or "=" not in text:
-            return
-
-        key, value = text.split("=", 1)
-
-        key = key.strip()
-        value = value.strip()
-
-        # 左右都必须非空
-        if not key or not value:
-            return
-
-        parsed_dict[key] = value
-
-    def process_iteration(original_dict, translation_dict, iteration_dict, iterable_labels, custom_statuses):
-        """
-        Apply iteration dict to translation_dict according to iterable_labels and custom_statuses.
-        Returns: (new_translation_dict, updated_records, iteration_stats, iteration_labels_count)
-        """
-        iteration_stats = {
-            "total_in_iteration": 0,
-            "matched_in_original": 0,
-            "updated_translations": 0,
-            "skipped_not_iterable": 0,
-            "iteration_labels_distribution": {}
-        }
-
-        updated_records = []
-        iteration_labels_count = {}
-
-        if not iteration_dict:
-            return translation_dict, updated_records, iteration_stats, iteration_labels_count
-
-        iteration_stats["total_in_iteration"] = len(iteration_dict)
-        iterable_labels_norm = [label.strip() for label in iterable_labels]
-
-        before_update_translation = translation_dict.copy()
-
-        for key, iteration_value in iteration_dict.items():
-            if key in original_dict:
-                iteration_stats["matched_in_original"] += 1
-                original_text = original_dict[key]
-                iteration_label = calculate_single_status(original_text, iteration_value, custom_statuses)
-                iteration_labels_count[iteration_label] = iteration_labels_count.get(iteration_label, 0) + 1
-
-                if iteration_label in iterable_labels_norm:
-                    translation_dict[key] = iteration_value
-                    iteration_stats["updated_translations"] += 1
-                else:
-                    iteration_stats["skipped_not_iterable"] += 1
-            else:
-                # key not in original, skip
-                pass
-
-        iteration_stats["iteration_labels_distribution"] = iteration_labels_count
-
-        # build updated_records for display
-        for key, iteration_value in iteration_dict.items():
-            if key in original_dict:
-                original_text = original_dict.get(key, "")
-                old_translation = before_update_translation.get(key, "")
-                iteration_label = calculate_single_status(original_text, iteration_value, custom_statuses)
-                if iteration_label in iterable_labels_norm:
-                    orig_len = len(original_text)
-                    old_trans_len = len(old_translation)
-                    new_trans_len = len(iteration_value)
-
-                    if orig_len == 0:
-                        original_ratio = None
-                        original_ratio_pct = ""
-                        new_ratio = None
-                        new_ratio_pct = ""
-                    else:
-                        original_ratio = round((old_trans_len - orig_len) / orig_len, 4)
-                        original_ratio_pct = f"{original_ratio*100:.2f}%"
-                        new_ratio = round((new_trans_len - orig_len) / orig_len, 4)
-                        new_ratio_pct = f"{new_ratio*100:.2f}%"
-
-                    new_label = calculate_single_status(original_text, iteration_value, custom_statuses)
-
-                    updated_records.append({
-                        "编号": key,
-                        "原文": original_text,
-                        "原译文": old_translation,
-                        "新译文": iteration_value,
-                        "原比值": original_ratio,
-                        "原比值(%)": original_ratio_pct,
-                        "新比值": new_ratio,
-                        "新比值(%)": new_ratio_pct,
-                        "新标签": new_label
-                    })
-
-        return translation_dict, updated_records, iteration_stats, iteration_labels_count
-
     # ---- 标签自定义配置 ----
     st.subheader("自定义标签设置（可选）")
     st.info("如果不修改，默认使用：合格 / 过短 / 过长 标签。")
@@ -212,6 +79,15 @@ def tab7_content():
             color = st.color_picker(f"标签{i+1} 颜色", value=default["color"])
         custom_statuses.append({"name": name.strip(), "min": min_val, "max": max_val, "color": color})
 
+    length_metric = st.selectbox("长度计算方式", options=METRIC_NAMES, index=0, key="tab7_length_metric")
+    markup_names = st.multiselect("长度计算时忽略的标记", options=list(DEFAULT_MARKUP_PATTERNS), default=[], key="tab7_markup_names")
+    custom_markup = st.text_input("自定义忽略规则（正则，可选）", value="", key="tab7_custom_markup")
+    try:
+        markup = build_markup_patterns(markup_names, custom_markup)
+    except ValueError as e:
+        st.warning(f"{e}，已忽略自定义规则")
+        markup = build_markup_patterns(markup_names)
+
     # ---- 可迭代标签选择 ----
     st.subheader("选择可迭代标签(默认合格)")
     st.info("注意：系统会计算迭代文件中每个条目的标签，只有标签在可迭代列表中的条目才会被更新到翻译文件中。")
@@ -222,78 +98,6 @@ def tab7_content():
         default=[custom_statuses[0]["name"]]  # 默认第一个标签（通常是"合格"）
     )
 
-    # ----- 计算单个条目的标签函数 -----
-    def calculate_single_status(orig_text, trans_text, statuses):
-        orig_len = len(orig_text)
-        trans_len = len(trans_text)
-
-        if orig_len == 0:
-            return "原文为空"
-
-        ratio = (trans_len - orig_len) / orig_len
-        ratio = round(ratio, 4)
-
-        for s in statuses:
-            s_min = float("-inf") if s.get("min") is None else s["min"]
-            s_max = float("inf") if s.get("max") is None else s["max"]
-            if s_min <= ratio <= s_max:
-                return s["name"]
-        
-        return "未分类"
-
-    # ----- 计算比值和标签的函数 -----
-    def calculate_length_status(original_dict, translation_dict, statuses):
-        data = []
-        for key, orig_text in original_dict.items():
-            trans_text = translation_dict.get(key, "")
-            orig_len = len(orig_text)
-            trans_len = len(trans_text)
-
-            if orig_len == 0:
-                ratio = None
-                ratio_percent = ""
-            else:
-                ratio = (trans_len - orig_len) / orig_len
-                ratio = round(ratio, 4)
-                ratio_percent = f"{ratio*100:.2f}%"
-
-            status = "原文为空" if orig_len == 0 else None
-
-            if ratio is not None:
-                for s in statuses:
-                    s_min = float("-inf") if s.get("min") is None else s["min"]
-                    s_max = float("inf") if s.get("max") is None else s["max"]
-                    if s_min <= ratio <= s_max:
-                        status = s["name"]
-                        break
-                if status is None:
-                    status = "未分类"
-
-            data.append({
-                "编号": key,
-                "原文": orig_text,
-                "译文": trans_text,
-                "原文长度": orig_len,
-                "译文长度": trans_len,
-                "比值": ratio,
-                "比值(%)": ratio_percent,
-                "标签": status
-            })
-        return pd.DataFrame(data)
-
-    # ---- 统计信息函数 ----
-    def compute_statistics(df, statuses, total_field="原文"):
-        records = []
-        total_valid = df[total_field].apply(lambda x: bool(x.strip())).sum()
-        records.append({"类型": f"{total_field}有效字段数量", "数量": total_valid, "占比": ""})
-        total_trans = df["译文"].apply(lambda x: bool(x.strip())).sum()
-        records.append({"类型": "译文有效字段数量", "数量": total_trans, "占比": ""})
-        for s in statuses:
-            count = df[df["标签"] == s["name"]].shape[0]
-            ratio = (count / total_valid * 100) if total_valid else 0
-            records.append({"类型": s["name"], "数量": count, "占比": f"{ratio:.2f}%"})
-        return pd.DataFrame(records)
-
     if original_file and translation_file:
         original_dict = parse_txt(original_file)
 
@@ -344,7 +148,7 @@ def tab7_content():
         else:
             # 使用封装函数处理迭代，这样可以被 workflow 后的按钮复用
             translation_dict, updated_records, iteration_stats, iteration_labels_count = process_iteration(
-                original_dict, translation_dict, iteration_dict, iterable_labels, custom_statuses
+                original_dict, translation_dict, iteration_dict, iterable_labels, custom_statuses, length_metric, markup
             )
 
             if iteration_stats["total_in_iteration"] > 0:
@@ -383,15 +187,15 @@ def tab7_content():
                     st.info("本次迭代没有更新任何条目（或无匹配可迭代标签）。")
                 # 保存更新后的译文到 session_state，以便下一轮导出基于已接受的译文
                 st.session_state.translation_dict = translation_dict
+                if updated_records and st.session_state.tab7_memory is not None:
+                    st.session_state.tab7_memory[1].add_records(updated_records)
                 # 从 pending_keys 中移除已被接受的编号（如果存在）
                 if updated_records:
-                    accepted_keys = [r.get("编号") for r in updated_records if r.get("编号")]
-                    pending = st.session_state.get("pending_keys", [])
-                    st.session_state.pending_keys = [k for k in pending if k not in accepted_keys]
+                    st.session_state.pending_keys.remove_many(r.get("编号") for r in updated_records if r.get("编号"))
 
         # ---- 重新计算最终 DataFrame（优先使用会话中已保存的译文） ----
         translation_display_dict = st.session_state.get("translation_dict", translation_dict)
-        df_result = calculate_length_status(original_dict, translation_display_dict, custom_statuses)
+        df_result = calculate_length_status(original_dict, translation_display_dict, custom_statuses, length_metric, markup)
 
         # ---- 上传文件整体统计 ----
         st.subheader("字段统计信息（原文 vs 译文）")
@@ -425,8 +229,9 @@ def tab7_content():
         for col in df_result.columns:
             gb.configure_column(col, tooltipField=col)
         grid_options = gb.build()
-        AgGrid(df_result, gridOptions=grid_options, height=600, fit_columns_on_grid_load=True,
-               enable_enterprise_modules=False, allow_unsafe_jscode=True)
+        with span("表格渲染"):
+            AgGrid(df_result, gridOptions=grid_options, height=600, fit_columns_on_grid_load=True,
+                   enable_enterprise_modules=False, allow_unsafe_jscode=True)
 
         # ---- 导出功能 ----
         st.subheader("选择导出条件")
@@ -436,7 +241,7 @@ def tab7_content():
             export_checks[s["name"]] = st.checkbox(f"{s['name']}字段", value=(s["name"] in ["过短","过长"]))
         # ===== 修复：使用最新译文动态计算待翻译字段 =====
         translation_dict_runtime = st.session_state.get("translation_dict", translation_dict)
-        df_result_runtime = calculate_length_status(original_dict, translation_dict_runtime, custom_statuses)
+        df_result_runtime = calculate_length_status(original_dict, translation_dict_runtime, custom_statuses, length_metric, markup)
 
         # 根据选中的可迭代标签筛选仍需翻译的字段
         export_df_runtime = df_result_runtime[df_result_runtime["标签"].isin(
@@ -450,23 +255,15 @@ def tab7_content():
             split_lines = st.number_input("每个拆分文件行数（留空或 0 表示不拆分）", min_value=0, value=0, step=1, key="tab1_split_lines")
 
             if split_lines > 0:
-                zip_buffer = io.BytesIO()
-                with zipfile.ZipFile(zip_buffer, "w") as zip_file:
-                    total_lines = len(export_df_runtime)
-                    num_parts = (total_lines + split_lines - 1) // split_lines
-                    st.write(f"将拆分成 {num_parts} 个文件，每个最多 {split_lines} 行。")
-                    for i in range(num_parts):
-                        part_df = export_df_runtime.iloc[i*split_lines:(i+1)*split_lines]
-                        part_txt = "\n".join([f"{row['编号']}={row['原文']}" for idx,row in part_df.iterrows()])
-                        part_name = f"筛选原文_part_{i+1}.txt"
-                        zip_file.writestr(part_name, part_txt)
-                zip_buffer.seek(0)
+                compress_level = st.number_input("压缩级别（0 表示不压缩，1-9 越大越小越慢）", min_value=0, max_value=9, value=0, step=1, key="tab7_zip_level")
+                zip_data, num_parts = split_zip_download(export_df_runtime, split_lines, compress_level)
+                st.write(f"将拆分成 {num_parts} 个文件，每个最多 {split_lines} 行。")
                 st.download_button(label=f"下载拆分后的压缩包 ({num_parts} 个文件)",
-                                   data=zip_buffer.getvalue(),
+                                   data=zip_data,
                                    file_name=f"筛选原文拆分_{int(t.time())}.zip",
                                    mime="application/zip")
             else:
-                export_txt = "\n".join([f"{row['编号']}={row['原文']}" for idx,row in export_df_runtime.iterrows()])
+                export_txt = format_kv_lines(export_df_runtime["编号"], export_df_runtime["原文"])
                 st.download_button(label="下载筛选结果 (.txt)",
                                    data=export_txt,
                                    file_name=f"筛选原文_{int(t.time())}.txt",
@@ -482,29 +279,82 @@ def tab7_content():
         # workflow 配置
         COZE_TOKEN = "pat_tI3FcbOnw0DsbHF4TYWemJtD1FLLCHYhtO0RBgZMaPHpAxqYnZ4UjAB3QAyItY7w"
         WORKFLOW_ID = "7582900707377446975"
-        coze_client = coze(auth=TokenAuth(token=COZE_TOKEN), base_url=COZE_CN_BASE_URL)
-
-        # 构建用于翻译的批次：优先使用会话中的 pending_keys（若为空则以当前筛选结果初始化），
-        # 并保证 pending_keys 与当前筛选结果同步（移除已被标记为合格或已被接受的键）
+        # 构建用于翻译的批次：优先使用会话中的 pending_keys 队列（若为空则以当前筛选结果初始化），
+        # 并保证队列与当前筛选结果同步（移除已被标记为合格或已被接受的键），按优先级顺序发送
         translation_dict_runtime = st.session_state.get("translation_dict", translation_dict)
 
         # 重新计算长度检查结果并筛选待翻译项（遵循当前 export_checks）
-        df_result_runtime = calculate_length_status(original_dict, translation_dict_runtime, custom_statuses)
-        export_df_runtime = df_result_runtime[df_result_runtime["标签"].isin([name for name, checked in export_checks.items() if checked])]
-
-        export_keys = list(export_df_runtime["编号"])
-        existing_pending = st.session_state.get("pending_keys", [])
-        if not existing_pending:
-            # 初次初始化 pending_keys
-            st.session_state.pending_keys = export_keys
-        else:
-            # 保留原有顺序，但过滤掉已不再符合导出条件的键
-            export_key_set = set(export_keys)
-            st.session_state.pending_keys = [k for k in existing_pending if k in export_key_set]
+        df_result_runtime = calculate_length_status(original_dict, translation_dict_runtime, custom_statuses, length_metric, markup)
+
+        # 发送优先级：最偏离规格的编号先发送；每次重跑按最新比值重新计算优先级
+        col_priority, col_weights = st.columns(2)
+        with col_priority:
+            priority_mode = st.radio("发送优先级", options=PRIORITY_MODES, horizontal=True, key="tab7_priority",
+                                     help="比值偏离：比值离第一个可迭代标签区间越远越先发送；原文长度：越长越先发送；"
+                                          "文件权重：按上传的 编号=权重 文件，权重越大越先发送；文件顺序：按原文顺序")
+        weights = None
+        with col_weights:
+            if priority_mode == PRIORITY_WEIGHT:
+                weights_file = st.file_uploader("上传优先级权重文件 (.txt, 编号=权重)", type="txt", key="tab7_priority_weights")
+                if weights_file:
+                    weights = load_weights(weights_file)
+                    st.caption(f"已读取 {len(weights)} 个编号的权重")
+
+        export_labels = [name for name, checked in export_checks.items() if checked]
+        existing_pending = st.session_state.pending_keys
+        st.session_state.pending_keys = build_queue(
+            df_result_runtime, export_labels, priority_mode, custom_statuses,
+            iterable_labels[0] if iterable_labels else None, weights,
+            # 初次为空时用当前筛选结果初始化，否则只保留仍在队列中的编号
+            keys=existing_pending if existing_pending else None,
+        )
+        current_pending_keys = st.session_state.pending_keys.ordered()
+
+        # ---- 翻译记忆：发送前先用相似原文的已接受译文预填 ----
+        st.subheader("翻译记忆预填")
+        # 标签区间与标记规则决定哪些译文算作已接受，改动后重建翻译记忆
+        memory_id = (st.session_state.get("translation_file_hash"), tuple(iterable_labels), length_metric,
+                     tuple((s["name"], s["min"], s["max"]) for s in custom_statuses), markup)
+        if st.session_state.tab7_memory is None or st.session_state.tab7_memory[0] != memory_id:
+            st.session_state.tab7_memory = (memory_id, build_memory(df_result_runtime, iterable_labels))
+            st.session_state.pop("tab7_memory_suggestions", None)
+        memory = st.session_state.tab7_memory[1]
+        memory_threshold = st.slider("翻译记忆相似度阈值", min_value=0.5, max_value=1.0,
+                                     value=DEFAULT_THRESHOLD, step=0.05, key="tab7_memory_threshold")
+        st.caption(f"翻译记忆条目数: {len(memory)}（标签属于可迭代标签的译文）")
+
+        if st.button("查找翻译记忆建议", disabled=not current_pending_keys or not len(memory)):
+            t0 = t.perf_counter()
+            suggestions, suggestion_records = suggest_translations(
+                memory, original_dict, current_pending_keys, custom_statuses, iterable_labels,
+                length_metric, markup, threshold=memory_threshold
+            )
+            st.session_state.tab7_memory_suggestions = (suggestions, suggestion_records)
+            st.caption(f"查询 {len(current_pending_keys)} 条用时 {(t.perf_counter() - t0) * 1000:.1f} ms")
+
+        if st.session_state.get("tab7_memory_suggestions"):
+            suggestions, suggestion_records = st.session_state.tab7_memory_suggestions
+            suggestions = {k: v for k, v in suggestions.items() if k in st.session_state.pending_keys}
+            if suggestions:
+                st.write(f"找到 {len(suggestions)} 条相似度 ≥ {memory_threshold:.2f} 且长度标签可迭代的候选：")
+                st.dataframe(pd.DataFrame([r for r in suggestion_records if r["编号"] in suggestions]))
+                if st.button(f"采用翻译记忆建议（{len(suggestions)} 条）"):
+                    translation_runtime = st.session_state.get("translation_dict", translation_dict)
+                    translation_dict, updated_records, _, _ = process_iteration(
+                        original_dict, translation_runtime, suggestions, iterable_labels, custom_statuses, length_metric, markup
+                    )
+                    st.session_state.translation_dict = translation_dict
+                    memory.add_records(updated_records)
+                    accepted_keys = {r["编号"] for r in updated_records}
+                    st.session_state.pending_keys.remove_many(accepted_keys)
+                    current_pending_keys = st.session_state.pending_keys.ordered()
+                    st.session_state.pop("tab7_memory_suggestions", None)
+                    st.success(f"已采用 {len(accepted_keys)} 条翻译记忆译文，这些编号不再发送给 Workflow")
+            else:
+                st.info("待翻译队列中没有可用的翻译记忆候选")
 
-        current_pending_keys = st.session_state.pending_keys
         field_objects = [f"{k}={original_dict[k]}" for k in current_pending_keys]
-        st.info(f"待翻译队列长度: {len(current_pending_keys)}（将按该队列顺序分批发送）")
+        st.info(f"待翻译队列长度: {len(current_pending_keys)}（将按{priority_mode}优先级顺序分批发送）")
 
         # 构建 batch
         batch_size = 10
@@ -520,30 +370,33 @@ def tab7_content():
         language = st.text_input("目标语言", value="es")
         terminology = st.text_input("术语表（可选）", value="")
 
-        def run_batch(batch, batch_index):
-            results = []
+        pipeline = st.checkbox("每个批次完成后立即合并结果（流水线）", value=True, key="tab7_pipeline",
+                               help="批次返回后立即解析并迭代进译文，待翻译数与标签数量实时更新；中途出错时已完成批次的结果已保存")
+
+        @timed("Workflow 调用")
+        def call_workflow(batch, batch_index):
+            results = WorkflowMessages()
             raw_events = []
             try:
-                stream = coze_client.workflows.runs.stream(
-                    workflow_id=WORKFLOW_ID,
-                    parameters={
+                # 进程级池化的 Coze 客户端：跨重跑、跨会话复用 HTTP 长连接（每次调用时取，空闲关闭后会重新创建）
+                results = stream_workflow_messages(
+                    get_client(COZE_TOKEN), WORKFLOW_ID,
+                    {
                         "url": batch,  # 直接传字段数组
                         "language": language,
                         "terminology": terminology
-                    }
+                    },
+                    on_event=lambda event: raw_events.append(repr(event)),
                 )
-                for event in stream:
-                    raw_events.append(repr(event))
-                    if event.event == WorkflowEventType.MESSAGE:
-                        content = getattr(event.message, "content", None)
-                        if content:
-                            try:
-                                results.append(json.loads(content))
-                            except Exception:
-                                results.append(content)
             except Exception as e:
                 raw_events.append(f"Batch {batch_index+1} 调用失败：{e}")
-            return batch_index, results, raw_events
+            return results, raw_events
+
+        def run_batch(batch, batch_index, applier=None):
+            results, raw_events = call_workflow(batch, batch_index)
+            # 流水线模式：在工作线程中立即解析并合并本批结果（合并过程加锁）
+            records = applier.apply(results)[1] if applier is not None else []
+            return batch_index, results, raw_events, records, batch_usage(batch, results)
         
         if st.button("开始调用 Workflow（并行 + 实时进度）"):
             progress_bar = st.progress(0)
@@ -552,16 +405,42 @@ def tab7_content():
             all_results = [None]*total_batches
             all_raw_events = [None]*total_batches
 
+            applier = None
+            if pipeline:
+                # 会话中的译文字典被就地更新，每合并一个批次即已保存
+                st.session_state.translation_dict = translation_dict_runtime
+                applier = BatchApplier(original_dict, translation_dict_runtime, df_result_runtime,
+                                       [name for name, checked in export_checks.items() if checked],
+                                       iterable_labels, custom_statuses, length_metric, markup)
+
+            usage_meter = UsageMeter()
             with ThreadPoolExecutor(max_workers=total_batches) as executor:
-                futures = [executor.submit(run_batch, batch, idx) for idx, batch in enumerate(batches)]
-                for i, future in enumerate(futures):
-                    idx, results, raw_events = future.result()
+                futures = [executor.submit(bind(run_batch), batch, idx, applier) for idx, batch in enumerate(batches)]
+                for i, future in enumerate(as_completed(futures)):
+                    idx, results, raw_events, records, usage = future.result()
                     all_results[idx] = results
                     all_raw_events[idx] = raw_events
+                    usage_meter.record(idx, 1, batches[idx], usage)
 
                     progress = int(((i+1)/total_batches) * 100)
                     progress_bar.progress(progress)
-                    status_text.text(f"已完成 {i+1}/{total_batches} 批次")
+                    if applier is None:
+                        status_text.text(f"已完成 {i+1}/{total_batches} 批次")
+                        continue
+                    if records and st.session_state.tab7_memory is not None:
+                        st.session_state.tab7_memory[1].add_records(records)
+                    live = applier.progress()
+                    status_text.text(f"已完成 {i+1}/{total_batches} 批次 | 已更新 {live['updated']} 条 | 待翻译 {live['pending']} 条 | "
+                                     + " / ".join(f"{s['name']} {live['tags'].get(s['name'], 0)}" for s in custom_statuses))
+
+            if applier is not None:
+                st.session_state.pending_keys.remove_many(r["编号"] for r in applier.updated_records)
+                stats = applier.iteration_stats
+                st.success(f"已逐批合并 Workflow 结果：解析 {applier.parsed_count} 条，更新 {stats['updated_translations']} 条，"
+                           f"跳过 {stats['skipped_not_iterable']} 条，剩余待翻译 {len(applier.pending)} 条")
+                if applier.updated_records:
+                    st.subheader("已更新条目（来自 Workflow）")
+                    st.dataframe(pd.DataFrame(applier.updated_records))
 
                     # st.write(f"### 批次 {idx+1} 返回结果：")
                     # st.text(json.dumps(results, ensure_ascii=False, indent=2))
@@ -574,17 +453,19 @@ def tab7_content():
             # ⭐⭐ 关键：调用解析函数 ⭐⭐
 
             st.session_state.has_workflow_result = True
-            parsed_results = parse_workflow_results(workflow_results)
+            # 同一编号返回多个候选时，按长度标签区间在本地选出最合适的一个
+            parsed_results = select_candidates(original_dict, parse_workflow_candidates(workflow_results),
+                                               custom_statuses, iterable_labels, length_metric, markup)
             st.session_state.iteration_dict = parsed_results
             can_iterate = bool(iteration_file) or st.session_state.has_workflow_result
 
-            # 当按钮被点击时，调用 process_iteration 并展示结果
-            if st.button("使用当前结果执行迭代", disabled=not can_iterate):
+            # 当按钮被点击时，调用 process_iteration 并展示结果（流水线模式下结果已逐批合并）
+            if applier is None and st.button("使用当前结果执行迭代", disabled=not can_iterate):
                 iteration_dict_runtime = st.session_state.iteration_dict
                 # 使用会话中保存的最新译文，避免使用旧的本地变量覆盖已经接受的译文
                 translation_runtime = st.session_state.get("translation_dict", translation_dict)
                 translation_dict, updated_records, iteration_stats, iteration_labels_count = process_iteration(
-                    original_dict, translation_runtime, iteration_dict_runtime, iterable_labels, custom_statuses
+                    original_dict, translation_runtime, iteration_dict_runtime, iterable_labels, custom_statuses, length_metric, markup
                 )
 
                 if iteration_stats["total_in_iteration"] > 0:
@@ -610,7 +491,7 @@ def tab7_content():
                     st.subheader("第二轮准备：重新计算统计与导出内容")
                     
                     # 重新计算长度检查结果
-                    df_result_new = calculate_length_status(original_dict, translation_dict, custom_statuses)
+                    df_result_new = calculate_length_status(original_dict, translation_dict, custom_statuses, length_metric, markup)
                     
                     # 重新计算统计信息
                     stats_df_new = compute_statistics(df_result_new, custom_statuses, total_field="原文")
@@ -637,13 +518,14 @@ def tab7_content():
 
                 # 保存更新后的译文到 session_state，供下一轮使用
                 st.session_state.translation_dict = translation_dict
+                if updated_records and st.session_state.tab7_memory is not None:
+                    st.session_state.tab7_memory[1].add_records(updated_records)
                 # 从 pending_keys 中移除已被接受的编号（如果存在）
                 if updated_records:
-                    accepted_keys = [r.get("编号") for r in updated_records if r.get("编号")]
-                    pending = st.session_state.get("pending_keys", [])
-                    st.session_state.pending_keys = [k for k in pending if k not in accepted_keys]
+                    st.session_state.pending_keys.remove_many(r.get("编号") for r in updated_records if r.get("编号"))
 
             st.success("Workflow 执行完成")
+            st.caption(f"💰 {usage_meter.calls} 次调用，{usage_meter.describe(len(applier.updated_records) if applier is not None else None)}")
 
             st.subheader("Workflow 输出结果（原始）")
             st.text_area(
@@ -3,8 +3,21 @@ import pandas as pd
 import json, io, zipfile, tempfile, os, re, time, hashlib
 from datetime import datetime
 from collections import OrderedDict
-from concurrent.futures import ThreadPoolExecutor
-from cozepy import Coze as coze, TokenAuth, WorkflowEventType, COZE_CN_BASE_URL
+
+from fragment import fragment
+from automation import DEFAULT_MAX_ATTEMPTS, MAX_WORKERS, MODES, QUEUE, ROUNDS, AutomationRun, MultiLanguageRun
+from core import parse_txt, calculate_length_status
+from cozepool import DEFAULT_POOL_SIZE, MAX_POOL_SIZE, get_client, pool_stats
+from markup import DEFAULT_MARKUP_PATTERNS, build_markup_patterns
+from metrics import METRIC_NAMES
+from pendingqueue import PRIORITY_MODES, PRIORITY_WEIGHT, load_weights
+from sourcediff import carry_over, complete_translation, diff_summary, plan_incremental
+from stats import summarize
+from terminology import TERM_TAG, annotate_terminology, count_violations, fetch_glossary, get_matcher
+from timing import timed
+from tmindex import DEFAULT_THRESHOLD
+from usage import Pricing
+from workflow import stream_workflow_messages
 
 def tab8_content():
     """
@@ -12,8 +25,13 @@ def tab8_content():
     1. 上传原文、译文
     2. 配置标签（自定义标签、可迭代标签）
     3. 选择导出条件
-    4. 点击"开始自动化"后每 5 秒自动循环：筛选 → Workflow → 迭代 → 更新译文
+    4. 点击"开始自动化"后持续执行：筛选 → Workflow → 迭代 → 更新译文
+       （连续队列：空闲的工作线程立即取下一批，未通过的编号回到队尾；按轮次：每轮结束后间隔数秒再开始）
     5. 停止条件：用户点停止/导出、或待翻译字段 ≤ 50
+    6. 单个编号发送达到上限仍未通过时不再发送，列入待复核列表并保留最接近合格的候选
+    7. 可同时上传其他目标语言的翻译文件：所有语言在一个任务中运行，共用原文解析和并发数，
+       各语言轮流发送批次，各自有停止阈值和进度
+    8. 按批次 / 轮次 / 运行统计 Token 用量与费用（Workflow 未报告用量时按内容长度估算），给出每接受编号费用
     """
     
     # 初始化会话变量
@@ -29,6 +47,16 @@ def tab8_content():
         st.session_state.translation_file_hash = None
     if "auto_loop_count" not in st.session_state:
         st.session_state.auto_loop_count = 0
+    if "auto_review" not in st.session_state:
+        st.session_state.auto_review = []
+    # Token 与费用：按轮次汇总的行与逐批次的行
+    if "auto_usage" not in st.session_state:
+        st.session_state.auto_usage = []
+    if "auto_usage_batches" not in st.session_state:
+        st.session_state.auto_usage_batches = []
+    # 其他目标语言：语言名 -> 译文字典（与主语言的 auto_translation_dict 一样就地更新）
+    if "auto_extra_dicts" not in st.session_state:
+        st.session_state.auto_extra_dicts = OrderedDict()
 
     st.header("自动化翻译迭代")
     st.info("上传原文和翻译文件后，自动循环执行 Workflow 调用和迭代，直到达成停止条件。")
@@ -36,183 +64,48 @@ def tab8_content():
     # 上传文件
     original_file = st.file_uploader("上传原文文件 (.txt)", type="txt", key="tab8_original")
     translation_file = st.file_uploader("上传翻译文件 (.txt)", type="txt", key="tab8_translation")
-
-    # 公用解析函数（复用 tab7 逻辑）
-    def parse_txt(file):
-        result = {}
-        text = file.getvalue().decode("utf-8-sig", errors="replace")
-        for line in text.splitlines():
-            if "=" in line:
-                key, value = line.split("=", 1)
-                key = key.strip()
-                value = value.strip()
-                if key:
-                    result[key] = value
-        return result
-
-    def parse_workflow_results(workflow_results):
-        parsed = {}
-        if not workflow_results:
-            return parsed
-        for batch in workflow_results:
-            if not isinstance(batch, dict):
-                continue
-            items = batch.get("download_url", [])
-            if not isinstance(items, list):
-                continue
-            for raw_item in items:
-                if not raw_item or not isinstance(raw_item, str):
-                    continue
-                text = raw_item.strip()
-                if text.startswith("[") and text.endswith("]"):
-                    try:
-                        decoded = json.loads(text)
-                        if isinstance(decoded, list):
-                            for sub in decoded:
-                                _extract_kv_relaxed(sub, parsed)
-                            continue
-                    except Exception:
-                        pass
-                _extract_kv_relaxed(text, parsed)
-        return parsed
-
-    def _extract_kv_relaxed(text, parsed_dict):
-        if not text or "=" not in text:
-            return
-        key, value = text.split("=", 1)
-        key = key.strip()
-        value = value.strip()
-        if not key or not value:
-            return
-        parsed_dict[key] = value
-
-    def calculate_single_status(orig_text, trans_text, statuses):
-        orig_len = len(orig_text)
-        trans_len = len(trans_text)
-        if orig_len == 0:
-            return "原文为空"
-        ratio = (trans_len - orig_len) / orig_len
-        ratio = round(ratio, 4)
-        for s in statuses:
-            s_min = float("-inf") if s.get("min") is None else s["min"]
-            s_max = float("inf") if s.get("max") is None else s["max"]
-            if s_min <= ratio <= s_max:
-                return s["name"]
-        return "未分类"
-
-    def calculate_length_status(original_dict, translation_dict, statuses):
-        data = []
-        for key, orig_text in original_dict.items():
-            trans_text = translation_dict.get(key, "")
-            orig_len = len(orig_text)
-            trans_len = len(trans_text)
-            if orig_len == 0:
-                ratio = None
-                ratio_percent = ""
-            else:
-                ratio = (trans_len - orig_len) / orig_len
-                ratio = round(ratio, 4)
-                ratio_percent = f"{ratio*100:.2f}%"
-            status = "原文为空" if orig_len == 0 else None
-            if ratio is not None:
-                for s in statuses:
-                    s_min = float("-inf") if s.get("min") is None else s["min"]
-                    s_max = float("inf") if s.get("max") is None else s["max"]
-                    if s_min <= ratio <= s_max:
-                        status = s["name"]
-                        break
-                if status is None:
-                    status = "未分类"
-            data.append({
-                "编号": key,
-                "原文": orig_text,
-                "译文": trans_text,
-                "原文长度": orig_len,
-                "译文长度": trans_len,
-                "比值": ratio,
-                "比值(%)": ratio_percent,
-                "标签": status
-            })
-        return pd.DataFrame(data)
-
-    def process_iteration(original_dict, translation_dict, iteration_dict, iterable_labels, custom_statuses):
-        iteration_stats = {
-            "total_in_iteration": 0,
-            "matched_in_original": 0,
-            "updated_translations": 0,
-            "skipped_not_iterable": 0,
-            "iteration_labels_distribution": {}
-        }
-        updated_records = []
-        iteration_labels_count = {}
-        if not iteration_dict:
-            return translation_dict, updated_records, iteration_stats, iteration_labels_count
-        
-        iteration_stats["total_in_iteration"] = len(iteration_dict)
-        iterable_labels_norm = [label.strip() for label in iterable_labels]
-        before_update_translation = translation_dict.copy()
-
-        for key, iteration_value in iteration_dict.items():
-            if key in original_dict:
-                iteration_stats["matched_in_original"] += 1
-                original_text = original_dict[key]
-                iteration_label = calculate_single_status(original_text, iteration_value, custom_statuses)
-                iteration_labels_count[iteration_label] = iteration_labels_count.get(iteration_label, 0) + 1
-                if iteration_label in iterable_labels_norm:
-                    translation_dict[key] = iteration_value
-                    iteration_stats["updated_translations"] += 1
-                else:
-                    iteration_stats["skipped_not_iterable"] += 1
-
-        iteration_stats["iteration_labels_distribution"] = iteration_labels_count
-
-        for key, iteration_value in iteration_dict.items():
-            if key in original_dict:
-                original_text = original_dict.get(key, "")
-                old_translation = before_update_translation.get(key, "")
-                iteration_label = calculate_single_status(original_text, iteration_value, custom_statuses)
-                if iteration_label in iterable_labels_norm:
-                    orig_len = len(original_text)
-                    old_trans_len = len(old_translation)
-                    new_trans_len = len(iteration_value)
-                    if orig_len == 0:
-                        original_ratio = None
-                        original_ratio_pct = ""
-                        new_ratio = None
-                        new_ratio_pct = ""
-                    else:
-                        original_ratio = round((old_trans_len - orig_len) / orig_len, 4)
-                        original_ratio_pct = f"{original_ratio*100:.2f}%"
-                        new_ratio = round((new_trans_len - orig_len) / orig_len, 4)
-                        new_ratio_pct = f"{new_ratio*100:.2f}%"
-                    new_label = calculate_single_status(original_text, iteration_value, custom_statuses)
-                    updated_records.append({
-                        "编号": key,
-                        "原文": original_text,
-                        "原译文": old_translation,
-                        "新译文": iteration_value,
-                        "原比值": original_ratio,
-                        "原比值(%)": original_ratio_pct,
-                        "新比值": new_ratio,
-                        "新比值(%)": new_ratio_pct,
-                        "新标签": new_label
-                    })
-
-        return translation_dict, updated_records, iteration_stats, iteration_labels_count
+    previous_file = st.file_uploader("上传上一版原文 (.txt, 可选：只翻译新增/修改的编号)", type="txt", key="tab8_previous_original")
+    extra_files = st.file_uploader("上传其他目标语言的翻译文件 (.txt, 可选，可多选；文件名作为目标语言)", type="txt",
+                                   accept_multiple_files=True, key="tab8_extra_translations")
 
     if original_file and translation_file:
         # 解析原文
         original_dict = parse_txt(original_file)
+        full_original_dict = original_dict
 
         # 解析译文，使用哈希判断是否为新上传
         raw_bytes = translation_file.getvalue()
         file_hash = hashlib.md5(raw_bytes).hexdigest() if raw_bytes is not None else None
         parsed_translation = parse_txt(translation_file)
+        # 上传的完整译文（增量模式下导出时为修改但未更新的编号保留旧译文）
+        uploaded_translation = parsed_translation
+        uploaded_extras = OrderedDict()
+
+        # 增量模式：只把新增/修改的编号交给自动化，未变编号沿用现有译文
+        if previous_file:
+            diff, parsed_translation, original_dict = plan_incremental(parse_txt(previous_file), full_original_dict, parsed_translation)
+            file_hash = f"{file_hash}:{hashlib.md5(previous_file.getvalue()).hexdigest()}"
+            summary = diff_summary(diff)
+            st.info(f"原文版本差异：新增 {summary['新增']} / 修改 {summary['修改']} / 删除 {summary['删除']} / 未变 {summary['未变']}，"
+                    f"自动化只处理 {len(original_dict)} 个新增或修改的编号。")
+
+        # 其他目标语言：与主语言共用原文（增量模式下沿用同一份原文版本差异，同样只处理新增/修改的编号）
+        extra_translations = OrderedDict()
+        for f in extra_files or []:
+            lang = os.path.splitext(f.name)[0]
+            if lang in uploaded_extras:
+                st.error(f"其他语言的翻译文件 {f.name} 与已上传的文件同名（语言 {lang}），已忽略")
+                continue
+            parsed_extra = parse_txt(f)
+            uploaded_extras[lang] = parsed_extra
+            extra_translations[lang] = carry_over(parsed_extra, diff) if previous_file else parsed_extra
+            file_hash = f"{file_hash}:{f.name}:{hashlib.md5(f.getvalue()).hexdigest()}"
 
         # 只有当 session 中没有译文，或上传的文件内容与 session 中保存的不同，才覆盖 session 中的译文字典
         prev_hash = st.session_state.get("translation_file_hash")
         if prev_hash != file_hash or not st.session_state.get("auto_translation_dict"):
             st.session_state.auto_translation_dict = parsed_translation
+            st.session_state.auto_extra_dicts = extra_translations
             st.session_state.translation_file_hash = file_hash
             # 新上传时重置自动化状态
             st.session_state.auto_running = False
@@ -223,61 +116,138 @@ def tab8_content():
 
         # ---- 标签配置 ----
         st.subheader("配置标签")
-        col1, col2 = st.columns(2)
-
-        with col1:
-            st.write("**自定义标签设置**（用于初始统计和导出筛选）")
-            default_statuses = [
-                {"name": "合格", "min": -0.4, "max": 2, "color": "#00A000"},
-                {"name": "过短", "min": -99999, "max": -0.4, "color": "#0071A6"},
-                {"name": "过长", "min": 2, "max": 99999, "color": "#A60000"}
-            ]
-            status_count = st.number_input("标签数量", min_value=1, max_value=10, value=len(default_statuses), step=1, key="tab8_status_count")
-            custom_statuses = []
-            for i in range(status_count):
-                default = default_statuses[i] if i < len(default_statuses) else {"name": f"标签{i+1}", "min": -99999, "max": 99999, "color": "#FFFFFF"}
-                col_name, col_min, col_max = st.columns([2, 1, 1])
-                with col_name:
-                    name = st.text_input(f"标签{i+1} 名称", value=default["name"], key=f"tab8_status_name_{i}")
-                with col_min:
-                    min_val = st.number_input(f"最小值", value=float(default["min"]), key=f"tab8_status_min_{i}")
-                with col_max:
-                    max_val = st.number_input(f"最大值", value=float(default["max"]), key=f"tab8_status_max_{i}")
-                custom_statuses.append({"name": name.strip(), "min": min_val, "max": max_val, "color": default["color"]})
-
-        with col2:
-            st.write("**可迭代标签选择**（用于过滤迭代结果）")
-            iterable_labels = st.multiselect(
-                "选择哪些标签的结果可以被迭代",
-                options=[s["name"] for s in custom_statuses],
-                default=[custom_statuses[0]["name"]],
-                key="tab8_iterable_labels"
-            )
-
-        # ---- 导出条件 ----
-        st.subheader("选择导出条件（筛选待翻译字段）")
-        export_checks = {}
-        for s in custom_statuses:
-            export_checks[s["name"]] = st.checkbox(f"{s['name']}字段", value=(s["name"] in ["过短","过长"]), key=f"tab8_export_{s['name']}")
-
-        # ---- 自动化参数 ----
-        st.subheader("自动化参数")
-        col1, col2, col3, col4 = st.columns(4)
-        with col1:
-            loop_interval = st.number_input("循环间隔（秒）", min_value=1, max_value=60, value=5, step=1, key="tab8_loop_interval")
-        with col2:
-            threshold = st.number_input("停止阈值（待翻译字段数≤此值时停止）", min_value=1, max_value=500, value=50, step=10, key="tab8_threshold")
-        with col3:
-            token = st.text_input("Token", value="1234567890", key="tab8_token")
-        with col4:
-            coze_api = st.text_input("工作流 API（默认不改）", value="7582900707377446975", key="tab8_coze_api")
-
-        st.subheader("翻译参数")
-        col1, col2 = st.columns(2)
-        with col1:
-            target_language = st.text_input("目标语言", value="输入语言", key="tab8_target_language")
-        with col2:
-            terminology = st.text_input("术语库链接（可选）", value="", key="tab8_terminology")
+        default_statuses = [
+            {"name": "合格", "min": -0.4, "max": 2, "color": "#00A000"},
+            {"name": "过短", "min": -99999, "max": -0.4, "color": "#0071A6"},
+            {"name": "过长", "min": 2, "max": 99999, "color": "#A60000"}
+        ]
+        status_count = st.number_input("标签数量", min_value=1, max_value=10, value=len(default_statuses), step=1, key="tab8_status_count")
+        # 标签区间、可迭代标签与导出条件放在表单中：修改时不重跑页面，点"应用标签配置"后一起生效
+        with st.form("tab8_label_form", border=False):
+            col1, col2 = st.columns(2)
+
+            with col1:
+                st.write("**自定义标签设置**（用于初始统计和导出筛选）")
+                custom_statuses = []
+                for i in range(status_count):
+                    default = default_statuses[i] if i < len(default_statuses) else {"name": f"标签{i+1}", "min": -99999, "max": 99999, "color": "#FFFFFF"}
+                    col_name, col_min, col_max = st.columns([2, 1, 1])
+                    with col_name:
+                        name = st.text_input(f"标签{i+1} 名称", value=default["name"], key=f"tab8_status_name_{i}")
+                    with col_min:
+                        min_val = st.number_input(f"最小值", value=float(default["min"]), key=f"tab8_status_min_{i}")
+                    with col_max:
+                        max_val = st.number_input(f"最大值", value=float(default["max"]), key=f"tab8_status_max_{i}")
+                    custom_statuses.append({"name": name.strip(), "min": min_val, "max": max_val, "color": default["color"]})
+                length_metric = st.selectbox("长度计算方式", options=METRIC_NAMES, index=0, key="tab8_length_metric")
+                markup_names = st.multiselect("长度计算时忽略的标记", options=list(DEFAULT_MARKUP_PATTERNS), default=[], key="tab8_markup_names")
+                custom_markup = st.text_input("自定义忽略规则（正则，可选）", value="", key="tab8_custom_markup")
+                try:
+                    markup = build_markup_patterns(markup_names, custom_markup)
+                except ValueError as e:
+                    st.warning(f"{e}，已忽略自定义规则")
+                    markup = build_markup_patterns(markup_names)
+
+            with col2:
+                st.write("**可迭代标签选择**（用于过滤迭代结果）")
+                iterable_labels = st.multiselect(
+                    "选择哪些标签的结果可以被迭代",
+                    options=[s["name"] for s in custom_statuses],
+                    default=[custom_statuses[0]["name"]],
+                    key="tab8_iterable_labels"
+                )
+
+            # ---- 导出条件 ----
+            st.subheader("选择导出条件（筛选待翻译字段）")
+            export_checks = {}
+            for s in custom_statuses:
+                export_checks[s["name"]] = st.checkbox(f"{s['name']}字段", value=(s["name"] in ["过短","过长"]), key=f"tab8_export_{s['name']}")
+            st.form_submit_button("应用标签配置")
+
+        extra_languages = list(st.session_state.auto_extra_dicts)
+
+        # ---- 自动化参数（片段：调整参数只重跑这一部分；页面整体重跑时返回各参数的值） ----
+        # 自动化运行中调整参数不会打断运行（片段重跑排在运行之后），停止按钮仍在片段之外
+        @fragment("自动化参数")
+        def automation_params():
+            st.subheader("自动化参数")
+            automation_mode = st.radio("调度方式", options=MODES, horizontal=True, key="tab8_mode",
+                                       help="连续队列：工作线程空闲即发送下一批，批次结果合并后仍未通过的编号立即回到队尾；"
+                                            "按轮次：每轮发出全部批次，等最慢的批次完成并间隔后再开始下一轮")
+            col1, col2, col3, col4 = st.columns(4)
+            with col1:
+                loop_interval = st.number_input("循环间隔（秒，按轮次）", min_value=1, max_value=60, value=5, step=1, key="tab8_loop_interval",
+                                                disabled=automation_mode != ROUNDS)
+            with col2:
+                threshold = st.number_input("停止阈值（待翻译字段数≤此值时停止）", min_value=1, max_value=500, value=50, step=10, key="tab8_threshold")
+            with col3:
+                token = st.text_input("Token", value="1234567890", key="tab8_token")
+            with col4:
+                coze_api = st.text_input("工作流 API（默认不改）", value="7582900707377446975", key="tab8_coze_api")
+            pool_size = st.number_input("Coze 连接池大小", min_value=1, max_value=MAX_POOL_SIZE, value=DEFAULT_POOL_SIZE, step=1, key="tab8_pool_size",
+                                        help="同一 Token 的客户端在进程内共享，最多保持这么多条长连接；应不小于并发数")
+            with st.expander("计费单价（用于统计费用）", expanded=False):
+                col1, col2, col3 = st.columns(3)
+                with col1:
+                    price_per_call = st.number_input("每次调用费用", min_value=0.0, value=0.0, step=0.001, format="%.4f", key="tab8_price_call")
+                with col2:
+                    price_input = st.number_input("每千输入 Token 费用", min_value=0.0, value=0.0, step=0.001, format="%.4f", key="tab8_price_input")
+                with col3:
+                    price_output = st.number_input("每千输出 Token 费用", min_value=0.0, value=0.0, step=0.001, format="%.4f", key="tab8_price_output")
+                st.caption("Workflow 在 MESSAGE 事件中报告用量时按实际 Token 计费，否则按发送与返回内容的长度估算")
+            pricing = Pricing(price_per_call, price_input, price_output)
+
+            st.subheader("翻译参数")
+            col1, col2 = st.columns(2)
+            with col1:
+                target_language = st.text_input("目标语言", value="输入语言", key="tab8_target_language",
+                                                help="上方翻译文件的目标语言；其他语言的翻译文件以文件名作为目标语言")
+                if target_language in extra_languages:
+                    st.error(f"目标语言 {target_language} 与其他语言的翻译文件 {target_language}.txt 同名，"
+                             "请修改目标语言或重命名该文件后再开始自动化")
+            with col2:
+                terminology = st.text_input("术语库链接（可选）", value="", key="tab8_terminology")
+            candidate_count = st.number_input("每个编号请求的候选数", min_value=1, max_value=10, value=1, step=1, key="tab8_candidates",
+                                              help="大于 1 时向 Workflow 传入 candidates 参数，Workflow 对同一编号返回多行 编号=译文，"
+                                                   "本地选出落在可迭代标签内、长度最接近原文的候选，减少因单个候选不合格而多跑的轮次")
+            col1, col2 = st.columns(2)
+            with col1:
+                use_memory = st.checkbox("调用 Workflow 前先用翻译记忆预填", value=False, key="tab8_use_memory",
+                                         help="用已接受译文中原文相似（数字、占位符一致）、且长度标签可迭代的译文直接迭代，"
+                                              "不再发送这些编号；预填的编号会列在运行日志中，请复核")
+            with col2:
+                memory_threshold = st.slider("翻译记忆相似度阈值", min_value=0.5, max_value=1.0,
+                                             value=DEFAULT_THRESHOLD, step=0.05, key="tab8_memory_threshold")
+            col1, col2 = st.columns(2)
+            with col1:
+                priority_mode = st.radio("发送优先级", options=PRIORITY_MODES, horizontal=True, key="tab8_priority",
+                                         help="比值偏离：比值离第一个可迭代标签区间越远越先发送；原文长度：越长越先发送；"
+                                              "文件权重：按上传的 编号=权重 文件，权重越大越先发送；文件顺序：按原文顺序")
+            priority_weights = None
+            with col2:
+                max_attempts = st.number_input("单个编号最多发送次数（0 为不限）", min_value=0, max_value=100,
+                                               value=DEFAULT_MAX_ATTEMPTS, step=1, key="tab8_max_attempts",
+                                               help="达到次数仍未通过长度检查的编号不再发送，列入待复核列表")
+                if priority_mode == PRIORITY_WEIGHT:
+                    weights_file = st.file_uploader("上传优先级权重文件 (.txt, 编号=权重)", type="txt", key="tab8_priority_weights")
+                    if weights_file:
+                        priority_weights = load_weights(weights_file)
+                        st.caption(f"已读取 {len(priority_weights)} 个编号的权重")
+
+            # ---- 多语言任务 ----
+            language_thresholds = {}
+            if extra_languages:
+                st.subheader(f"多语言任务（{1 + len(extra_languages)} 个语言）")
+                st.caption(f"所有语言共用原文解析与并发数（{MAX_WORKERS} 个），按语言轮流发送批次；多语言任务使用连续队列调度")
+                with st.expander("各语言停止阈值", expanded=False):
+                    for lang in [target_language] + [lang for lang in extra_languages if lang != target_language]:
+                        language_thresholds[lang] = st.number_input(f"{lang}：待翻译字段数≤此值时停止", min_value=0, max_value=500,
+                                                                    value=int(threshold), step=10, key=f"tab8_threshold_{lang}")
+            return (automation_mode, loop_interval, threshold, token, coze_api, pool_size, pricing, target_language, terminology,
+                    candidate_count, use_memory, memory_threshold, priority_mode, priority_weights, max_attempts, language_thresholds)
+
+        (automation_mode, loop_interval, threshold, token, coze_api, pool_size, pricing, target_language, terminology,
+         candidate_count, use_memory, memory_threshold, priority_mode, priority_weights, max_attempts, language_thresholds) = automation_params()
 
         # ---- 自动化日志容器 ----
         log_container = st.container()
@@ -288,155 +258,99 @@ def tab8_content():
         # ---- 初始化 Workflow 客户端 ----
         COZE_TOKEN = token
         WORKFLOW_ID = coze_api
-        coze_client = coze(auth=TokenAuth(token=COZE_TOKEN), base_url=COZE_CN_BASE_URL)
-
-        # ---- 自动化核心逻辑 ----
-        def auto_iterate_loop(original_dict, translation_dict, custom_statuses, iterable_labels, export_checks, loop_interval, threshold, language="es", terminology=""):
-            """
-            自动化循环：筛选 → Workflow → 迭代
-            返回最终更新的 translation_dict 和日志列表
-            """
-            logs = []
-            loop_count = 0
-
-            while st.session_state.auto_running:
-                loop_count += 1
-                logs.append(f"\n{'='*60}")
-                logs.append(f"第 {loop_count} 轮迭代开始 (时间: {datetime.now().strftime('%H:%M:%S')})")
-                logs.append(f"{'='*60}")
-
-                # 计算待翻译字段
-                df_result_runtime = calculate_length_status(original_dict, translation_dict, custom_statuses)
-                export_df_runtime = df_result_runtime[df_result_runtime["标签"].isin([name for name, checked in export_checks.items() if checked])]
-                
-                pending_count = len(export_df_runtime)
-                logs.append(f"当前待翻译字段数: {pending_count}")
-
-                # 检查停止条件：待翻译字段 ≤ 阈值
-                if pending_count <= threshold:
-                    logs.append(f"✅ 待翻译字段数 ({pending_count}) ≤ 阈值 ({threshold})，自动停止")
-                    st.session_state.auto_running = False
-                    break
-
-                # 构建批次
-                export_keys = list(export_df_runtime["编号"])
-                field_objects = [f"{k}={original_dict[k]}" for k in export_keys]
-                batch_size = 10
-                batches = [field_objects[i:i+batch_size] for i in range(0, len(field_objects), batch_size)]
-                total_batches = len(batches)
-                logs.append(f"构建 {total_batches} 批次，每批最多 10 条")
-
-                # 并行调用 Workflow
-                def run_batch(batch, batch_index):
-                    results = []
-                    try:
-                        stream = coze_client.workflows.runs.stream(
-                            workflow_id=WORKFLOW_ID,
-                            parameters={
-                                "url": batch,
-                                "language": language,
-                                "terminology": terminology
-                            }
-                        )
-                        for event in stream:
-                            if event.event == WorkflowEventType.MESSAGE:
-                                content = getattr(event.message, "content", None)
-                                if content:
-                                    try:
-                                        results.append(json.loads(content))
-                                    except Exception:
-                                        results.append(content)
-                    except Exception as e:
-                        logs.append(f"❌ 批次 {batch_index+1} 调用失败: {e}")
-                    return batch_index, results
-
-                # 创建实时进度容器
+        # ---- Workflow 调用（自动化引擎在线程池中调用） ----
+        @timed("Workflow 调用")
+        def call_workflow(batch, batch_index, language=None):
+            parameters = {
+                "url": batch,
+                "language": language or target_language,
+                "terminology": terminology
+            }
+            if candidate_count > 1:
+                parameters["candidates"] = int(candidate_count)
+            # 进程级池化的 Coze 客户端：跨轮次、跨重跑、跨会话复用 HTTP 长连接与 TLS 会话；
+            # 每个批次重新取，空闲被关闭的客户端会重新创建
+            return stream_workflow_messages(get_client(COZE_TOKEN, pool_size=pool_size), WORKFLOW_ID, parameters)
+
+        # ---- 进度展示：引擎的回调都在脚本线程中执行，可以直接更新页面元素 ----
+        progress_view = {}
+        language_view = {}
+
+        def on_event(kind, data):
+            if "language" in data:
+                on_language_event(kind, data)
+            elif kind in ("round", "queue"):
                 progress_container = st.container()
-                progress_bar = progress_container.progress(0)
-                status_text = progress_container.empty()
-                batch_results_text = progress_container.empty()
-                
-                all_results = [None] * total_batches
-                batch_summaries = []
-                
-                with ThreadPoolExecutor(max_workers=min(total_batches, 5)) as executor:
-                    futures = {executor.submit(run_batch, batch, idx): idx for idx, batch in enumerate(batches)}
-                    completed = 0
-                    
-                    for future in futures:
-                        idx, results = future.result()
-                        all_results[idx] = results
-                        completed += 1
-                        
-                        # 更新进度
-                        progress_percent = int((completed / total_batches) * 100)
-                        progress_bar.progress(progress_percent)
-                        
-                        # 统计结果
-                        result_count = len(results)
-                        batch_summaries.append(f"批次 {idx+1}: {result_count} 条")
-                        
-                        # 显示实时状态
-                        active_tasks = total_batches - completed
-                        status_text.text(f"⏳ 已完成: {completed}/{total_batches} | 活跃任务: {active_tasks}")
-                        batch_results_text.markdown(
-                            f"**批次进度详情**\n\n" + 
-                            "\n".join([f"✅ {s}" for s in batch_summaries]) +
-                            f"\n\n**总计获得: {sum(len(all_results[i]) if all_results[i] else 0 for i in range(len(all_results)))} 条**"
-                        )
-
-                workflow_results = [item for batch in all_results if batch for item in batch]
-                logs.append(f"✅ Workflow 调用完成，获得 {len(workflow_results)} 条结果")
-                logs.append(f"📋 批次汇总: {' | '.join(batch_summaries)}")
-
-                # 解析 Workflow 结果
-                parsed_results = parse_workflow_results(workflow_results)
-                logs.append(f"✅ 解析结果: {len(parsed_results)} 条有效内容")
-
-                # 执行迭代
-                if parsed_results:
-                    translation_dict, updated_records, iteration_stats, iteration_labels_count = process_iteration(
-                        original_dict, translation_dict, parsed_results, iterable_labels, custom_statuses
-                    )
-                    logs.append(f"📊 迭代统计:")
-                    logs.append(f"  - 总条目: {iteration_stats['total_in_iteration']}")
-                    logs.append(f"  - 匹配原文: {iteration_stats['matched_in_original']}")
-                    logs.append(f"  - 已更新: {iteration_stats['updated_translations']}")
-                    logs.append(f"  - 被跳过: {iteration_stats['skipped_not_iterable']}")
-                    logs.append(f"  - 标签分布: {iteration_stats['iteration_labels_distribution']}")
-                    
-                    # 添加可视化继国次计数器
-                    st.session_state.auto_loop_count = loop_count
-                    
-                    # 添加流曙计数
-                    col_stats1, col_stats2, col_stats3, col_stats4 = st.columns(4)
-                    with col_stats1:
-                        st.metric("总条目", iteration_stats['total_in_iteration'])
-                    with col_stats2:
-                        st.metric("匹配原文", iteration_stats['matched_in_original'])
-                    with col_stats3:
-                        st.metric("已更新", iteration_stats['updated_translations'], delta=f"+{iteration_stats['updated_translations']}")
-                    with col_stats4:
-                        st.metric("被跳过", iteration_stats['skipped_not_iterable'])
+                progress_view.update(
+                    bar=progress_container.progress(0),
+                    status=progress_container.empty(),
+                    details=progress_container.empty(),
+                    total=data.get("batches"),
+                    initial=None,
+                    completed=0,
+                    results=0,
+                    summaries=[],
+                )
+            elif kind == "batch" and progress_view:
+                progress = data["progress"]
+                progress_view["completed"] += 1
+                progress_view["results"] += len(data["results"])
+                completed = progress_view["completed"]
+                if progress_view["total"]:
+                    # 按轮次：本轮批次完成比例
+                    percent = completed / progress_view["total"]
+                    head = f"⏳ 已完成: {completed}/{progress_view['total']} | 活跃任务: {progress_view['total'] - completed}"
                 else:
-                    logs.append(f"⚠️ 未获得有效迭代内容")
-
-                # 更新会话
-                st.session_state.auto_translation_dict = translation_dict
-                st.session_state.auto_loop_count = loop_count
-
-                # 检查用户是否点击停止（通过超时机制）
-                logs.append(f"等待 {loop_interval} 秒后进行下一轮...")
-                for i in range(loop_interval):
-                    if not st.session_state.auto_running:
-                        logs.append("✋ 用户已停止自动化")
-                        break
-                    time.sleep(1)
-
-            logs.append(f"\n{'='*60}")
-            logs.append(f"自动化完成 (总轮数: {loop_count})")
-            logs.append(f"{'='*60}")
-            return translation_dict, logs
+                    # 连续队列：以开始时的待翻译数为基准的完成比例
+                    if progress_view["initial"] is None:
+                        progress_view["initial"] = progress["pending"] + len(data["records"])
+                    initial = max(progress_view["initial"], 1)
+                    percent = 1 - min(progress["pending"], initial) / initial
+                    head = f"⏳ 已完成批次: {completed}"
+                progress_view["bar"].progress(min(int(percent * 100), 100))
+                progress_view["status"].text(f"{head} | 已更新: {progress['updated']} | 待翻译: {progress['pending']} | "
+                                             f"Token: {data['usage_total']['tokens']} | 费用: {data['usage_total']['cost']:.4f}")
+                progress_view["summaries"].append(
+                    f"批次 {data['index']+1}: {len(data['results'])} 条，解析 {data['parsed']}，接受 {len(data['records'])}，"
+                    f"Token {data['usage']['输入 Token']} / {data['usage']['输出 Token']}{'（估算）' if data['usage']['估算'] else ''}")
+                progress_view["details"].markdown(
+                    f"**批次进度详情**\n\n" +
+                    "\n".join([f"✅ {s}" for s in progress_view["summaries"][-20:]]) +
+                    f"\n\n**总计获得: {progress_view['results']} 条** | 标签数量: " +
+                    " / ".join(f"{s['name']} {progress['tags'].get(s['name'], 0)}" for s in custom_statuses)
+                )
+            elif kind == "round_done":
+                iteration_stats = data["stats"]
+                st.session_state.auto_loop_count = data["round"]
+                col_stats1, col_stats2, col_stats3, col_stats4 = st.columns(4)
+                with col_stats1:
+                    st.metric("总条目", iteration_stats['total_in_iteration'])
+                with col_stats2:
+                    st.metric("匹配原文", iteration_stats['matched_in_original'])
+                with col_stats3:
+                    st.metric("已更新", iteration_stats['updated_translations'], delta=f"+{iteration_stats['updated_translations']}")
+                with col_stats4:
+                    st.metric("被跳过", iteration_stats['skipped_not_iterable'])
+
+        def on_language_event(kind, data):
+            # 多语言任务：每个语言一行进度
+            lang = data["language"]
+            if kind == "queue":
+                if not language_view:
+                    language_view["table"] = st.empty()
+                    language_view["rows"] = OrderedDict()
+                language_view["rows"][lang] = {"语言": lang, "已完成批次": 0, "已更新": 0, "待翻译": data["queued"],
+                                               "停止阈值": language_thresholds.get(lang, threshold), "Token": 0, "费用": 0.0}
+            elif kind == "batch" and language_view and lang in language_view["rows"]:
+                row = language_view["rows"][lang]
+                row["已完成批次"] += 1
+                row["已更新"] = data["progress"]["updated"]
+                row["待翻译"] = data["progress"]["pending"]
+                row["Token"] = data["usage_total"]["tokens"]
+                row["费用"] = round(data["usage_total"]["cost"], 4)
+            else:
+                return
+            language_view["table"].dataframe(pd.DataFrame(list(language_view["rows"].values())), use_container_width=True)
 
         # ---- UI 控制 ----
         col1, col2, col3 = st.columns([2, 2, 2])
@@ -455,21 +369,93 @@ def tab8_content():
             if st.button("📥 导出最新译文并停止", key="tab8_export_stop"):
                 st.session_state.auto_running = False
 
-        # ---- 执行自动化循环 ----
-        if st.session_state.auto_running:
-            translation_dict, logs = auto_iterate_loop(
+        # ---- 执行自动化 ----
+        if st.session_state.auto_running and target_language in extra_languages:
+            # 同名会让其他语言的译文字典覆盖主语言的，拒绝运行（提示见“翻译参数”）
+            st.session_state.auto_running = False
+            st.error(f"目标语言 {target_language} 与其他语言的翻译文件同名，未开始自动化")
+        if st.session_state.auto_running and extra_languages:
+            # 多语言：主语言与其他语言共用原文与并发预算；译文字典同样就地更新
+            translation_dicts = OrderedDict([(target_language, st.session_state.auto_translation_dict)])
+            translation_dicts.update(st.session_state.auto_extra_dicts)
+            job = MultiLanguageRun(
+                original_dict,
+                translation_dicts,
+                custom_statuses,
+                iterable_labels,
+                [name for name, checked in export_checks.items() if checked],
+                call_workflow,
+                metric=length_metric,
+                markup=markup,
+                thresholds=language_thresholds,
+                on_event=on_event,
+                should_stop=lambda: not st.session_state.auto_running,
+                use_memory=use_memory,
+                memory_threshold=memory_threshold,
+                priority=priority_mode,
+                weights=priority_weights,
+                max_attempts=max_attempts,
+                pricing=pricing,
+            )
+            try:
+                summaries = job.run()
+                st.session_state.auto_running = False
+                st.dataframe(pd.DataFrame(summaries), use_container_width=True)
+            finally:
+                st.session_state.auto_loop_count = 1
+                st.session_state.auto_logs.extend(job.logs)
+                st.session_state.auto_review = job.review_records()
+                st.session_state.auto_usage = job.usage_records()
+                st.session_state.auto_usage_batches = [dict(row, 语言=lang) for lang, r in job.runs.items() for row in r.usage.batches]
+        elif st.session_state.auto_running:
+            # 译文字典就地更新：与会话中的是同一对象，中途停止或出错时已合并的批次不会丢失
+            run = AutomationRun(
                 original_dict,
                 st.session_state.auto_translation_dict,
                 custom_statuses,
                 iterable_labels,
-                export_checks,
-                loop_interval,
-                threshold,
-                language=target_language,
-                terminology=terminology
+                [name for name, checked in export_checks.items() if checked],
+                call_workflow,
+                metric=length_metric,
+                markup=markup,
+                threshold=threshold,
+                use_memory=use_memory,
+                memory_threshold=memory_threshold,
+                on_event=on_event,
+                should_stop=lambda: not st.session_state.auto_running,
+                priority=priority_mode,
+                weights=priority_weights,
+                max_attempts=max_attempts,
+                pricing=pricing,
             )
-            st.session_state.auto_translation_dict = translation_dict
-            st.session_state.auto_logs.extend(logs)
+            try:
+                summary = run.run(automation_mode, loop_interval)
+                st.session_state.auto_running = False
+                st.dataframe(pd.DataFrame([summary]), use_container_width=True)
+            finally:
+                st.session_state.auto_loop_count = run.rounds
+                st.session_state.auto_logs.extend(run.logs)
+                st.session_state.auto_review = run.attempts.review_records()
+                st.session_state.auto_usage = run.usage.by_round()
+                st.session_state.auto_usage_batches = list(run.usage.batches)
+
+        # Coze 连接池：请求数、新建连接数与复用率（建立连接 / TLS 握手耗时见侧边栏计时面板）
+        connection_stats = pool_stats(COZE_TOKEN)
+        if connection_stats:
+            with st.expander("Coze 连接池", expanded=False):
+                st.dataframe(pd.DataFrame([connection_stats]), use_container_width=True)
+
+        # Token 与费用：按轮次（连续队列为第几次发送）汇总，逐批次明细可下载
+        if st.session_state.auto_usage:
+            with st.expander("Token 与费用", expanded=False):
+                st.dataframe(pd.DataFrame(st.session_state.auto_usage), use_container_width=True)
+                st.download_button(
+                    label="📥 下载逐批次用量 (.csv)",
+                    data=pd.DataFrame(st.session_state.auto_usage_batches).to_csv(index=False).encode("utf-8-sig"),
+                    file_name=f"用量_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
+                    mime="text/csv",
+                    key="tab8_download_usage"
+                )
 
         # 显示日志
         if st.session_state.auto_logs:
@@ -479,6 +465,13 @@ def tab8_content():
         # ---- 导出当前最新译文 ----
         st.subheader("导出结果")
         final_translation_dict = st.session_state.get("auto_translation_dict", translation_dict)
+        if previous_file:
+            # 按新版原文顺序输出每个编号：沿用的译文 + 自动化更新的译文，修改但未更新的编号保留旧译文
+            final_translation_dict, stale_keys = complete_translation(
+                full_original_dict, final_translation_dict, uploaded_translation, diff)
+            if stale_keys:
+                st.warning(f"{len(stale_keys)} 个原文已修改的编号还没有新译文，导出文件中保留了旧译文，请复核："
+                           + "、".join(stale_keys[:20]) + ("…" if len(stale_keys) > 20 else ""))
         final_translation_txt = "\n".join([f"{key}={value}" for key, value in final_translation_dict.items()])
         
         st.download_button(
@@ -488,15 +481,55 @@ def tab8_content():
             mime="text/plain",
             key="tab8_download"
         )
+        if extra_languages:
+            # 全部语言打包下载：每个语言一个 txt（文件名为语言名）
+            zip_buffer = io.BytesIO()
+            with zipfile.ZipFile(zip_buffer, "w", zipfile.ZIP_DEFLATED) as zf:
+                all_dicts = OrderedDict([(target_language, final_translation_dict)])
+                all_dicts.update((lang, d) for lang, d in st.session_state.auto_extra_dicts.items() if lang != target_language)
+                for lang, lang_dict in all_dicts.items():
+                    if previous_file and lang in uploaded_extras:
+                        lang_dict, _ = complete_translation(full_original_dict, lang_dict, uploaded_extras[lang], diff)
+                    zf.writestr(f"{lang}.txt", "\n".join(f"{key}={value}" for key, value in lang_dict.items()))
+            st.download_button(
+                label=f"📥 下载全部 {len(all_dicts)} 个语言的译文 (.zip)",
+                data=zip_buffer.getvalue(),
+                file_name=f"自动化翻译_多语言_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip",
+                mime="application/zip",
+                key="tab8_download_all_languages"
+            )
+
+        # 待复核：发送达到上限仍未通过的编号及其最接近合格区间的候选
+        if st.session_state.auto_review:
+            st.subheader(f"待复核编号（{len(st.session_state.auto_review)} 条，已达到发送上限）")
+            df_review = pd.DataFrame(st.session_state.auto_review)
+            st.dataframe(df_review, use_container_width=True)
+            st.download_button(
+                label="📥 下载待复核编号及最佳候选 (.txt)",
+                data="\n".join(f"{k}={v}" for k, v in zip(df_review["编号"], df_review["最佳候选"]) if v),
+                file_name=f"待复核_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt",
+                mime="text/plain",
+                key="tab8_download_review"
+            )
 
         # 显示统计信息
         st.subheader("当前翻译统计")
-        df_final = calculate_length_status(original_dict, final_translation_dict, custom_statuses)
+        df_final = calculate_length_status(original_dict, final_translation_dict, custom_statuses, length_metric, markup)
+        tag_counts = summarize(df_final["标签"])["tags"]
         stats_data = []
         for s in custom_statuses:
-            count = (df_final["标签"] == s["name"]).sum()
+            count = tag_counts.get(s["name"], 0)
             ratio = (count / len(df_final) * 100) if len(df_final) > 0 else 0
             stats_data.append({"标签": s["name"], "数量": count, "占比": f"{ratio:.2f}%"})
+        if terminology.strip():
+            # 术语库链接同时用于术语合规检查（下载后缓存在本地）
+            try:
+                df_terms = annotate_terminology(df_final, get_matcher(fetch_glossary(terminology.strip())))
+                count = count_violations(df_terms)
+                ratio = (count / len(df_final) * 100) if len(df_final) > 0 else 0
+                stats_data.append({"标签": TERM_TAG, "数量": count, "占比": f"{ratio:.2f}%"})
+            except ValueError as e:
+                st.warning(str(e))
         stats_df = pd.DataFrame(stats_data)
         st.dataframe(stats_df, use_container_width=True)
 
@@ -3,6 +3,8 @@ import pandas as pd
 import io
 from datetime import datetime
 
+from timing import span
+
 def tab9_content():
     # 设置页面配置
     st.set_page_config(
@@ -52,7 +54,8 @@ def tab9_content():
     if uploaded_file is not None:
         try:
             # 读取Excel文件
-            df = pd.read_excel(uploaded_file, engine='openpyxl')
+            with span("Excel 读写"):
+                df = pd.read_excel(uploaded_file, engine='openpyxl')
             
             # 显示文件信息
             col1, col2 = st.columns(2)
@@ -227,7 +230,7 @@ def tab9_content():
             
             # 转换为Excel字节流
             output = io.BytesIO()
-            with pd.ExcelWriter(output, engine='openpyxl') as writer:
+            with span("Excel 读写"), pd.ExcelWriter(output, engine='openpyxl') as writer:
                 sample_df.to_excel(writer, index=False, sheet_name='Sheet1')
             
             # 提供下载
@@ -0,0 +1,325 @@
+"""
+术语合规检查：原文出现术语表中的源术语、译文却没有使用对应的目标术语时标记出来
+
+术语表编译为一个 Aho-Corasick 多模式自动机：
+- 只有术语中出现过的字符才有独立的字符类，其余字符统一为类 0（必然回到根状态）；
+- 完整的状态转移表只保存“与根状态不同的转移”，以整数哈希索引（pandas Index）批量查找；
+- 扫描时所有原文按位置同步推进（第 p 步处理每条原文的第 p 个字符），
+  一次遍历整列即可找出每行出现的全部源术语，与术语数量无关。
+只有命中源术语的行才检查译文是否包含目标术语（忽略大小写）。
+
+术语表支持 .txt（源术语=目标术语，每行一条）、.csv / .tsv（前两列）、.xlsx（前两列），
+表格首行两列都是常见列名（source / target、原文 / 译文 等）时作为表头跳过；
+术语库链接下载后缓存在本地，同一链接不重复下载。
+"""
+import csv
+import hashlib
+import io
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import requests
+
+from core import read_bytes
+from metrics import as_str_list
+from timing import timed
+
+TERM_TAG = "术语缺失"
+TERM_COLUMN = "术语"
+MISSING_COLUMN = "缺失术语"
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".translation_tool", "terminology")
+# 缓存的术语库超过该秒数后重新下载
+CACHE_MAX_AGE = 24 * 3600
+DOWNLOAD_TIMEOUT = 30
+MATCHER_CACHE_SIZE = 8
+# 表格术语表的表头列名（忽略大小写），首行前两列都在其中时视为表头
+HEADER_NAMES = {
+    "source", "target", "src", "tgt", "term", "translation", "source term", "target term",
+    "原文", "译文", "源术语", "目标术语", "术语", "译名", "中文", "英文",
+}
+
+
+# ---------------------------
+# 术语表读取
+# ---------------------------
+def _decode(data):
+    for encoding in ("utf-8-sig", "gb18030"):
+        try:
+            return data.decode(encoding)
+        except UnicodeDecodeError:
+            continue
+    return data.decode("utf-8", errors="replace")
+
+
+def _is_header(row):
+    return len(row) >= 2 and all(str(cell).strip().lower() in HEADER_NAMES for cell in row[:2])
+
+
+def _pairs_to_glossary(pairs, has_header=False):
+    """has_header 为 True 时第一行若是表头则跳过"""
+    glossary = {}
+    for i, row in enumerate(pairs):
+        if has_header and i == 0 and _is_header(row):
+            continue
+        if len(row) < 2:
+            continue
+        source, target = str(row[0]).strip(), str(row[1]).strip()
+        if source and source.lower() != "nan":
+            glossary[source] = "" if target.lower() == "nan" else target
+    return glossary
+
+
+def parse_glossary(data, name=""):
+    """解析术语表内容（bytes），name 用于按扩展名判断格式；返回 {源术语: 目标术语}"""
+    ext = os.path.splitext(name.lower())[1]
+    if ext in (".xlsx", ".xls"):
+        df = pd.read_excel(io.BytesIO(data), header=None, dtype=str)
+        return _pairs_to_glossary(df.iloc[:, :2].itertuples(index=False), has_header=True)
+
+    text = _decode(data)
+    if ext in (".csv", ".tsv"):
+        delimiter = "\t" if ext == ".tsv" else ","
+        return _pairs_to_glossary(csv.reader(io.StringIO(text), delimiter=delimiter), has_header=True)
+
+    pairs = []
+    for line in text.splitlines():
+        for sep in ("=", "\t"):
+            if sep in line:
+                pairs.append(line.split(sep, 1))
+                break
+    return _pairs_to_glossary(pairs)
+
+
+def load_glossary(source):
+    """从路径或上传的文件读取术语表"""
+    name = source if isinstance(source, str) else getattr(source, "name", "")
+    return parse_glossary(read_bytes(source), name)
+
+
+def _cache_path(url, cache_dir):
+    digest = hashlib.sha1(url.encode("utf-8")).hexdigest()[:16]
+    ext = os.path.splitext(url.split("?", 1)[0])[1].lower()
+    return os.path.join(cache_dir, digest + (ext if ext in (".txt", ".csv", ".tsv", ".xlsx", ".xls") else ".txt"))
+
+
+def fetch_glossary(url, cache_dir=CACHE_DIR, max_age=CACHE_MAX_AGE, refresh=False):
+    """
+    下载术语库链接并缓存到本地；缓存未过期时直接读取缓存
+    下载失败但有旧缓存时使用旧缓存，否则抛出 ValueError
+    """
+    path = _cache_path(url, cache_dir)
+    fresh = os.path.exists(path) and time.time() - os.path.getmtime(path) < max_age
+    if refresh or not fresh:
+        try:
+            response = requests.get(url, timeout=DOWNLOAD_TIMEOUT)
+            response.raise_for_status()
+        except requests.RequestException as e:
+            if not os.path.exists(path):
+                raise ValueError(f"无法下载术语库: {e}")
+        else:
+            os.makedirs(cache_dir, exist_ok=True)
+            tmp = path + ".part"
+            with open(tmp, "wb") as f:
+                f.write(response.content)
+            os.replace(tmp, path)
+    return load_glossary(path)
+
+
+def resolve_glossary(file=None, url=""):
+    """上传的术语表优先，其次为术语库链接；都没有时返回 None"""
+    if file is not None:
+        return load_glossary(file)
+    if url and url.strip():
+        return fetch_glossary(url.strip())
+    return None
+
+
+# ---------------------------
+# Aho-Corasick 自动机
+# ---------------------------
+def _codepoints(texts):
+    lengths = np.fromiter((len(t) for t in texts), dtype=np.int64, count=len(texts))
+    cps = np.frombuffer("".join(texts).encode("utf-32-le"), dtype=np.uint32)
+    return cps, np.cumsum(lengths) - lengths, lengths
+
+
+class TermMatcher:
+    """由术语表编译的多模式匹配自动机；ignore_case 时原文、译文、术语均按小写比较"""
+
+    def __init__(self, glossary, ignore_case=True):
+        self.ignore_case = ignore_case
+        self.sources = [s for s in glossary if s.strip()]
+        self.targets = [glossary[s] for s in self.sources]
+        self._targets_folded = [t.lower() if ignore_case else t for t in self.targets]
+        patterns = [s.lower() if ignore_case else s for s in self.sources]
+
+        # 字符类：术语中出现过的字符编号 1..C，其余为 0
+        chars = sorted({ch for p in patterns for ch in p})
+        self._class_of = {ch: i + 1 for i, ch in enumerate(chars)}
+        self._num_classes = len(chars) + 1
+        max_cp = ord(chars[-1]) if chars else 0
+        self._class_table = np.zeros(max_cp + 1, dtype=np.int64)
+        for ch, c in self._class_of.items():
+            self._class_table[ord(ch)] = c
+
+        # 字典树
+        goto = [{}]
+        outputs = [[]]
+        for term_id, pattern in enumerate(patterns):
+            state = 0
+            for ch in pattern:
+                c = self._class_of[ch]
+                nxt = goto[state].get(c)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[state][c] = nxt
+                    goto.append({})
+                    outputs.append([])
+                state = nxt
+            outputs[state].append(term_id)
+
+        # 按广度优先计算失败链接，同时得到完整转移表中与根状态不同的部分
+        fail = [0] * len(goto)
+        delta = [None] * len(goto)
+        root_delta = np.zeros(self._num_classes, dtype=np.int64)
+        for c, nxt in goto[0].items():
+            root_delta[c] = nxt
+        queue = list(goto[0].values())
+        for s in queue:
+            delta[s] = dict(goto[s])
+        head = 0
+        while head < len(queue):
+            s = queue[head]
+            head += 1
+            for c, nxt in goto[s].items():
+                f = fail[s]
+                while f and c not in goto[f]:
+                    f = fail[f]
+                fail[nxt] = goto[f].get(c, 0)
+                outputs[nxt] = outputs[nxt] + outputs[fail[nxt]]
+                inherited = dict(delta[fail[nxt]]) if fail[nxt] else {}
+                inherited.update(goto[nxt])
+                delta[nxt] = inherited
+                queue.append(nxt)
+
+        keys, values = [], []
+        for s in range(1, len(goto)):
+            for c, nxt in delta[s].items():
+                keys.append(s * self._num_classes + c)
+                values.append(nxt)
+        # 转移键 → 目标状态的整数哈希索引
+        self._keys = pd.Index(np.asarray(keys, dtype=np.int64), copy=False)
+        self._values = np.asarray(values, dtype=np.int64)
+        self._root_delta = root_delta
+
+        counts = np.fromiter((len(o) for o in outputs), dtype=np.int64, count=len(outputs))
+        self._has_output = counts > 0
+        self._output_counts = counts
+        self._output_starts = np.cumsum(counts) - counts
+        self._output_terms = np.fromiter((t for o in outputs for t in o), dtype=np.int64, count=int(counts.sum()))
+        self.num_states = len(goto)
+
+    def __len__(self):
+        return len(self.sources)
+
+    def _fold(self, texts):
+        texts = as_str_list(texts)
+        return [t.lower() for t in texts] if self.ignore_case else texts
+
+    def find(self, texts):
+        """
+        一次遍历找出每条文本中出现的源术语
+        返回 (rows, term_ids)：两个等长 int64 数组，每对 (行号, 术语编号) 只出现一次
+        """
+        texts = self._fold(texts)
+        empty = np.empty(0, dtype=np.int64)
+        if not texts or not self.sources:
+            return empty, empty
+        cps, starts, lengths = _codepoints(texts)
+        in_table = cps < len(self._class_table)
+        classes = np.where(in_table, self._class_table[np.where(in_table, cps, 0)], 0)
+
+        # 按长度降序排列，第 p 步时仍有字符的行正好是前 n 行
+        order = np.argsort(-lengths, kind="stable")
+        sorted_starts = starts[order]
+        neg_lengths = -lengths[order]
+        state = np.zeros(len(texts), dtype=np.int64)
+        hit_rows, hit_states = [], []
+        num_classes = self._num_classes
+        for p in range(int(lengths.max(initial=0))):
+            n = int(np.searchsorted(neg_lengths, -p, side="left"))
+            c = classes[sorted_starts[:n] + p]
+            current = state[:n]
+            nxt = self._root_delta[c]
+            inner = np.flatnonzero(current)
+            if len(inner):
+                pos = self._keys.get_indexer(current[inner] * num_classes + c[inner])
+                found = pos >= 0
+                nxt[inner[found]] = self._values[pos[found]]
+            state[:n] = nxt
+            matched = np.flatnonzero(self._has_output[nxt])
+            if len(matched):
+                hit_rows.append(order[matched])
+                hit_states.append(nxt[matched])
+        if not hit_rows:
+            return empty, empty
+
+        rows = np.concatenate(hit_rows)
+        states = np.concatenate(hit_states)
+        counts = self._output_counts[states]
+        rows = np.repeat(rows, counts)
+        offsets = np.arange(len(rows)) - np.repeat(np.cumsum(counts) - counts, counts)
+        terms = self._output_terms[np.repeat(self._output_starts[states], counts) + offsets]
+        pairs = np.unique(rows * len(self.sources) + terms)
+        return pairs // len(self.sources), pairs % len(self.sources)
+
+    def check(self, sources, translations):
+        """
+        原文命中源术语而译文缺少目标术语的行
+        返回每行的缺失术语列表（["源术语→目标术语", ...]，无缺失为空列表）；译文为空的行不检查
+        """
+        translations = self._fold(translations)
+        missing = [[] for _ in translations]
+        rows, terms = self.find(sources)
+        targets = self._targets_folded
+        for row, term in zip(rows.tolist(), terms.tolist()):
+            target = targets[term]
+            text = translations[row]
+            if target and text and target not in text:
+                missing[row].append(f"{self.sources[term]}→{self.targets[term]}")
+        return missing
+
+
+_matchers = {}
+
+
+def get_matcher(glossary, ignore_case=True):
+    """编译术语表；内容相同的术语表复用已编译的自动机（页面每次重跑不必重新编译）"""
+    digest = hashlib.sha1(json.dumps([glossary, ignore_case], ensure_ascii=False, sort_keys=True).encode("utf-8")).hexdigest()
+    matcher = _matchers.get(digest)
+    if matcher is None:
+        if len(_matchers) >= MATCHER_CACHE_SIZE:
+            _matchers.clear()
+        matcher = _matchers[digest] = TermMatcher(glossary, ignore_case)
+    return matcher
+
+
+@timed("术语检查")
+def annotate_terminology(df_result, matcher):
+    """在长度检查结果的 标签 列后加入 术语（术语缺失 / 空）与 缺失术语 两列"""
+    missing = matcher.check(df_result["原文"], df_result["译文"])
+    df = df_result.copy(deep=False)
+    position = df.columns.get_loc("标签") + 1
+    df.insert(position, TERM_COLUMN, [TERM_TAG if m else "" for m in missing])
+    df.insert(position + 1, MISSING_COLUMN, ["、".join(m) for m in missing])
+    return df
+
+
+def count_violations(df_result):
+    """已加入术语列的结果中术语缺失的行数"""
+    if TERM_COLUMN not in df_result.columns:
+        return 0
+    return int((df_result[TERM_COLUMN] == TERM_TAG).sum())
@@ -0,0 +1,190 @@
+"""
+分阶段计时：在解析、对齐、分类、表格渲染、Excel 读写、Workflow 调用、迭代合并等热点处打上命名区间，
+侧边栏展示最近一次页面重跑的耗时分布，以及每个阶段滚动窗口内的 p50 / p95，可导出为 JSON。
+
+    with span("表格渲染"):
+        AgGrid(...)
+
+    @timed("解析")
+    def parse_txt(file): ...
+
+激活的 Recorder 保存在 ContextVar 中：每个会话的脚本运行在各自的线程里，互不影响，多个会话同时开启计时不会串扰。
+未启用时（没有激活的 Recorder）span 返回共享的空上下文，timed 只多一次 ContextVar 读取，开销可忽略。
+页面片段（st.fragment）单独重跑时 app.py 不执行，由 fragment_scope 临时激活 Recorder，把这次片段重跑记为一次重跑。
+线程池中的工作线程不会继承 ContextVar，提交任务时用 bind 包装，把提交时激活的 Recorder 显式带进工作线程：
+
+    executor.submit(bind(run_batch), batch, idx)
+
+记录时加锁；区间可以嵌套，父区间的耗时包含子区间。
+"""
+import json
+import threading
+import time
+from collections import OrderedDict, deque
+from contextvars import ContextVar
+from contextlib import contextmanager, nullcontext
+from functools import wraps
+
+import numpy as np
+
+HISTORY_SIZE = 200
+
+_NULL_SPAN = nullcontext()
+_active = ContextVar("timing_recorder", default=None)
+
+
+class Recorder:
+    """一个会话的计时记录：当前重跑的区间列表 + 每个阶段最近 HISTORY_SIZE 次耗时"""
+
+    def __init__(self, history_size=HISTORY_SIZE):
+        self.history_size = history_size
+        self.current = []
+        self.last_run = []
+        self.history = {}
+        self.runs = 0
+        self._lock = threading.Lock()
+
+    def begin_run(self):
+        with self._lock:
+            self.current = []
+
+    def end_run(self):
+        with self._lock:
+            self.last_run = self.current
+            self.current = []
+            self.runs += 1
+
+    def record(self, name, seconds):
+        with self._lock:
+            self.current.append((name, seconds))
+            samples = self.history.get(name)
+            if samples is None:
+                samples = self.history[name] = deque(maxlen=self.history_size)
+            samples.append(seconds)
+
+    def clear(self):
+        with self._lock:
+            self.current = []
+            self.last_run = []
+            self.history = {}
+            self.runs = 0
+
+    def last_breakdown(self):
+        """最近一次重跑：每个阶段一行 {"阶段", "次数", "耗时(ms)"}，按耗时降序"""
+        totals = OrderedDict()
+        for name, seconds in self.last_run:
+            count, total = totals.get(name, (0, 0.0))
+            totals[name] = (count + 1, total + seconds)
+        rows = [{"阶段": name, "次数": count, "耗时(ms)": round(total * 1000, 2)}
+                for name, (count, total) in totals.items()]
+        return sorted(rows, key=lambda r: -r["耗时(ms)"])
+
+    def percentiles(self):
+        """每个阶段滚动窗口内的 {"阶段", "样本数", "p50(ms)", "p95(ms)"}，按 p95 降序"""
+        with self._lock:
+            history = {name: np.fromiter(samples, dtype=np.float64) for name, samples in self.history.items()}
+        rows = []
+        for name, samples in history.items():
+            p50, p95 = np.percentile(samples, [50, 95]) * 1000
+            rows.append({"阶段": name, "样本数": len(samples), "p50(ms)": round(float(p50), 2), "p95(ms)": round(float(p95), 2)})
+        return sorted(rows, key=lambda r: -r["p95(ms)"])
+
+    def to_json(self):
+        with self._lock:
+            history = {name: [round(s * 1000, 3) for s in samples] for name, samples in self.history.items()}
+        return json.dumps({
+            "exported": int(time.time()),
+            "runs": self.runs,
+            "last_run": self.last_breakdown(),
+            "percentiles": self.percentiles(),
+            "history_ms": history,
+        }, ensure_ascii=False, indent=2)
+
+
+class _Span:
+    __slots__ = ("recorder", "name", "start")
+
+    def __init__(self, recorder, name):
+        self.recorder = recorder
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.recorder.record(self.name, time.perf_counter() - self.start)
+        return False
+
+
+def activate(recorder):
+    """为当前上下文（本次脚本运行）设置接收计时的 Recorder，传入 None 关闭计时；返回交给 deactivate 的令牌"""
+    return _active.set(recorder)
+
+
+def deactivate(token):
+    """恢复 activate 之前的 Recorder"""
+    _active.reset(token)
+
+
+def active():
+    return _active.get()
+
+
+def bind(func):
+    """包装提交到线程池的函数：在工作线程中激活提交时（当前上下文）的 Recorder"""
+    recorder = _active.get()
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        token = _active.set(recorder)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _active.reset(token)
+    return wrapper
+
+
+def span(name):
+    """命名计时区间（上下文管理器）"""
+    recorder = _active.get()
+    if recorder is None:
+        return _NULL_SPAN
+    return _Span(recorder, name)
+
+
+@contextmanager
+def fragment_scope(name, recorder):
+    """
+    片段执行的计时区间：页面整体重跑中（已有激活的 Recorder）只是一个普通区间；
+    片段单独重跑时临时激活 recorder（为 None 则不计时），这次片段重跑作为一次重跑记录
+    """
+    if _active.get() is not None or recorder is None:
+        with span(name):
+            yield
+        return
+    token = activate(recorder)
+    recorder.begin_run()
+    try:
+        with span(name):
+            yield
+    finally:
+        deactivate(token)
+        recorder.end_run()
+
+
+def timed(name):
+    """把整个函数调用记为一个命名区间的装饰器"""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            recorder = _active.get()
+            if recorder is None:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                recorder.record(name, time.perf_counter() - start)
+        return wrapper
+    return decorator
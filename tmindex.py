@@ -0,0 +1,294 @@
+"""
+翻译记忆索引：在已接受的 原文/译文 对上做相似原文检索（字符 2-gram + MinHash-LSH）
+
+- 每条原文切成字符 2-gram（单字原文用单字），整批拼成码点数组后向量化计算 MinHash 签名；
+- 签名按 band 分段哈希，每个 band 保存排序后的 (band 键, 条目号) 数组，查询用 np.searchsorted；
+- 新接受的译文先写入小的增量段，增量段超过主段一定比例时再整体合并，避免每次都重排全部条目；
+- LSH 只负责找出候选，候选再按精确的 2-gram Jaccard 相似度过滤、排序取前 k 个
+  （32 个排列的签名估计误差约 ±0.08，直接用估计值会漏掉刚过阈值的候选）。
+
+在调用 Workflow 前，用它为待翻译编号找“几乎相同的原文”已接受的译文，
+通过长度标签检查的候选可直接作为迭代内容，减少发送给 Workflow 的条目。
+相似原文中的数字、占位符与本条原文不一致的候选（“获得 100 金币” 套到 “获得 500 金币” 上）一律不用。
+"""
+import re
+from collections import Counter
+
+import numpy as np
+
+from core import calculate_single_status
+from markup import DEFAULT_MARKUP_PATTERNS
+from metrics import DEFAULT_METRIC, as_str_list
+from timing import timed
+
+NUM_PERM = 32
+BANDS = 8
+DEFAULT_THRESHOLD = 0.7
+DEFAULT_TOP_K = 5
+# 单个 band 桶内最多取出的候选数，避免大量相同的短原文拖慢查询
+MAX_BUCKET_CANDIDATES = 256
+# 一次计算签名的字符串数，控制中间数组的内存
+SIGNATURE_CHUNK = 100_000
+
+# 候选原文与本条原文必须一致的部分：格式 / printf 占位符与数字
+_PROTECTED = re.compile("|".join(f"(?:{p})" for p in (
+    DEFAULT_MARKUP_PATTERNS["格式占位符 {0} {name}"],
+    DEFAULT_MARKUP_PATTERNS["printf 占位符 %s %d %1$s"],
+    r"\d+",
+)))
+
+_CP_RANGE = np.uint64(0x110000)
+_BAND_MIX = np.uint64(0x9E3779B97F4A7C15)
+
+
+def _gram_set(text):
+    """字符 2-gram 集合（长度为 1 的文本用单字），与 _shingles 的切分一致"""
+    if len(text) == 1:
+        return {text}
+    return {text[j:j + 2] for j in range(len(text) - 1)}
+
+
+def _shingles(texts):
+    """字符 2-gram（长度为 1 的文本用单字）编码为 uint64，返回 (shingle 数组, 每个文本的起始下标, 每个文本的 shingle 数)"""
+    lengths = np.fromiter((len(t) for t in texts), dtype=np.int64, count=len(texts))
+    cps = np.frombuffer("".join(texts).encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+    ends = np.cumsum(lengths)
+    starts = ends - lengths
+    if len(cps) == 0:
+        return np.empty(0, dtype=np.uint64), np.zeros(len(texts), dtype=np.int64), np.zeros(len(texts), dtype=np.int64)
+
+    values = np.empty(len(cps), dtype=np.uint64)
+    values[:-1] = cps[:-1] * _CP_RANGE + cps[1:]
+    valid = np.ones(len(cps), dtype=bool)
+    non_empty = lengths > 0
+    # 每个文本最后一个字符与下一个文本拼出的 2-gram 无效
+    valid[ends[non_empty] - 1] = False
+    single = lengths == 1
+    values[starts[single]] = cps[starts[single]] * _CP_RANGE + (_CP_RANGE - np.uint64(1))
+    valid[starts[single]] = True
+
+    counts = np.where(lengths > 1, lengths - 1, lengths)
+    offsets = np.cumsum(counts) - counts
+    return values[valid], offsets, counts
+
+
+class TranslationMemory:
+    """已接受 原文/译文 对的相似原文检索索引，支持增量添加"""
+
+    def __init__(self, num_perm=NUM_PERM, bands=BANDS, seed=20240601):
+        if num_perm % bands:
+            raise ValueError("num_perm 必须是 bands 的整数倍")
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self._xor = rng.integers(0, 2**63, size=num_perm, dtype=np.uint64)
+        self._mul = rng.integers(0, 2**63, size=num_perm, dtype=np.uint64) | np.uint64(1)
+
+        self.keys = []
+        self.sources = []
+        self.targets = []
+        self._key_to_id = {}
+        self._alive = np.zeros(0, dtype=bool)
+        self._signatures = np.zeros((0, num_perm), dtype=np.uint32)
+        # 每个 band：主段与增量段各为 (排序后的 band 键, 对应条目号)
+        self._main = [(np.empty(0, dtype=np.uint64), np.empty(0, dtype=np.int64)) for _ in range(bands)]
+        self._delta = [(np.empty(0, dtype=np.uint64), np.empty(0, dtype=np.int64)) for _ in range(bands)]
+        self._main_size = 0
+
+    def __len__(self):
+        return int(self._alive.sum())
+
+    # ---------------------------
+    # 签名与 band 键
+    # ---------------------------
+    def signatures(self, texts):
+        """批量计算 MinHash 签名，返回 (n, num_perm) 的 uint32 数组；空文本签名全为最大值"""
+        texts = as_str_list(texts)
+        result = np.full((len(texts), self.num_perm), 0xFFFFFFFF, dtype=np.uint32)
+        for lo in range(0, len(texts), SIGNATURE_CHUNK):
+            chunk = texts[lo:lo + SIGNATURE_CHUNK]
+            values, offsets, counts = _shingles(chunk)
+            has = counts > 0
+            if not has.any():
+                continue
+            seg = offsets[has]
+            rows = np.flatnonzero(has) + lo
+            for j in range(self.num_perm):
+                hashed = ((values ^ self._xor[j]) * self._mul[j]) >> np.uint64(32)
+                result[rows, j] = np.minimum.reduceat(hashed, seg).astype(np.uint32)
+        return result
+
+    def _band_keys(self, signatures):
+        keys = np.empty((len(signatures), self.bands), dtype=np.uint64)
+        for b in range(self.bands):
+            block = signatures[:, b * self.rows:(b + 1) * self.rows].astype(np.uint64)
+            k = block[:, 0].copy()
+            for r in range(1, self.rows):
+                k = (k * _BAND_MIX) ^ block[:, r]
+            keys[:, b] = k
+        return keys
+
+    @staticmethod
+    def _merge_sorted(segment, band_keys, ids):
+        keys = np.concatenate([segment[0], band_keys])
+        all_ids = np.concatenate([segment[1], ids])
+        order = np.argsort(keys, kind="stable")
+        return keys[order], all_ids[order]
+
+    # ---------------------------
+    # 增量添加
+    # ---------------------------
+    def add(self, keys, sources, targets):
+        """
+        添加/更新已接受的条目；同一编号再次添加时，原文未变只更新译文，原文变化则替换旧条目
+        空原文或空译文不入索引
+        """
+        new_ids, new_sources = [], []
+        for key, source, target in zip(keys, as_str_list(sources), as_str_list(targets)):
+            if not source.strip() or not target.strip():
+                continue
+            old_id = self._key_to_id.get(key)
+            if old_id is not None:
+                if self.sources[old_id] == source:
+                    self.targets[old_id] = target
+                    continue
+                self._alive[old_id] = False
+            entry_id = len(self.keys)
+            self.keys.append(key)
+            self.sources.append(source)
+            self.targets.append(target)
+            self._key_to_id[key] = entry_id
+            new_ids.append(entry_id)
+            new_sources.append(source)
+        if not new_ids:
+            return 0
+
+        signatures = self.signatures(new_sources)
+        self._signatures = np.concatenate([self._signatures, signatures])
+        self._alive = np.concatenate([self._alive, np.ones(len(new_ids), dtype=bool)])
+        ids = np.asarray(new_ids, dtype=np.int64)
+        band_keys = self._band_keys(signatures)
+
+        delta_size = len(self._delta[0][0]) + len(ids)
+        merge_all = delta_size > max(4096, self._main_size // 8)
+        for b in range(self.bands):
+            if merge_all:
+                merged = self._merge_sorted(self._delta[b], band_keys[:, b], ids)
+                self._main[b] = self._merge_sorted(self._main[b], *merged)
+                self._delta[b] = (np.empty(0, dtype=np.uint64), np.empty(0, dtype=np.int64))
+            else:
+                self._delta[b] = self._merge_sorted(self._delta[b], band_keys[:, b], ids)
+        if merge_all:
+            self._main_size = len(self._main[0][0])
+        return len(new_ids)
+
+    def add_records(self, updated_records):
+        """把 process_iteration 返回的更新记录（编号/原文/新译文）加入索引"""
+        return self.add([r["编号"] for r in updated_records],
+                        [r["原文"] for r in updated_records],
+                        [r["新译文"] for r in updated_records])
+
+    # ---------------------------
+    # 查询
+    # ---------------------------
+    def query_many(self, texts, k=DEFAULT_TOP_K, threshold=DEFAULT_THRESHOLD, exclude_keys=None):
+        """
+        每个文本返回至多 k 个相似度 ≥ threshold 的条目：[{"编号", "原文", "译文", "相似度"}, ...]，按相似度降序
+        exclude_keys: 与 texts 等长的编号列表，查询时跳过同编号的条目（自身）
+        """
+        texts = as_str_list(texts)
+        if not texts or not len(self._alive):
+            return [[] for _ in texts]
+        signatures = self.signatures(texts)
+        band_keys = self._band_keys(signatures)
+
+        # 每个 band 一次向量化查找出所有查询的桶范围
+        ranges = []
+        for b in range(self.bands):
+            for segment_keys, segment_ids in (self._main[b], self._delta[b]):
+                if len(segment_keys) == 0:
+                    continue
+                lo = np.searchsorted(segment_keys, band_keys[:, b], side="left")
+                hi = np.searchsorted(segment_keys, band_keys[:, b], side="right")
+                ranges.append((segment_ids, lo, np.minimum(hi, lo + MAX_BUCKET_CANDIDATES)))
+
+        results = []
+        for i, text in enumerate(texts):
+            if not text.strip():
+                results.append([])
+                continue
+            parts = [ids[lo[i]:hi[i]] for ids, lo, hi in ranges if hi[i] > lo[i]]
+            if not parts:
+                results.append([])
+                continue
+            candidates = np.unique(np.concatenate(parts))
+            candidates = candidates[self._alive[candidates]]
+            if exclude_keys is not None:
+                own = self._key_to_id.get(exclude_keys[i])
+                if own is not None:
+                    candidates = candidates[candidates != own]
+            if len(candidates) == 0:
+                results.append([])
+                continue
+            grams = _gram_set(text)
+            scores = np.fromiter((len(grams & other) / len(grams | other)
+                                  for other in (_gram_set(self.sources[c]) for c in candidates)),
+                                 dtype=np.float64, count=len(candidates))
+            keep = scores >= threshold
+            candidates, scores = candidates[keep], scores[keep]
+            top = np.argsort(-scores, kind="stable")[:k]
+            results.append([{
+                "编号": self.keys[c],
+                "原文": self.sources[c],
+                "译文": self.targets[c],
+                "相似度": round(float(s), 4),
+            } for c, s in zip(candidates[top], scores[top])])
+        return results
+
+    def query(self, text, k=DEFAULT_TOP_K, threshold=DEFAULT_THRESHOLD, exclude_key=None):
+        return self.query_many([text], k, threshold, None if exclude_key is None else [exclude_key])[0]
+
+
+@timed("翻译记忆")
+def build_memory(df_result, accepted_labels):
+    """用长度检查结果中标签属于 accepted_labels 的 原文/译文 对建立翻译记忆"""
+    tm = TranslationMemory()
+    accepted = df_result[df_result["标签"].isin(list(accepted_labels))]
+    tm.add(as_str_list(accepted["编号"]), accepted["原文"], accepted["译文"])
+    return tm
+
+
+@timed("翻译记忆")
+def suggest_translations(tm, original_dict, pending_keys, statuses, accepted_labels,
+                         metric=DEFAULT_METRIC, markup=None, threshold=DEFAULT_THRESHOLD, k=DEFAULT_TOP_K):
+    """
+    为待翻译编号找翻译记忆候选：相似度 ≥ threshold，记忆原文中的数字与占位符和本条原文一致，
+    且候选译文套到本条原文上的长度标签属于 accepted_labels
+    返回 (suggestions: {编号: 译文}, records: 展示用记录列表)，每个编号取通过检查的最相似候选
+    """
+    pending_keys = list(pending_keys)
+    sources = [original_dict[key] for key in pending_keys]
+    accepted_labels = [label.strip() for label in accepted_labels]
+    suggestions, records = {}, []
+    for key, source, hits in zip(pending_keys, sources, tm.query_many(sources, k, threshold, pending_keys)):
+        protected = None
+        for hit in hits:
+            if hit["原文"] != source:
+                if protected is None:
+                    protected = Counter(_PROTECTED.findall(source))
+                if Counter(_PROTECTED.findall(hit["原文"])) != protected:
+                    continue
+            label = calculate_single_status(source, hit["译文"], statuses, metric, markup)
+            if label in accepted_labels:
+                suggestions[key] = hit["译文"]
+                records.append({
+                    "编号": key,
+                    "原文": source,
+                    "记忆原文": hit["原文"],
+                    "记忆译文": hit["译文"],
+                    "相似度": hit["相似度"],
+                    "标签": label,
+                })
+                break
+    return suggestions, records
@@ -0,0 +1,132 @@
+"""
+Workflow 调用的 Token 用量与费用统计（批次 / 轮次 / 运行三级）
+
+Workflow 按调用次数和 Token 计费。stream_workflow_messages 返回的 WorkflowMessages 带有 Workflow 报告的用量
+（MESSAGE 事件的 usage：input_count / output_count / token_count）；没有报告用量的批次（旧版 Workflow、
+调用失败、基准测试的桩函数）按发送与返回内容的长度估算，并标记为估算：
+- 中日韩等非 ASCII 字符每个字符约 1 个 Token，ASCII 字符约 4 个字符 1 个 Token。
+
+费用 = 调用次数 × 每次调用费用 + 输入 Token / 1000 × 每千输入 Token 费用 + 输出 Token / 1000 × 每千输出 Token 费用，
+每接受编号费用 = 费用 / Workflow 接受的编号数，用来比较批次大小、并发数与候选数的性价比。
+"""
+import json
+from collections import OrderedDict
+
+# 估算时 ASCII 字符数 / Token
+ASCII_CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text):
+    """按字符估算 Token 数：非 ASCII 字符各算 1 个，ASCII 字符每 4 个算 1 个（向上取整）"""
+    if not text:
+        return 0
+    data = text.encode("utf-8")
+    ascii_count = sum(1 for b in data if b < 0x80)
+    # UTF-8 中每个非 ASCII 字符恰好有一个首字节（0xC0 及以上），续字节（0x80–0xBF）不计
+    wide_count = sum(1 for b in data if b >= 0xC0)
+    return wide_count + -(-ascii_count // ASCII_CHARS_PER_TOKEN)
+
+
+def batch_usage(fields, results):
+    """
+    一个批次的用量：{"input": 输入 Token, "output": 输出 Token, "estimated": 是否估算}
+    results 带有 usage（WorkflowMessages）时使用 Workflow 报告的数值，否则按 fields 与 results 的长度估算
+    """
+    reported = getattr(results, "usage", None)
+    if reported:
+        return {"input": reported["input"], "output": reported["output"], "estimated": False}
+    output = "".join(r if isinstance(r, str) else json.dumps(r, ensure_ascii=False) for r in results or [])
+    return {"input": estimate_tokens("\n".join(fields)), "output": estimate_tokens(output), "estimated": True}
+
+
+class Pricing:
+    """计费单价：每次调用、每千输入 Token、每千输出 Token"""
+
+    def __init__(self, per_call=0.0, per_1k_input=0.0, per_1k_output=0.0):
+        self.per_call = per_call
+        self.per_1k_input = per_1k_input
+        self.per_1k_output = per_1k_output
+
+    def cost(self, calls, input_tokens, output_tokens):
+        return (calls * self.per_call + input_tokens / 1000 * self.per_1k_input
+                + output_tokens / 1000 * self.per_1k_output)
+
+
+class UsageMeter:
+    """
+    累计每个批次的用量；按轮次汇总（按轮次调度为实际轮次，连续队列为编号的第几次发送）与整次运行汇总
+    只在主线程中调用
+    """
+
+    def __init__(self, pricing=None):
+        self.pricing = pricing or Pricing()
+        self.batches = []
+        self.calls = 0
+        self.input = 0
+        self.output = 0
+        self.estimated = 0
+
+    def record(self, batch_index, round_no, keys, usage):
+        """记录一个完成的批次，返回该批次一行"""
+        self.calls += 1
+        self.input += usage["input"]
+        self.output += usage["output"]
+        self.estimated += usage["estimated"]
+        row = OrderedDict([
+            ("轮次", round_no),
+            ("批次", batch_index + 1),
+            ("编号数", len(keys)),
+            ("输入 Token", usage["input"]),
+            ("输出 Token", usage["output"]),
+            ("估算", usage["estimated"]),
+            ("费用", round(self.pricing.cost(1, usage["input"], usage["output"]), 6)),
+        ])
+        self.batches.append(row)
+        return row
+
+    @property
+    def tokens(self):
+        return self.input + self.output
+
+    @property
+    def cost(self):
+        return self.pricing.cost(self.calls, self.input, self.output)
+
+    def by_round(self):
+        """每个轮次一行：批次数、发送编号数、Token 与费用"""
+        rounds = OrderedDict()
+        for row in self.batches:
+            r = rounds.setdefault(row["轮次"], OrderedDict([
+                ("轮次", row["轮次"]), ("批次数", 0), ("发送编号数", 0),
+                ("输入 Token", 0), ("输出 Token", 0), ("估算批次", 0), ("费用", 0.0),
+            ]))
+            r["批次数"] += 1
+            r["发送编号数"] += row["编号数"]
+            r["输入 Token"] += row["输入 Token"]
+            r["输出 Token"] += row["输出 Token"]
+            r["估算批次"] += row["估算"]
+            r["费用"] += row["费用"]
+        for r in rounds.values():
+            r["费用"] = round(r["费用"], 6)
+        return list(rounds.values())
+
+    def summary(self, accepted):
+        """整次运行的用量；accepted 为 Workflow 接受的编号数"""
+        return {
+            "输入 Token": self.input,
+            "输出 Token": self.output,
+            "估算 Token 批次": self.estimated,
+            "费用": round(self.cost, 4),
+            "每接受编号 Token": round(self.tokens / accepted, 1) if accepted else 0.0,
+            "每接受编号费用": round(self.cost / accepted, 6) if accepted else 0.0,
+        }
+
+    def describe(self, accepted=None):
+        """日志用的一行描述"""
+        text = f"Token 输入 {self.input} / 输出 {self.output}"
+        if self.estimated:
+            text += f"（其中 {self.estimated} 个批次为估算）"
+        text += f"，费用 {self.cost:.4f}"
+        if accepted:
+            text += f"，每接受编号 {self.tokens / accepted:.1f} Token / 费用 {self.cost / accepted:.6f}"
+        return text
@@ -0,0 +1,274 @@
+"""
+Coze Workflow 结果处理（工作流测试 / 自动化迭代共用）
+
+BatchApplier 用于流水线模式：每个批次返回后立即解析、迭代进译文，
+待翻译编号与各标签数量随之更新，不必等整轮批次全部完成。
+
+Workflow 可以为每个编号返回多个候选（download_url 中同一编号出现多行），
+select_candidates 在本地按长度标签区间挑出最合适的一个再迭代。
+"""
+import json
+import threading
+
+from cozepy import WorkflowEventType
+
+from core import match_status, process_iteration
+from markup import visible_length
+from metrics import DEFAULT_METRIC, as_str_list
+from timing import timed
+
+
+class WorkflowMessages(list):
+    """
+    stream_workflow_messages 的返回值：MESSAGE 内容列表
+    usage 为 Workflow 报告的 Token 用量 {"input", "output", "total"}，没有报告时为 None（见 usage.py）
+    """
+    usage = None
+
+
+def stream_workflow_messages(client, workflow_id, parameters, on_event=None):
+    """
+    流式调用 Workflow，收集全部 MESSAGE 事件的内容（能解析为 JSON 的解析后返回）与 Token 用量
+    on_event 不为空时每个事件（含非 MESSAGE 事件）先交给它处理，如记录原始事件
+    HTTP 或连接错误直接抛出；ERROR 事件不抛出，该批次没有对应的内容
+    """
+    results = WorkflowMessages()
+    for event in client.workflows.runs.stream(workflow_id=workflow_id, parameters=parameters):
+        if on_event is not None:
+            on_event(event)
+        if event.event == WorkflowEventType.MESSAGE:
+            usage = getattr(event.message, "usage", None)
+            if usage is not None:
+                # usage 是本次调用的累计用量，多个 MESSAGE 都带有时以最后一个为准
+                results.usage = {"input": usage.input_count, "output": usage.output_count, "total": usage.token_count}
+            content = getattr(event.message, "content", None)
+            if content:
+                try:
+                    results.append(json.loads(content))
+                except Exception:
+                    results.append(content)
+    return results
+
+
+@timed("解析 Workflow 结果")
+def parse_workflow_results(workflow_results):
+    """
+    将 workflow 返回的结果解析成 {编号: 内容} 的 dict
+    规则：
+    - 等号左边是编号（任何字符）
+    - 等号右边是内容
+    """
+    return dict(_iter_workflow_items(workflow_results))
+
+
+@timed("解析 Workflow 结果")
+def parse_workflow_candidates(workflow_results):
+    """
+    与 parse_workflow_results 相同的解析规则，但保留同一编号的全部候选：{编号: [候选, ...]}
+    候选按返回顺序排列，重复的候选只保留一次
+    """
+    candidates = {}
+    for key, value in _iter_workflow_items(workflow_results):
+        values = candidates.setdefault(key, [])
+        if value not in values:
+            values.append(value)
+    return candidates
+
+
+def _iter_workflow_items(workflow_results):
+    """依次产出 workflow 结果中的 (编号, 内容)"""
+    if not workflow_results:
+        return
+
+    for batch in workflow_results:
+        if not isinstance(batch, dict):
+            continue
+
+        items = batch.get("download_url", [])
+        if not isinstance(items, list):
+            continue
+
+        for raw_item in items:
+            if not raw_item or not isinstance(raw_item, str):
+                continue
+
+            text = raw_item.strip()
+
+            # ① 尝试解一层 JSON（处理 ["xxx=yyy"]）
+            if text.startswith("[") and text.endswith("]"):
+                try:
+                    decoded = json.loads(text)
+                    if isinstance(decoded, list):
+                        for sub in decoded:
+                            item = _extract_kv_relaxed(sub)
+                            if item:
+                                yield item
+                        continue
+                except Exception:
+                    pass  # 解不开就当普通字符串继续
+
+            # ② 普通字符串
+            item = _extract_kv_relaxed(text)
+            if item:
+                yield item
+
+
+def _extract_kv_relaxed(text):
+    if not text or not isinstance(text, str) or "=" not in text:
+        return None
+
+    key, value = text.split("=", 1)
+
+    key = key.strip()
+    value = value.strip()
+
+    # 左右都必须非空
+    if not key or not value:
+        return None
+
+    return key, value
+
+
+# ---------------------------
+# 多候选选择
+# ---------------------------
+def score_candidate(orig_text, candidate, statuses, target, metric=DEFAULT_METRIC, markup=None):
+    """
+    候选译文的 (与 target 标签区间的距离, 比值, 标签)；距离为 0 表示落在区间内
+    原文为空时返回 None
+    """
+    orig_len = visible_length(orig_text, metric, markup)
+    if orig_len == 0:
+        return None
+    ratio = round((visible_length(candidate, metric, markup) - orig_len) / orig_len, 4)
+    s_min = float("-inf") if target.get("min") is None else target["min"]
+    s_max = float("inf") if target.get("max") is None else target["max"]
+    distance = max(s_min - ratio, ratio - s_max, 0.0)
+    return distance, ratio, match_status(ratio, statuses) or "未分类"
+
+
+def select_candidates(original_dict, candidates, statuses, iterable_labels, metric=DEFAULT_METRIC, markup=None):
+    """
+    每个编号从多个候选中选出一个：{编号: [候选, ...]} → {编号: 候选}
+    优先选标签属于可迭代标签的候选，其中比值最接近 0（长度最接近原文）的；
+    都不可迭代时选离第一个可迭代标签区间最近的（供发送记录保留最佳候选）
+    """
+    iterable = {label.strip() for label in iterable_labels}
+    target_label = iterable_labels[0].strip() if iterable_labels else None
+    target = next((s for s in statuses if s["name"] == target_label), statuses[0])
+    selected = {}
+    for key, values in candidates.items():
+        if len(values) == 1 or key not in original_dict:
+            selected[key] = values[0]
+            continue
+        best, best_rank = values[0], None
+        for value in values:
+            scored = score_candidate(original_dict[key], value, statuses, target, metric, markup)
+            if scored is None:
+                break
+            distance, ratio, tag = scored
+            rank = (tag not in iterable, distance, abs(ratio))
+            if best_rank is None or rank < best_rank:
+                best, best_rank = value, rank
+        selected[key] = best
+    return selected
+
+
+class BatchApplier:
+    """
+    逐批合并 Workflow 结果：就地修改 translation_dict，并维护每个编号的当前标签、
+    各标签数量与待翻译编号集合（标签属于 pending_labels 的编号）
+    apply 可以在线程池的工作线程中调用：解析在各线程并行，合并过程加锁串行
+    """
+
+    def __init__(self, original_dict, translation_dict, df_result, pending_labels, iterable_labels, statuses,
+                 metric=DEFAULT_METRIC, markup=None):
+        self.original_dict = original_dict
+        self.translation_dict = translation_dict
+        self.iterable_labels = iterable_labels
+        self.statuses = statuses
+        self.metric = metric
+        self.markup = markup
+        self.pending_labels = set(pending_labels)
+
+        keys = as_str_list(df_result["编号"])
+        tags = as_str_list(df_result["标签"])
+        self.tags = dict(zip(keys, tags))
+        self.tag_counts = {}
+        for tag in tags:
+            self.tag_counts[tag] = self.tag_counts.get(tag, 0) + 1
+        self.pending = {k for k, tag in self.tags.items() if tag in self.pending_labels}
+
+        self.batches = 0
+        self.parsed_count = 0
+        self.updated_records = []
+        self.iteration_stats = {
+            "total_in_iteration": 0,
+            "matched_in_original": 0,
+            "updated_translations": 0,
+            "skipped_not_iterable": 0,
+            "iteration_labels_distribution": {}
+        }
+        self._lock = threading.Lock()
+
+    def merge(self, iteration_dict):
+        """
+        把 {编号: 译文} 迭代进译文并更新标签与待翻译编号（加锁），返回本次的更新记录
+        直接调用（如翻译记忆预填）不计入 Workflow 的迭代统计
+        """
+        return self._merge(iteration_dict)
+
+    def _merge(self, iteration_dict, count=False):
+        with self._lock:
+            _, records, stats, labels_count = process_iteration(
+                self.original_dict, self.translation_dict, iteration_dict, self.iterable_labels, self.statuses,
+                self.metric, self.markup
+            )
+            for record in records:
+                key, new_tag = record["编号"], record["新标签"]
+                old_tag = self.tags.get(key)
+                if old_tag is not None:
+                    self.tag_counts[old_tag] -= 1
+                self.tag_counts[new_tag] = self.tag_counts.get(new_tag, 0) + 1
+                self.tags[key] = new_tag
+                if new_tag in self.pending_labels:
+                    self.pending.add(key)
+                else:
+                    self.pending.discard(key)
+            if not count:
+                return records
+            self.updated_records.extend(records)
+            for name in ("total_in_iteration", "matched_in_original", "updated_translations", "skipped_not_iterable"):
+                self.iteration_stats[name] += stats[name]
+            distribution = self.iteration_stats["iteration_labels_distribution"]
+            for label, n in labels_count.items():
+                distribution[label] = distribution.get(label, 0) + n
+        return records
+
+    def select(self, batch_results):
+        """解析一个批次的 MESSAGE 内容，每个编号在多个候选中选出一个：{编号: 候选}"""
+        return select_candidates(self.original_dict, parse_workflow_candidates(batch_results), self.statuses,
+                                 self.iterable_labels, self.metric, self.markup)
+
+    def apply(self, batch_results):
+        """解析一个批次的 MESSAGE 内容（多候选时本地择优）并立即迭代，返回 (解析出的条目数, 本批更新记录)"""
+        return self.apply_parsed(self.select(batch_results))
+
+    def apply_parsed(self, parsed):
+        """迭代一个批次已解析的 {编号: 译文}，返回 (条目数, 本批更新记录)"""
+        records = self._merge(parsed, count=True) if parsed else []
+        with self._lock:
+            self.batches += 1
+            self.parsed_count += len(parsed)
+        return len(parsed), records
+
+    def progress(self):
+        """当前进度快照：{"batches", "parsed", "updated", "pending", "tags"}"""
+        with self._lock:
+            return {
+                "batches": self.batches,
+                "parsed": self.parsed_count,
+                "updated": self.iteration_stats["updated_translations"],
+                "pending": len(self.pending),
+                "tags": dict(self.tag_counts),
+            }